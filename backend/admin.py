@@ -0,0 +1,22 @@
+"""Shared-secret guard for operational endpoints.
+
+Admin routes require an ``X-Admin-Token`` header matching ``ADMIN_TOKEN``.
+When ``ADMIN_TOKEN`` is unset, admin routes are disabled entirely.
+"""
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """FastAPI dependency that rejects requests without a valid admin token"""
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,555 @@
+"""Run the detection pipeline over local images, without HTTP.
+
+Meant for backfills. Uses the same decode, post-process and render functions
+as the API (``pipeline.py``) and the same model loading (``inference.py``).
+The repo has no packaging, so there is no installed ``visionflow-batch``
+command (that is only the name in ``--help``); run the script from
+``backend/``::
+
+    python batch.py /data/images --out runs/backfill --format yolo,coco
+    python batch.py --manifest paths.txt --out runs/backfill --render --load-db
+
+Decoding runs in a pool of worker processes that stays a bounded number of
+images ahead of inference; inference runs in this process, ``--batch-size``
+images per model call; rendering and encoding go back to the pool, with the
+decoded images, while the next batch is inferred.
+
+Local files are not uploads: they are limited by ``--max-file-bytes``
+(``BATCH_MAX_FILE_BYTES``, default 512 MiB) rather than the API's
+``MAX_UPLOAD_BYTES``.
+
+Outputs, under ``--out``:
+
+* ``labels/<relative path>.txt``  YOLO labels (``--format yolo``) and ``classes.txt``
+* ``annotations.json``            COCO detections (``--format coco``)
+* ``rendered/<relative path>``    annotated images (``--render``)
+* ``checkpoint.jsonl``            one line per finished image; rerunning with the
+  same ``--out`` skips everything already in it
+* ``report.json``                 counts, stage timings and throughput
+
+``--motion-gate`` treats the input, in path order, as frames from a static
+camera: frames that barely differ from the last inferred frame reuse its
+detections instead of going to the model (see ``motion.py``), and the report
+gains the skip ratio.
+
+``--load-db`` also stores each original in blob storage and writes its file,
+detection and summary rows to ``DATABASE_URL`` in one transaction per batch,
+so backfilled images show up in the app as if they had been analyzed there.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import cv2
+
+from motion import METHODS as MOTION_METHODS, MOTION_GATE_METHOD, MotionGate, frame_signature
+from pipeline import DetectionResult, decode_image_bytes, draw_detections_on_image, encode_image_to_base64, process_image_detections
+
+logger = logging.getLogger("visionflow.batch")
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+CHECKPOINT_FILE = "checkpoint.jsonl"
+PROGRESS_INTERVAL_SECONDS = 10.0
+BATCH_MAX_FILE_BYTES = int(os.getenv("BATCH_MAX_FILE_BYTES", 512 * 1024 * 1024))
+
+
+@dataclass
+class Decoded:
+    path: str
+    image: Any = None  # np.ndarray, or None when the file could not be read
+    blob: Any = None  # ingest.IngestedBlob with --load-db
+    signature: Any = None  # motion.frame_signature with --motion-gate
+    error: Optional[str] = None
+
+
+@dataclass
+class Report:
+    total: int = 0
+    resumed: int = 0
+    processed: int = 0
+    failed: int = 0
+    detections: int = 0
+    elapsed_seconds: float = 0.0
+    images_per_second: float = 0.0
+    stage_seconds: Dict[str, float] = field(default_factory=lambda: {
+        "decode_wait": 0.0, "inference": 0.0, "finish_wait": 0.0, "write": 0.0, "db": 0.0,
+    })
+    motion: Optional[Dict[str, Any]] = None  # MotionGate.report() with --motion-gate
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+# ---------------- Inputs -----------------
+
+def find_images(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def read_manifest(manifest: Path) -> List[Path]:
+    """One path per line, relative paths resolved against the manifest's directory"""
+    paths = []
+    for line in manifest.read_text().splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            path = Path(line)
+            paths.append(path if path.is_absolute() else manifest.parent / path)
+    return paths
+
+
+def common_root(paths: List[Path]) -> Optional[Path]:
+    """Deepest directory containing every path, so output names relative to it stay unique"""
+    if not paths:
+        return None
+    try:
+        return Path(os.path.commonpath([os.path.abspath(path.parent) for path in paths]))
+    except ValueError:
+        # Paths on different drives have no common directory
+        return None
+
+
+def relative_name(path: Path, root: Optional[Path]) -> Path:
+    if root is not None:
+        try:
+            return Path(os.path.abspath(path)).relative_to(os.path.abspath(root))
+        except ValueError:
+            pass
+    return Path(path.name)
+
+
+def load_checkpoint(out_dir: Path) -> Tuple[Set[str], List[Dict[str, Any]]]:
+    """Paths already finished by an earlier run, and their records.
+
+    A torn last line from an interrupted write is ignored; that image is redone.
+    """
+    done: Set[str] = set()
+    records: List[Dict[str, Any]] = []
+    path = out_dir / CHECKPOINT_FILE
+    if not path.exists():
+        return done, records
+    with path.open() as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done.add(record["path"])
+            records.append(record)
+    return done, records
+
+
+# ---------------- Worker processes -----------------
+
+def _init_worker() -> None:
+    # Parallelism comes from the pool; one OpenCV thread per worker avoids oversubscription
+    cv2.setNumThreads(1)
+
+
+def _decode(path: str, store_blob: bool, motion_method: Optional[str], max_bytes: int) -> Decoded:
+    try:
+        if os.path.getsize(path) > max_bytes:
+            return Decoded(path, error=f"File exceeds {max_bytes} bytes")
+        blob = None
+        if store_blob:
+            from ingest import ingest_fileobj
+
+            with open(path, "rb") as f:
+                blob = ingest_fileobj(f, max_bytes=max_bytes)
+        with open(path, "rb") as f:
+            image = decode_image_bytes(f.read())
+        if image is None:
+            return Decoded(path, error="Invalid image data")
+        signature = frame_signature(image, motion_method) if motion_method else None
+        return Decoded(path, image, blob, signature)
+    except Exception as e:
+        return Decoded(path, error=getattr(e, "detail", None) or str(e))
+
+
+def _finish(image: Any, detections: List[Dict[str, Any]], render_path: Optional[str], encode: bool) -> Optional[str]:
+    """Render the detections on the decoded image; write it and/or return it base64-encoded"""
+    annotated = draw_detections_on_image(image, [DetectionResult(**det) for det in detections])
+    if render_path is not None:
+        Path(render_path).parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(render_path, annotated)
+    return encode_image_to_base64(annotated) if encode else None
+
+
+# ---------------- Outputs -----------------
+
+def detection_record(det: DetectionResult, class_ids: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "class_id": class_ids[det.class_name],
+        "class_name": det.class_name,
+        "confidence": det.confidence,
+        "bbox": det.bbox,
+        "color": det.color,
+    }
+
+
+def write_yolo_labels(label_path: Path, record: Dict[str, Any]) -> None:
+    # YOLO format: class x_center y_center width height, normalized
+    width, height = record["width"], record["height"]
+    lines = []
+    for det in record["detections"]:
+        x_min, y_min, x_max, y_max = det["bbox"]
+        lines.append(
+            f"{det['class_id']} {(x_min + x_max) / 2 / width:.6f} {(y_min + y_max) / 2 / height:.6f} "
+            f"{(x_max - x_min) / width:.6f} {(y_max - y_min) / height:.6f}\n"
+        )
+    label_path.parent.mkdir(parents=True, exist_ok=True)
+    label_path.write_text("".join(lines))
+
+
+def write_coco(path: Path, records: Iterable[Dict[str, Any]], names: Dict[int, str]) -> None:
+    coco: Dict[str, Any] = {
+        "images": [],
+        "annotations": [],
+        "categories": [{"id": class_id, "name": name} for class_id, name in sorted(names.items())],
+    }
+    for image_id, record in enumerate(records, start=1):
+        coco["images"].append({
+            "id": image_id, "file_name": record["name"], "width": record["width"], "height": record["height"],
+        })
+        for det in record["detections"]:
+            x_min, y_min, x_max, y_max = det["bbox"]
+            box_w, box_h = x_max - x_min, y_max - y_min
+            coco["annotations"].append({
+                "id": len(coco["annotations"]) + 1,
+                "image_id": image_id,
+                "category_id": det["class_id"],
+                "bbox": [x_min, y_min, box_w, box_h],
+                "area": box_w * box_h,
+                "score": det["confidence"],
+                "iscrowd": 0,
+            })
+    path.write_text(json.dumps(coco))
+
+
+async def load_batch(records: List[Dict[str, Any]], blobs: Dict[str, Any], model_version: str) -> None:
+    """Write one batch of results to the database in a single transaction.
+
+    Files already loaded for the same content, name and model (an earlier run
+    that stopped between commit and checkpoint) are skipped.
+    """
+    from sqlalchemy import insert, select
+
+    from changes import record_changes
+    from database import AsyncSessionLocal, dialect_insert
+    from models import Blob, Detection, File as FileModel
+    from stats import flush_file_stats, stage_file_stats
+
+    async with AsyncSessionLocal() as db:
+        digests = [blobs[r["path"]].digest for r in records]
+        existing = await db.execute(
+            select(FileModel.content_hash, FileModel.filename)
+            .where(FileModel.content_hash.in_(digests), FileModel.model_version == model_version)
+        )
+        loaded = set(existing.all())
+
+        detection_rows = []
+        loaded_ids = []
+        for record in records:
+            blob = blobs[record["path"]]
+            filename = Path(record["name"]).name
+            if (blob.digest, filename) in loaded:
+                continue
+            loaded.add((blob.digest, filename))
+            await db.execute(
+                dialect_insert(db, Blob).values(
+                    digest=blob.digest,
+                    blob_key=blob.blob_key,
+                    size=blob.size,
+                    media_type=blob.media_type,
+                    created_at=datetime.utcnow(),
+                ).on_conflict_do_nothing(index_elements=["digest"])
+            )
+            file = FileModel(
+                filename=filename,
+                filetype=blob.media_type,
+                size=str(blob.size),
+                image_data=record.pop("image_data"),
+                blob_key=blob.blob_key,
+                content_hash=blob.digest,
+                model_version=model_version,
+                width=record["width"],
+                height=record["height"],
+                processing_time=record["processing_time"],
+                detection_version=1,
+            )
+            db.add(file)
+            await db.flush()
+            detections = [DetectionResult(**{k: det[k] for k in ("class_name", "confidence", "bbox", "color")})
+                          for det in record["detections"]]
+            detection_rows.extend(
+                {
+                    "file_id": file.id,
+                    "class_name": det.class_name,
+                    "confidence": det.confidence,
+                    "x_min": det.bbox[0],
+                    "y_min": det.bbox[1],
+                    "x_max": det.bbox[2],
+                    "y_max": det.bbox[3],
+                }
+                for det in detections
+            )
+            stage_file_stats(db, file.id, detections)
+            loaded_ids.append(file.id)
+        if detection_rows:
+            # One executemany; SQLAlchemy batches it into multi-row INSERTs
+            await db.execute(insert(Detection), detection_rows)
+        await flush_file_stats(db)
+        await record_changes(db, loaded_ids)
+        await db.commit()
+
+
+# ---------------- Pipeline -----------------
+
+class BatchRunner:
+    def __init__(self, args: argparse.Namespace, paths: List[Path], root: Optional[Path]):
+        self.args = args
+        self.paths = paths
+        self.root = root
+        self.out_dir = Path(args.out)
+        self.formats = {f.strip() for f in args.format.split(",") if f.strip()}
+        self.report = Report(total=len(paths))
+        self.records: List[Dict[str, Any]] = []
+        self.loop = asyncio.new_event_loop() if args.load_db else None
+        self.gate = MotionGate(args.motion_method, args.motion_threshold) if args.motion_gate else None
+
+    def run(self) -> Report:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        done, self.records = load_checkpoint(self.out_dir)
+        pending = [str(p) for p in self.paths if str(p) not in done]
+        self.report.resumed = len(self.paths) - len(pending)
+        if self.report.resumed:
+            logger.info(f"Resuming: {self.report.resumed} images already in the checkpoint")
+
+        # Fork the workers before the model loads so they do not inherit its memory and threads
+        ctx = multiprocessing.get_context("spawn" if sys.platform == "win32" else "fork")
+        with ctx.Pool(self.args.workers, initializer=_init_worker) as pool:
+            from inference import load_model
+
+            weights = self.args.weights
+            self.model = load_model(weights)
+            self.model_version = os.getenv("MODEL_VERSION", weights)
+            self.class_ids = {name: class_id for class_id, name in self.model.names.items()}
+            if "yolo" in self.formats:
+                (self.out_dir / "classes.txt").write_text(
+                    "".join(f"{name}\n" for _, name in sorted(self.model.names.items()))
+                )
+            with (self.out_dir / CHECKPOINT_FILE).open("a+") as checkpoint:
+                # Terminate a torn line left by an interrupted run before appending
+                if checkpoint.tell():
+                    checkpoint.seek(checkpoint.tell() - 1)
+                    if checkpoint.read(1) != "\n":
+                        checkpoint.write("\n")
+                self._process(pool, pending, checkpoint)
+
+        if "coco" in self.formats:
+            write_coco(self.out_dir / "annotations.json", self.records, self.model.names)
+        if self.loop is not None:
+            self.loop.close()
+        self._finish_report()
+        return self.report
+
+    def _process(self, pool, pending: List[str], checkpoint) -> None:
+        batch_size = self.args.batch_size
+        # Decoded images held ahead of inference; bounds memory however large the input is
+        window: Deque[Any] = deque()
+        prefetch = max(batch_size * 2, self.args.workers * 2)
+        paths = iter(pending)
+        in_flight = None  # the previous batch, rendering in the pool while this one is inferred
+        motion_method = self.gate.method if self.gate is not None else None
+        self.started = self.last_progress = time.perf_counter()
+
+        def refill() -> None:
+            while len(window) < prefetch:
+                path = next(paths, None)
+                if path is None:
+                    return
+                window.append(pool.apply_async(_decode, (path, self.args.load_db, motion_method, self.args.max_file_bytes)))
+
+        refill()
+        while window:
+            start = time.perf_counter()
+            batch = [window.popleft().get() for _ in range(min(batch_size, len(window)))]
+            refill()
+            self.report.stage_seconds["decode_wait"] += time.perf_counter() - start
+
+            results, seconds = self._infer(batch)
+            if in_flight is not None:
+                self._complete(*in_flight, checkpoint)
+            in_flight = (batch, results, seconds, self._submit_finish(pool, batch, results))
+            self._progress()
+        if in_flight is not None:
+            self._complete(*in_flight, checkpoint)
+
+    def _infer(self, batch: List[Decoded]) -> Tuple[Dict[str, List[DetectionResult]], float]:
+        """Detections by path, and the model time per image"""
+        valid = [d for d in batch if d.image is not None]
+        if not valid:
+            return {}, 0.0
+        start = time.perf_counter()
+        keep = [True] * len(valid) if self.gate is None else [self.gate.check(d.signature) for d in valid]
+        keyframes = [d for d, kept in zip(valid, keep) if kept]
+        inferred = []
+        if keyframes:
+            images = [d.image for d in keyframes]
+            results = self.model(images if len(images) > 1 else images[0], verbose=False)
+            inferred = [
+                process_image_detections([result], d.image, self.model.names)
+                for d, result in zip(keyframes, results)
+            ]
+        if self.gate is not None:
+            inferred = self.gate.expand(keep, inferred)
+        detections = {d.path: dets for d, dets in zip(valid, inferred)}
+        seconds = time.perf_counter() - start
+        self.report.stage_seconds["inference"] += seconds
+        return detections, seconds / len(valid)
+
+    def _submit_finish(self, pool, batch: List[Decoded], results: Dict[str, List[DetectionResult]]) -> Dict[str, Any]:
+        render = self.args.render
+        encode = self.args.load_db
+        if not (render or encode):
+            return {}
+        finishing = {}
+        for d in batch:
+            if d.path not in results:
+                continue
+            render_path = None
+            if render:
+                render_path = str(self.out_dir / "rendered" / relative_name(Path(d.path), self.root))
+            detections = [det.dict(exclude={"id"}) for det in results[d.path]]
+            # Send the array inference already used rather than reading and decoding the file again
+            finishing[d.path] = pool.apply_async(_finish, (d.image, detections, render_path, encode))
+        return finishing
+
+    def _complete(
+        self,
+        batch: List[Decoded],
+        results: Dict[str, List[DetectionResult]],
+        seconds: float,
+        finishing: Dict[str, Any],
+        checkpoint,
+    ) -> None:
+        start = time.perf_counter()
+        encoded = {path: pending.get() for path, pending in finishing.items()}
+        self.report.stage_seconds["finish_wait"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        records = []
+        for d in batch:
+            if d.image is None:
+                self.report.failed += 1
+                self.report.errors[d.path] = d.error or "unknown error"
+                continue
+            name = relative_name(Path(d.path), self.root)
+            height, width = d.image.shape[:2]
+            record = {
+                "path": d.path,
+                "name": str(name),
+                "width": width,
+                "height": height,
+                "processing_time": seconds,
+                "detections": [detection_record(det, self.class_ids) for det in results[d.path]],
+            }
+            if "yolo" in self.formats:
+                write_yolo_labels((self.out_dir / "labels" / name).with_suffix(".txt"), record)
+            records.append(record)
+        self.report.stage_seconds["write"] += time.perf_counter() - start
+
+        if self.loop is not None and records:
+            start = time.perf_counter()
+            for record in records:
+                record["image_data"] = encoded.get(record["path"])
+            self.loop.run_until_complete(load_batch(records, {d.path: d.blob for d in batch}, self.model_version))
+            self.report.stage_seconds["db"] += time.perf_counter() - start
+
+        # Checkpoint only after every output of the batch is durable
+        for record in records:
+            record.pop("image_data", None)
+            checkpoint.write(json.dumps(record) + "\n")
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+        self.records.extend(records)
+        self.report.processed += len(records)
+        self.report.detections += sum(len(r["detections"]) for r in records)
+
+    def _progress(self) -> None:
+        now = time.perf_counter()
+        if now - self.last_progress < PROGRESS_INTERVAL_SECONDS:
+            return
+        self.last_progress = now
+        finished = self.report.processed + self.report.failed
+        remaining = self.report.total - self.report.resumed - finished
+        rate = finished / (now - self.started)
+        eta = f"{remaining / rate:.0f}s" if rate > 0 else "?"
+        logger.info(
+            f"{finished + self.report.resumed}/{self.report.total} images, "
+            f"{rate:.1f} img/s, {self.report.failed} failed, ETA {eta}"
+        )
+
+    def _finish_report(self) -> None:
+        report = self.report
+        report.elapsed_seconds = round(time.perf_counter() - self.started, 3) if hasattr(self, "started") else 0.0
+        if report.elapsed_seconds:
+            report.images_per_second = round((report.processed + report.failed) / report.elapsed_seconds, 2)
+        report.stage_seconds = {name: round(seconds, 3) for name, seconds in report.stage_seconds.items()}
+        if self.gate is not None:
+            report.motion = self.gate.report()
+        (self.out_dir / "report.json").write_text(json.dumps(asdict(report), indent=2))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="visionflow-batch", description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", nargs="?", help="directory to scan recursively for images")
+    parser.add_argument("--manifest", help="file listing image paths, one per line")
+    parser.add_argument("--out", required=True, help="output directory; also holds the resume checkpoint")
+    parser.add_argument("--format", default="yolo,coco", help="comma-separated outputs: yolo, coco")
+    parser.add_argument("--render", action="store_true", help="write annotated images under OUT/rendered")
+    parser.add_argument("--load-db", action="store_true", help="store originals and results in DATABASE_URL")
+    parser.add_argument("--weights", default=os.getenv("MODEL_WEIGHTS", "yolov8n.pt"))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("BATCH_INFERENCE_SIZE", "8")))
+    parser.add_argument("--motion-gate", action="store_true", help="skip inference on frames unchanged since the last inferred one")
+    parser.add_argument("--motion-method", default=MOTION_GATE_METHOD, choices=MOTION_METHODS, help="frame signature: thumbnail diff or perceptual hash")
+    parser.add_argument("--motion-threshold", type=float, help="fraction of changed pixels (diff) or hash bits (hash) that counts as motion")
+    parser.add_argument("--max-file-bytes", type=int, default=BATCH_MAX_FILE_BYTES, help="skip local files larger than this")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="decode/render processes")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if bool(args.input) == bool(args.manifest):
+        parser.error("give exactly one of INPUT or --manifest")
+    unknown = {f.strip() for f in args.format.split(",") if f.strip()} - {"yolo", "coco"}
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+    if args.load_db and not os.getenv("DATABASE_URL"):
+        parser.error("--load-db needs DATABASE_URL")
+
+    if args.manifest:
+        paths = read_manifest(Path(args.manifest))
+        # Name outputs by their path below the listed files' common directory,
+        # so same-named files from different directories do not collide
+        root = common_root(paths)
+    else:
+        root = Path(args.input)
+        if not root.is_dir():
+            parser.error(f"{root} is not a directory")
+        paths = find_images(root)
+
+    report = BatchRunner(args, paths, root).run()
+    summary = {k: v for k, v in asdict(report).items() if k != "errors"}
+    print(json.dumps(summary, indent=2))
+    return 1 if report.failed and not (report.processed or report.resumed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
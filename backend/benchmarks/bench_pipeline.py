@@ -0,0 +1,53 @@
+"""Microbenchmarks for the CPU stages of the detection pipeline.
+
+Run from ``backend/`` (pytest only collects this file when it is named)::
+
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only -k draw --benchmark-save=baseline
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-only --benchmark-compare
+
+Each stage is measured on its own across image sizes and detection counts.
+"""
+import cv2
+import numpy as np
+import pytest
+
+from benchmarks.conftest import DETECTION_COUNTS, STUB_NAMES, StubModel, make_detections
+from encoding import ImageEncoding
+from pipeline import draw_detections_on_image, encode_image_to_base64, process_image_detections
+
+
+def test_imdecode(benchmark, jpeg_bytes):
+    buffer = np.frombuffer(jpeg_bytes, np.uint8)
+    result = benchmark(cv2.imdecode, buffer, cv2.IMREAD_COLOR)
+    assert result is not None
+
+
+def test_inference(benchmark, model, image):
+    results = benchmark(model, image)
+    assert len(results) == 1
+
+
+@pytest.mark.parametrize("count", DETECTION_COUNTS)
+def test_process_image_detections(benchmark, image, count):
+    results = StubModel(detections=count)(image)
+    detections = benchmark(process_image_detections, results, image, STUB_NAMES)
+    assert len(detections) == count
+
+
+@pytest.mark.parametrize("count", DETECTION_COUNTS)
+def test_draw_detections_on_image(benchmark, image, count):
+    detections = make_detections(image.shape[1], image.shape[0], count)
+    annotated = benchmark(draw_detections_on_image, image, detections)
+    assert annotated.shape == image.shape
+
+
+@pytest.mark.parametrize("encoding", [
+    ImageEncoding("jpeg", quality=85),
+    ImageEncoding("jpeg", quality=95),
+    ImageEncoding("webp", quality=80),
+    ImageEncoding("png", compression=3),
+], ids=lambda e: f"{e.format}-q{e.quality}" if e.format != "png" else f"png-c{e.compression}")
+def test_encode_image_to_base64(benchmark, image, encoding):
+    encoded = benchmark(encode_image_to_base64, image, encoding)
+    assert encoded
@@ -0,0 +1,82 @@
+"""Microbenchmarks for serializing analysis listings.
+
+Compares the Pydantic + stdlib ``json`` path FastAPI takes for a
+``response_model`` with the row-based orjson path in ``responses.py``::
+
+    python -m pytest benchmarks/bench_serialization.py --benchmark-only
+"""
+import json
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.conftest import STUB_NAMES
+from pipeline import DetectionResult, get_color_for_class
+from responses import COLUMNAR, ROWS, AnalysisEncoder
+
+CLASS_IDS = {name: class_id for class_id, name in STUB_NAMES.items()}
+FILES = 20
+# Detections across the whole listing
+LISTING_DETECTIONS = [100, 1000, 10000]
+
+
+def make_rows(count: int):
+    """File rows and their detection rows, shaped like SQLAlchemy result rows"""
+    files, detections = [], {}
+    for i in range(FILES):
+        file = SimpleNamespace(
+            id=uuid.uuid4(), filename=f"image_{i}.jpg", filetype="image/jpeg", image_data=None,
+            processing_time=0.1, uploaded_at=datetime.utcnow(), model_version="bench",
+        )
+        files.append(file)
+        detections[file.id] = [
+            SimpleNamespace(
+                id=uuid.uuid4(), file_id=file.id, class_name=STUB_NAMES[j % len(STUB_NAMES)],
+                confidence=0.5, x_min=1.0 * j, y_min=2.0 * j, x_max=1.0 * j + 10, y_max=2.0 * j + 10,
+            )
+            for j in range(count // FILES)
+        ]
+    return files, detections
+
+
+@pytest.mark.parametrize("count", LISTING_DETECTIONS)
+def test_pydantic_stdlib_json(benchmark, count):
+    files, detections = make_rows(count)
+
+    def serialize():
+        analyses = [
+            {
+                "id": str(file.id),
+                "filename": file.filename,
+                "detections": [
+                    DetectionResult(
+                        id=str(det.id), class_name=det.class_name, confidence=det.confidence,
+                        bbox=[det.x_min, det.y_min, det.x_max, det.y_max],
+                        color=get_color_for_class(CLASS_IDS[det.class_name]),
+                    )
+                    for det in detections[file.id]
+                ],
+                "timestamp": file.uploaded_at,
+            }
+            for file in files
+        ]
+        return json.dumps(jsonable_encoder(analyses)).encode()
+
+    assert benchmark(serialize)
+
+
+@pytest.mark.parametrize("layout", [ROWS, COLUMNAR])
+@pytest.mark.parametrize("count", LISTING_DETECTIONS)
+def test_orjson_rows(benchmark, count, layout):
+    files, detections = make_rows(count)
+
+    def serialize():
+        encoder = AnalysisEncoder(layout, CLASS_IDS)
+        analyses = [encoder.analysis(file, detections[file.id]) for file in files]
+        return orjson.dumps({"classes": encoder.classes(), "analyses": analyses})
+
+    assert benchmark(serialize)
@@ -0,0 +1,129 @@
+"""Fixtures for the pipeline microbenchmarks.
+
+``stub_model`` mimics the parts of an ultralytics YOLO model the pipeline
+touches (``names`` and results whose boxes expose ``xyxy``/``conf``/``cls``
+via ``.cpu().numpy()``), so the suite runs without downloading weights. Set
+``BENCH_MODEL_WEIGHTS`` (e.g. ``yolov8n.pt``) to benchmark a real model.
+"""
+import os
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import create_test_image
+from pipeline import DetectionResult, get_color_for_class
+
+IMAGE_SIZES = [(640, 480), (1280, 720), (1920, 1080), (3840, 2160)]
+DETECTION_COUNTS = [0, 10, 100]
+
+STUB_NAMES: Dict[int, str] = {i: f"class_{i}" for i in range(80)}
+STUB_NAMES.update({0: "person", 1: "bicycle", 2: "car"})
+
+
+class _Tensor:
+    """Just enough of a torch tensor: indexing and ``.cpu().numpy()``"""
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    def cpu(self) -> "_Tensor":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.array
+
+    def __getitem__(self, index) -> "_Tensor":
+        return _Tensor(self.array[index])
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+
+class _Box:
+    def __init__(self, xyxy: np.ndarray, conf: float, cls: int):
+        self.xyxy = _Tensor(xyxy[None, :])
+        self.conf = _Tensor(np.array([conf], dtype=np.float32))
+        self.cls = _Tensor(np.array([cls], dtype=np.float32))
+
+
+class _Boxes:
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy, self.conf, self.cls = _Tensor(xyxy), _Tensor(conf), _Tensor(cls)
+        self._boxes = [_Box(xyxy[i], conf[i], cls[i]) for i in range(len(xyxy))]
+
+    def __iter__(self):
+        return iter(self._boxes)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+
+class _Results:
+    def __init__(self, boxes: _Boxes):
+        self.boxes = boxes
+
+
+def random_boxes(width: int, height: int, count: int, seed: int = 0) -> _Boxes:
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width * 0.8, count)
+    y1 = rng.uniform(height * 0.05, height * 0.8, count)
+    w = rng.uniform(width * 0.05, width * 0.2, count)
+    h = rng.uniform(height * 0.05, height * 0.2, count)
+    xyxy = np.stack([x1, y1, np.minimum(x1 + w, width - 1), np.minimum(y1 + h, height - 1)], axis=1).astype(np.float32)
+    conf = rng.uniform(0.25, 1.0, count).astype(np.float32)
+    cls = rng.integers(0, len(STUB_NAMES), count).astype(np.float32)
+    return _Boxes(xyxy, conf, cls)
+
+
+class StubModel:
+    """Returns ``detections`` random boxes per image without running a network"""
+
+    def __init__(self, detections: int = 10):
+        self.names = STUB_NAMES
+        self.detections = detections
+
+    def __call__(self, source, *args, **kwargs) -> List[_Results]:
+        images = source if isinstance(source, list) else [source]
+        return [_Results(random_boxes(img.shape[1], img.shape[0], self.detections)) for img in images]
+
+
+@pytest.fixture(scope="session")
+def model():
+    weights = os.getenv("BENCH_MODEL_WEIGHTS")
+    if weights:
+        from ultralytics import YOLO
+
+        return YOLO(weights)
+    return StubModel()
+
+
+@pytest.fixture(params=IMAGE_SIZES, ids=lambda size: f"{size[0]}x{size[1]}")
+def image_size(request):
+    return request.param
+
+
+@pytest.fixture
+def jpeg_bytes(image_size) -> bytes:
+    width, height = image_size
+    return create_test_image(width, height, seed=0)
+
+
+@pytest.fixture
+def image(jpeg_bytes) -> np.ndarray:
+    import cv2
+
+    return cv2.imdecode(np.frombuffer(jpeg_bytes, np.uint8), cv2.IMREAD_COLOR)
+
+
+def make_detections(width: int, height: int, count: int) -> List[DetectionResult]:
+    boxes = random_boxes(width, height, count)
+    return [
+        DetectionResult(
+            class_name=STUB_NAMES[int(box.cls.array[0])],
+            confidence=float(box.conf.array[0]),
+            bbox=[float(v) for v in box.xyxy.array[0]],
+            color=get_color_for_class(int(box.cls.array[0])),
+        )
+        for box in boxes
+    ]
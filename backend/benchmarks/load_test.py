@@ -0,0 +1,324 @@
+"""HTTP load test for the detection API.
+
+Runs each scenario at a fixed concurrency against a local app instance and
+reports latency percentiles and throughput, as a table on stdout and as JSON
+for tracking regressions between releases.
+
+Start a throwaway server on SQLite and benchmark it (run from ``backend/``)::
+
+    python -m benchmarks.load_test --spawn --concurrency 8 --requests 200 --output bench.json
+
+or point it at an instance that is already running against a local Postgres::
+
+    python -m benchmarks.load_test --base-url http://localhost:8000 --scenarios detect,export
+
+Scenarios:
+
+* ``detect``          POST /api/detect with a distinct synthetic image per request
+* ``upload_analyze``  POST /api/upload, POST /api/analyze/{id}, poll until done
+* ``analyses``        GET /api/analyses
+* ``export``          GET /api/export/{id} (YOLO and COCO) over pre-analyzed files
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks.synthetic import create_test_image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = ("detect", "upload_analyze", "analyses", "export")
+
+
+@dataclass
+class ScenarioResult:
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int = 0
+    duration_seconds: float = 0.0
+    throughput_rps: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    status_codes: Dict[str, int] = field(default_factory=dict)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(v * 1000 for v in latencies)
+    if not values:
+        return {}
+    return {
+        "min": round(values[0], 2),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2),
+    }
+
+
+class LoadTester:
+    def __init__(self, base_url: str, image_size: int, timeout: float):
+        self.api = base_url.rstrip("/") + "/api"
+        self.width = image_size
+        self.height = image_size * 3 // 4
+        self.timeout = timeout
+        self._seeds = itertools.count(int(time.time()))
+        self._local = threading.local()
+        self.export_ids: List[str] = []
+
+    @property
+    def session(self) -> requests.Session:
+        # One keep-alive session per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _image(self):
+        seed = next(self._seeds)
+        return ("bench.jpg", create_test_image(self.width, self.height, seed=seed), "image/jpeg")
+
+    def detect(self, i: int) -> requests.Response:
+        return self.session.post(f"{self.api}/detect", files={"file": self._image()}, timeout=self.timeout)
+
+    def upload_analyze(self, i: int) -> requests.Response:
+        upload = self.session.post(f"{self.api}/upload", files={"file": self._image()}, timeout=self.timeout)
+        if upload.status_code != 200:
+            return upload
+        file_id = upload.json()["file_id"]
+        started = self.session.post(f"{self.api}/analyze/{file_id}", timeout=self.timeout)
+        if started.status_code != 200:
+            return started
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            status = self.session.get(f"{self.api}/analysis/{file_id}", timeout=self.timeout)
+            if status.status_code != 200 or status.json().get("status") in {"done", "error"}:
+                return status
+            time.sleep(0.02)
+        raise TimeoutError(f"analysis of {file_id} did not finish in {self.timeout}s")
+
+    def analyses(self, i: int) -> requests.Response:
+        return self.session.get(f"{self.api}/analyses", timeout=self.timeout)
+
+    def export(self, i: int) -> requests.Response:
+        file_id = self.export_ids[i % len(self.export_ids)]
+        fmt = "yolo" if i % 2 == 0 else "coco"
+        return self.session.get(f"{self.api}/export/{file_id}", params={"format": fmt}, timeout=self.timeout)
+
+    def prepare(self, scenarios: List[str], export_files: int) -> None:
+        """Seed the data the read-only scenarios need"""
+        if "export" in scenarios or "analyses" in scenarios:
+            for i in range(export_files):
+                response = self.detect(i)
+                response.raise_for_status()
+                self.export_ids.append(response.json()["id"])
+
+    def run(self, name: str, total: int, concurrency: int, warmup: int) -> ScenarioResult:
+        call: Callable[[int], requests.Response] = getattr(self, name)
+        for i in range(warmup):
+            call(i)
+
+        latencies: List[float] = []
+        status_codes: Dict[str, int] = {}
+        errors = 0
+        lock = threading.Lock()
+
+        def one(i: int) -> None:
+            nonlocal errors
+            start = time.perf_counter()
+            try:
+                response = call(i)
+                code = str(response.status_code)
+                ok = response.status_code < 400
+                if ok and name == "upload_analyze":
+                    ok = response.json().get("status") == "done"
+            except Exception as e:
+                code, ok = type(e).__name__, False
+            elapsed = time.perf_counter() - start
+            with lock:
+                status_codes[code] = status_codes.get(code, 0) + 1
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(total)))
+        duration = time.perf_counter() - start
+
+        return ScenarioResult(
+            scenario=name,
+            concurrency=concurrency,
+            requests=total,
+            errors=errors,
+            duration_seconds=round(duration, 3),
+            throughput_rps=round(len(latencies) / duration, 2) if duration else 0.0,
+            latency_ms=summarize(latencies),
+            status_codes=status_codes,
+        )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _create_schema(database_url: str) -> None:
+    """Create tables on a fresh stand-in database (Postgres instances should be migrated instead)"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    import models  # noqa: F401  (registers the tables on Base.metadata)
+    from base import Base
+
+    async def create() -> None:
+        engine = create_async_engine(database_url)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await engine.dispose()
+
+    asyncio.run(create())
+
+
+def spawn_server(database_url: str, workdir: Path, port: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        BLOB_STORAGE_DIR=str(workdir / "blobs"),
+    )
+    # Application logs go to a file so they do not interleave with the report
+    log = open(workdir / "server.log", "wb")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 120  # first start may download model weights
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}, see {workdir / 'server.log'}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("server did not become ready")
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: List[ScenarioResult]) -> None:
+    print(f"{'scenario':<16}{'conc':>6}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        lat = r.latency_ms
+        print(
+            f"{r.scenario:<16}{r.concurrency:>6}{r.requests:>7}{r.errors:>6}{r.throughput_rps:>9.1f}"
+            f"{lat.get('p50', 0):>10.1f}{lat.get('p95', 0):>10.1f}{lat.get('p99', 0):>10.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--base-url", help="benchmark an already running instance")
+    target.add_argument("--spawn", action="store_true", help="start a local uvicorn instance for the run")
+    parser.add_argument("--database-url", help="database for --spawn (default: a fresh SQLite file)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests per scenario")
+    parser.add_argument("--image-size", type=int, default=640, help="synthetic image width; height is 3/4 of it")
+    parser.add_argument("--export-files", type=int, default=10, help="files analyzed up front for export/analyses")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="write JSON results here (default: stdout only)")
+    parser.add_argument("--keep", action="store_true", help="keep the spawned server's database, blobs and log")
+    args = parser.parse_args(argv)
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = None
+    workdir = Path(tempfile.mkdtemp(prefix="visionflow-bench-"))
+    try:
+        base_url = args.base_url
+        database_url = args.database_url
+        if args.spawn:
+            database_url = database_url or f"sqlite+aiosqlite:///{workdir / 'bench.db'}"
+            _create_schema(database_url)
+            port = _free_port()
+            server = spawn_server(database_url, workdir, port)
+            base_url = f"http://127.0.0.1:{port}"
+
+        tester = LoadTester(base_url, args.image_size, args.timeout)
+        tester.prepare(scenarios, args.export_files)
+        results = [tester.run(name, args.requests, args.concurrency, args.warmup) for name in scenarios]
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if args.keep:
+            print(f"kept {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_table(results)
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_revision": _git_revision(),
+            "base_url": base_url,
+            "database": "spawned" if args.spawn else "external",
+            "database_url": database_url.split("@")[-1] if database_url else None,
+            "image_size": [tester.width, tester.height],
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": [asdict(r) for r in results],
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return 1 if any(r.errors for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Live stream client for ``/api/streams/ws``.
+
+Pushes frames from a video file, RTSP URL, camera index or synthetic images
+over one or more WebSocket connections at a target frame rate, and reports
+per stream the FPS achieved, frames the server dropped in favour of newer
+ones, and end-to-end latency (send to result, measured here).
+
+Run from ``backend/`` against a running instance::
+
+    python -m benchmarks.stream_client --url ws://localhost:8000/api/streams/ws --source clip.mp4 --fps 15
+    python -m benchmarks.stream_client --url ws://localhost:8000/api/streams/ws --streams 8 --seconds 30
+"""
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import websockets
+
+from benchmarks.synthetic import create_test_image
+
+
+@dataclass
+class StreamReport:
+    stream: int
+    sent: int = 0
+    results: int = 0
+    errors: int = 0
+    reused: int = 0
+    fps: float = 0.0
+    latency_ms: Dict[str, float] = field(default_factory=dict)
+    server: Optional[Dict] = None  # last stats message from the server
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {f"p{q}": round(float(np.percentile(values, q)), 1) for q in (50, 95, 99)}
+
+
+class FrameSource:
+    """JPEG frames from OpenCV's capture (file, RTSP or camera), or synthetic ones"""
+
+    def __init__(self, source: Optional[str], width: int, quality: int):
+        self.capture = None
+        self.quality = quality
+        if source is not None:
+            self.capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+            if not self.capture.isOpened():
+                raise SystemExit(f"cannot open {source}")
+        else:
+            self.frames = [create_test_image(width, width * 3 // 4, seed=seed) for seed in range(30)]
+            self.index = 0
+
+    def read(self) -> Optional[bytes]:
+        if self.capture is None:
+            self.index += 1
+            return self.frames[self.index % len(self.frames)]
+        ok, frame = self.capture.read()
+        if not ok:
+            # Loop files so a short clip can drive a long run
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+            if not ok:
+                return None
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        return encoded.tobytes() if ok else None
+
+
+async def run_stream(index: int, args: argparse.Namespace) -> StreamReport:
+    report = StreamReport(stream=index)
+    source = FrameSource(args.source, args.width, args.quality)
+    sent_at: Dict[int, float] = {}
+    latencies: List[float] = []
+    result_times: List[float] = []
+    async with websockets.connect(args.url, max_size=None) as ws:
+        hello = json.loads(await ws.recv())
+        if hello.get("type") != "hello":
+            raise SystemExit(f"unexpected greeting: {hello}")
+
+        async def receive() -> None:
+            async for raw in ws:
+                message = json.loads(raw)
+                if message.get("type") == "stats":
+                    report.server = message
+                    continue
+                now = time.perf_counter()
+                started = sent_at.pop(message["n"], None)
+                # Frames the server replaced with a newer one never get an answer
+                for n in [n for n in sent_at if n < message["n"]]:
+                    del sent_at[n]
+                if "error" in message:
+                    report.errors += 1
+                    continue
+                report.results += 1
+                report.reused += message.get("reused", False)
+                result_times.append(now)
+                if started is not None:
+                    latencies.append((now - started) * 1000)
+
+        receiver = asyncio.create_task(receive())
+        interval = 1 / args.fps if args.fps > 0 else 0.0
+        end = time.perf_counter() + args.seconds
+        next_send = time.perf_counter()
+        while time.perf_counter() < end:
+            frame = await asyncio.get_running_loop().run_in_executor(None, source.read)
+            if frame is None:
+                break
+            report.sent += 1
+            sent_at[report.sent] = time.perf_counter()
+            await ws.send(frame)
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        # Give the last frames time to come back
+        await asyncio.sleep(1.0)
+        receiver.cancel()
+
+    if len(result_times) > 1:
+        report.fps = round((len(result_times) - 1) / (result_times[-1] - result_times[0]), 2)
+    report.latency_ms = _percentiles(latencies)
+    return report
+
+
+async def run(args: argparse.Namespace) -> List[StreamReport]:
+    return await asyncio.gather(*(run_stream(i, args) for i in range(args.streams)))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="ws://localhost:8000/api/streams/ws", help="stream endpoint, with any query parameters")
+    parser.add_argument("--source", help="video file, RTSP URL or camera index (default: synthetic frames)")
+    parser.add_argument("--streams", type=int, default=1, help="concurrent connections, each reading its own capture")
+    parser.add_argument("--fps", type=float, default=15.0, help="frames sent per second per stream; 0 sends as fast as possible")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--width", type=int, default=640, help="synthetic frame width")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality for captured frames")
+    parser.add_argument("--output", help="write JSON results here")
+    args = parser.parse_args(argv)
+
+    reports = asyncio.run(run(args))
+    print(f"{'stream':>6} {'sent':>6} {'results':>8} {'reused':>7} {'fps':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in reports:
+        print(
+            f"{r.stream:>6} {r.sent:>6} {r.results:>8} {r.reused:>7} {r.fps:>7.1f} "
+            f"{r.latency_ms.get('p50', 0):>8.1f} {r.latency_ms.get('p95', 0):>8.1f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([asdict(r) for r in reports], f, indent=2)
+    return 0 if all(r.results for r in reports) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,33 @@
+"""Synthetic test images for benchmarks.
+
+Same scene as ``create_test_image`` in the repository's smoke tests, with an
+optional seed that perturbs a few pixels so every request uploads distinct
+bytes; otherwise upload deduplication would turn most of a load test into
+cache hits.
+"""
+import io
+import random
+from typing import Optional
+
+from PIL import Image, ImageDraw
+
+
+def create_test_image(width: int = 640, height: int = 480, format: str = "JPEG", seed: Optional[int] = None) -> bytes:
+    """Create a test image with some shapes for object detection"""
+    img = Image.new("RGB", (width, height), color="white")
+    draw = ImageDraw.Draw(img)
+
+    # Draw some shapes that might be detected, scaled to the image size
+    sx, sy = width / 640, height / 480
+    draw.rectangle([50 * sx, 50 * sy, 150 * sx, 150 * sy], fill="red", outline="black", width=2)
+    draw.ellipse([200 * sx, 100 * sy, 300 * sx, 200 * sy], fill="blue", outline="black", width=2)
+    draw.rectangle([400 * sx, 200 * sy, 500 * sx, 350 * sy], fill="green", outline="black", width=2)
+
+    if seed is not None:
+        rng = random.Random(seed)
+        for _ in range(8):
+            img.putpixel((rng.randrange(width), rng.randrange(height)), (rng.randrange(256),) * 3)
+
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format=format)
+    return img_buffer.getvalue()
@@ -0,0 +1,200 @@
+"""Bulk export of detections for offline analysis.
+
+``GET /api/admin/exports/detections`` streams the ``detections`` table joined
+with file metadata as Parquet (default) or an Arrow IPC stream. Rows come
+from a server-side cursor ``row_group_size`` at a time; each chunk becomes
+one Parquet row group (or one Arrow record batch) and is sent as soon as it
+is encoded, so memory stays flat however many rows match.
+
+Filters: ``since``/``until`` on the detection time (served by
+``ix_detections_processed_at_class_name``), ``class_name`` (repeatable),
+``min_confidence`` and ``user_id``.
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from admin import require_admin
+from database import AsyncSessionLocal
+from executor import run_cpu
+from models import Detection, File as FileModel
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # bulk export is optional
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin/exports", dependencies=[Depends(require_admin)])
+
+DEFAULT_ROW_GROUP_SIZE = 65536
+MAX_ROW_GROUP_SIZE = 1_000_000
+
+FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", ".arrows"),
+}
+
+COLUMNS = (
+    Detection.id.label("detection_id"),
+    Detection.file_id,
+    FileModel.filename,
+    FileModel.filetype,
+    FileModel.user_id,
+    FileModel.uploaded_at,
+    FileModel.model_version,
+    FileModel.width,
+    FileModel.height,
+    Detection.class_name,
+    Detection.confidence,
+    Detection.x_min,
+    Detection.y_min,
+    Detection.x_max,
+    Detection.y_max,
+    Detection.processed_at,
+)
+
+
+def _schema() -> "pa.Schema":
+    return pa.schema([
+        ("detection_id", pa.string()),
+        ("file_id", pa.string()),
+        ("filename", pa.string()),
+        ("filetype", pa.string()),
+        ("user_id", pa.string()),
+        ("uploaded_at", pa.timestamp("us")),
+        ("model_version", pa.string()),
+        ("width", pa.int32()),
+        ("height", pa.int32()),
+        ("class_name", pa.dictionary(pa.int32(), pa.string())),
+        ("confidence", pa.float32()),
+        ("x_min", pa.float32()),
+        ("y_min", pa.float32()),
+        ("x_max", pa.float32()),
+        ("y_max", pa.float32()),
+        ("processed_at", pa.timestamp("us")),
+    ])
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _record_batch(rows: Sequence[Any], schema: "pa.Schema") -> "pa.RecordBatch":
+    columns = list(zip(*rows))
+    arrays = []
+    for field, values in zip(schema, columns):
+        if field.name in ("detection_id", "file_id", "user_id"):
+            values = [str(v) if v is not None else None for v in values]
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(values, pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _Encoder:
+    def __init__(self, export_format: str):
+        self.schema = _schema()
+        self.sink = _ChunkSink()
+        if export_format == "parquet":
+            self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+        self.parquet = export_format == "parquet"
+
+    def encode(self, rows: Sequence[Any]) -> bytes:
+        batch = _record_batch(rows, self.schema)
+        if self.parquet:
+            # One row group per cursor chunk
+            self.writer.write_table(pa.Table.from_batches([batch]), row_group_size=len(rows))
+        else:
+            self.writer.write_batch(batch)
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+async def _stream(stmt, export_format: str, row_group_size: int) -> AsyncIterator[bytes]:
+    encoder = _Encoder(export_format)
+    rows_written = 0
+    # The session lives as long as the response body, not the request handler
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=row_group_size))
+        async for rows in result.partitions(row_group_size):
+            yield await run_cpu(encoder.encode, rows)
+            rows_written += len(rows)
+    yield await run_cpu(encoder.close)
+    logger.info(f"Bulk export streamed {rows_written} detections as {export_format}")
+
+
+@router.get("/detections")
+async def export_detections(
+    format: str = "parquet",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    class_name: Optional[List[str]] = Query(None),
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    user_id: Optional[uuid.UUID] = None,
+    row_group_size: int = Query(DEFAULT_ROW_GROUP_SIZE, ge=1000, le=MAX_ROW_GROUP_SIZE),
+):
+    """Stream matching detections with their file metadata as Parquet or Arrow IPC"""
+    if pa is None:
+        raise HTTPException(status_code=501, detail="Bulk export needs pyarrow installed")
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+
+    stmt = select(*COLUMNS).join(FileModel, FileModel.id == Detection.file_id)
+    if since is not None:
+        stmt = stmt.where(Detection.processed_at >= since)
+    if until is not None:
+        stmt = stmt.where(Detection.processed_at < until)
+    if class_name:
+        stmt = stmt.where(Detection.class_name.in_(class_name))
+    if min_confidence is not None:
+        stmt = stmt.where(Detection.confidence >= min_confidence)
+    if user_id is not None:
+        stmt = stmt.where(FileModel.user_id == user_id)
+    stmt = stmt.order_by(Detection.processed_at)
+
+    media_type, extension = FORMATS[format]
+    filename = f"detections-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}{extension}"
+    return StreamingResponse(
+        _stream(stmt, format, row_group_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
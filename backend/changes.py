@@ -0,0 +1,154 @@
+"""Change log behind ``GET /api/changes``.
+
+Every write that changes what a client shows for a file (upload, analysis,
+detection swap, deletion) appends a row to ``file_changes`` in the same
+transaction. A client keeps the ``seq`` of the last change it applied as its
+cursor and asks only for what came after it, so a sync costs in proportion to
+the churn since the last one rather than to the size of the library.
+
+Sequence numbers are allocated at insert but become visible at commit, so a
+client must never see a change before an earlier-numbered one commits, or
+its cursor would skip it. Feed rows are therefore written by the last
+statement before commit (``stage_changes`` defers them to
+``flush_changes``), under a transaction-level lock that makes writers take
+sequence numbers in commit order. The lock is held only for the commit
+itself. On SQLite the database write lock already does this.
+
+Only the newest entry per file matters to a client; older ones are compacted
+away periodically. Delete entries are kept, being the latest for their file.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, event, exists, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from database import AsyncSessionLocal
+from models import FileChange
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+CHANGE_FEED_COMPACT_INTERVAL_SECONDS = int(os.getenv("CHANGE_FEED_COMPACT_INTERVAL_SECONDS", "3600"))
+COMPACT_BATCH_SIZE = 5000
+MAX_PAGE_SIZE = 500
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+FEED_LOCK_KEY = 0x76666368
+_PENDING_KEY = "pending_file_changes"
+
+
+async def record_changes(db: AsyncSession, file_ids: Iterable[uuid.UUID], op: str = UPSERT) -> None:
+    """Log a change to each file; call as the last statement of the transaction that makes the change"""
+    now = datetime.utcnow()
+    rows = [{"file_id": file_id, "op": op, "changed_at": now} for file_id in file_ids]
+    if not rows:
+        return
+    if db.bind.dialect.name == "postgresql":
+        # Held until commit, so no later sequence number can commit before these
+        await db.execute(select(func.pg_advisory_xact_lock(FEED_LOCK_KEY)))
+    await db.execute(insert(FileChange), rows)
+
+
+def stage_changes(db: AsyncSession, file_ids: Iterable[uuid.UUID], op: str = UPSERT) -> None:
+    """Queue changes for ``flush_changes``, for writes that still have work to do before commit"""
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    for file_id in file_ids:
+        pending[file_id] = op
+
+
+async def flush_changes(db: AsyncSession) -> None:
+    """Log the changes staged in this transaction; call right before commit"""
+    pending: Dict[uuid.UUID, str] = db.info.pop(_PENDING_KEY, {})
+    for op in (UPSERT, DELETE):
+        await record_changes(db, [file_id for file_id, staged in pending.items() if staged == op], op)
+
+
+def parse_cursor(since: Optional[str]) -> int:
+    if not since:
+        return 0
+    try:
+        seq = int(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if seq < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return seq
+
+
+@dataclass
+class ChangePage:
+    upserted: List[uuid.UUID] = field(default_factory=list)  # in change order
+    deleted: List[uuid.UUID] = field(default_factory=list)
+    seqs: Dict[uuid.UUID, int] = field(default_factory=dict)  # file id -> seq of its latest change
+    cursor: int = 0
+    has_more: bool = False
+
+
+async def changed_files(db: AsyncSession, since: int, limit: int) -> ChangePage:
+    """Files whose latest change is after ``since``, oldest change first"""
+    page = ChangePage(cursor=since)
+    latest = func.max(FileChange.seq).label("seq")
+    stmt = (
+        select(FileChange.file_id, latest)
+        .where(FileChange.seq > since)
+        .group_by(FileChange.file_id)
+        .order_by(latest)
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).all()
+    page.has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return page
+
+    ops = dict((await db.execute(
+        select(FileChange.seq, FileChange.op).where(FileChange.seq.in_([row.seq for row in rows]))
+    )).all())
+    for row in rows:
+        page.seqs[row.file_id] = row.seq
+        (page.deleted if ops[row.seq] == DELETE else page.upserted).append(row.file_id)
+    page.cursor = rows[-1].seq
+    return page
+
+
+async def compact_changes() -> int:
+    """Delete entries superseded by a later change to the same file; return how many"""
+    newer = aliased(FileChange)
+    superseded = exists().where(newer.file_id == FileChange.file_id, newer.seq > FileChange.seq)
+    removed = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            seqs = (await db.execute(
+                select(FileChange.seq).where(superseded).limit(COMPACT_BATCH_SIZE)
+            )).scalars().all()
+            if not seqs:
+                return removed
+            await db.execute(delete(FileChange).where(FileChange.seq.in_(seqs)))
+            await db.commit()
+            removed += len(seqs)
+
+
+async def compaction_loop() -> None:
+    while True:
+        try:
+            removed = await compact_changes()
+            if removed:
+                logger.info(f"Compacted {removed} superseded file changes")
+        except Exception as e:
+            logger.error(f"Change log compaction failed: {e}")
+        await asyncio.sleep(CHANGE_FEED_COMPACT_INTERVAL_SECONDS)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
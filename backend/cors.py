@@ -0,0 +1,157 @@
+"""CORS as a single pure-ASGI layer.
+
+The allowlist and origin regex are compiled once at startup. Preflight
+responses depend only on (origin, requested method, requested headers), so
+their header blocks are built once and replayed; actual requests only get a
+few precomputed headers appended to the response start message.
+
+Browsers do not apply CORS to WebSockets, and any page can open one, so
+WebSocket handshakes from an Origin outside the allowlist are refused here
+before the endpoint can accept them.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_ALLOWED_ORIGINS = "http://localhost:3000,https://vision-flow-alpha.vercel.app"
+# Vercel deployment previews
+DEFAULT_ALLOWED_ORIGIN_REGEX = r"https://.*\.vercel\.app"
+
+ALLOWED_ORIGINS = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", DEFAULT_ALLOWED_ORIGINS).split(",") if o.strip()]
+ALLOWED_ORIGIN_REGEX = os.getenv("ALLOWED_ORIGIN_REGEX", DEFAULT_ALLOWED_ORIGIN_REGEX)
+
+ALLOWED_METHODS = ("GET", "POST", "PUT", "DELETE", "OPTIONS")
+EXPOSED_HEADERS = ("Content-Disposition", "Content-Length", "ETag")
+MAX_AGE = 3600
+PREFLIGHT_CACHE_SIZE = 1024
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+class CORSMiddleware:
+    """Answer preflights and add CORS headers for allowlisted origins.
+
+    Requests from other origins pass through untouched (browsers then block
+    the response); their preflights are rejected with 400.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        allow_origins: Sequence[str] = ALLOWED_ORIGINS,
+        allow_origin_regex: Optional[str] = ALLOWED_ORIGIN_REGEX,
+        allow_methods: Sequence[str] = ALLOWED_METHODS,
+        expose_headers: Sequence[str] = EXPOSED_HEADERS,
+        max_age: int = MAX_AGE,
+    ):
+        self.app = app
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_all = "*" in self.allow_origins
+        self.origin_regex = re.compile(allow_origin_regex) if allow_origin_regex else None
+        self.allow_methods = frozenset(m.upper() for m in allow_methods)
+        self._methods_value = ", ".join(allow_methods).encode()
+        self._max_age_value = str(max_age).encode()
+        self._simple_headers: Headers = [
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-expose-headers", ", ".join(expose_headers).encode()),
+            (b"vary", b"Origin"),
+        ]
+        self._origin_cache: Dict[bytes, bool] = {}
+        self._preflight_cache: Dict[Tuple[bytes, bytes, bytes], Headers] = {}
+
+    def is_allowed(self, origin: bytes) -> bool:
+        allowed = self._origin_cache.get(origin)
+        if allowed is None:
+            value = origin.decode("latin-1")
+            allowed = (
+                self.allow_all
+                or value in self.allow_origins
+                or (self.origin_regex is not None and self.origin_regex.fullmatch(value) is not None)
+            )
+            if len(self._origin_cache) >= PREFLIGHT_CACHE_SIZE:
+                self._origin_cache.clear()
+            self._origin_cache[origin] = allowed
+        return allowed
+
+    def _preflight_headers(self, origin: bytes, method: bytes, request_headers: bytes) -> Optional[Headers]:
+        key = (origin, method, request_headers)
+        headers = self._preflight_cache.get(key)
+        if headers is not None:
+            return headers
+        if not self.is_allowed(origin) or method.decode("latin-1").upper() not in self.allow_methods:
+            return None
+
+        headers = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-methods", self._methods_value),
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-max-age", self._max_age_value),
+            (b"vary", b"Origin"),
+            (b"content-length", b"0"),
+        ]
+        if request_headers:
+            # Credentialed requests cannot use "*", so echo what was asked for
+            headers.append((b"access-control-allow-headers", request_headers))
+        if len(self._preflight_cache) >= PREFLIGHT_CACHE_SIZE:
+            self._preflight_cache.clear()
+        self._preflight_cache[key] = headers
+        return headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = method = request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and method is not None:
+            headers = self._preflight_headers(origin, method, request_headers or b"")
+            if headers is None:
+                await send({
+                    "type": "http.response.start",
+                    "status": 400,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"vary", b"Origin")],
+                })
+                await send({"type": "http.response.body", "body": b"Disallowed CORS request"})
+                return
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not self.is_allowed(origin):
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [(b"access-control-allow-origin", origin), *self._simple_headers]
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *cors_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    async def _websocket(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Clients outside a browser (cameras, scripts) send no Origin and are let through
+        origin = next((value for name, value in scope["headers"] if name == b"origin"), None)
+        if origin is not None and not self.is_allowed(origin):
+            # Closing before the handshake is accepted answers it with 403
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        await self.app(scope, receive, send)
@@ -23,6 +23,15 @@ engine = create_async_engine(DATABASE_URL_ASYNC, echo=False, future=True)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 
+def dialect_insert(session: AsyncSession, model):
+    """Return an INSERT for ``model`` that supports ``on_conflict_do_nothing`` on this backend."""
+    if session.bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """FastAPI dependency that provides an async DB session."""
     async with AsyncSessionLocal() as session:
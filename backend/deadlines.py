@@ -0,0 +1,79 @@
+"""Deadlines for requests and background jobs.
+
+A ``Deadline`` travels with a unit of work through the pipeline. The work
+calls ``check()`` between stages and stops as soon as the deadline has passed
+or, for HTTP requests, the client has disconnected. The inference scheduler
+also drops queued work whose deadline expires before a model thread is free.
+
+Clients set their own budget with ``X-Request-Timeout`` (seconds), capped at
+the server maximum for the route.
+"""
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, Request
+
+DETECT_TIMEOUT_SECONDS = float(os.getenv("DETECT_TIMEOUT_SECONDS", "120"))
+# The frontend stops polling an analysis after five minutes
+ANALYSIS_JOB_TTL_SECONDS = float(os.getenv("ANALYSIS_JOB_TTL_SECONDS", "300"))
+
+# Non-standard, but widely used for "client closed request"
+CLIENT_CLOSED_REQUEST = 499
+
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self, stage: str):
+        super().__init__(status_code=504, detail=f"Deadline exceeded before {stage}")
+
+
+class ClientDisconnected(HTTPException):
+    def __init__(self, stage: str):
+        super().__init__(status_code=CLIENT_CLOSED_REQUEST, detail=f"Client disconnected before {stage}")
+
+
+@dataclass
+class Deadline:
+    expires_at: Optional[float] = None  # time.monotonic() value
+    request: Optional[Request] = None
+
+    @classmethod
+    def after(cls, seconds: Optional[float], request: Optional[Request] = None) -> "Deadline":
+        return cls(time.monotonic() + seconds if seconds is not None else None, request)
+
+    @classmethod
+    def from_request(cls, request: Request, maximum: float, attach: bool = True) -> "Deadline":
+        """Deadline from X-Request-Timeout, capped at ``maximum``.
+
+        ``attach`` ties the deadline to the client connection; background jobs
+        outlive their request and pass False.
+        """
+        seconds = maximum
+        header = request.headers.get("x-request-timeout")
+        if header:
+            try:
+                seconds = float(header)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid X-Request-Timeout")
+            # NaN compares false with everything and would never expire
+            if not math.isfinite(seconds) or seconds <= 0:
+                raise HTTPException(status_code=400, detail="Invalid X-Request-Timeout")
+            seconds = min(seconds, maximum)
+        return cls.after(seconds, request if attach else None)
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    async def check(self, stage: str) -> None:
+        """Raise if the work should stop before ``stage``"""
+        if self.expired():
+            raise DeadlineExceeded(stage)
+        if self.request is not None and await self.request.is_disconnected():
+            raise ClientDisconnected(stage)
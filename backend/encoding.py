@@ -0,0 +1,181 @@
+"""Output encoding for annotated images.
+
+Annotated images used to be written as default-quality JPEG regardless of the
+client. ``ImageEncoding`` describes the container and its knobs, and
+``negotiate_encoding`` picks one from an explicit ``format=`` parameter or the
+request's ``Accept`` header, falling back to the server defaults below.
+"""
+import base64
+import os
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+MEDIA_TYPES: Dict[str, str] = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "png": "image/png",
+    "avif": "image/avif",
+}
+
+EXTENSIONS: Dict[str, str] = {
+    "jpeg": ".jpg",
+    "webp": ".webp",
+    "png": ".png",
+    "avif": ".avif",
+}
+
+FORMAT_ALIASES: Dict[str, str] = {
+    "jpg": "jpeg",
+    "jpeg": "jpeg",
+    "webp": "webp",
+    "png": "png",
+    "avif": "avif",
+}
+
+# Order used when the Accept header ranks several image types equally
+PREFERENCE = ["avif", "webp", "jpeg", "png"]
+
+
+@dataclass(frozen=True)
+class ImageEncoding:
+    format: str = "jpeg"
+    quality: int = 90  # JPEG / WebP / AVIF quality, 1-100
+    progressive: bool = False  # JPEG only
+    compression: int = 3  # PNG zlib level, 0-9
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS[self.format]
+
+    def imencode_params(self) -> List[int]:
+        """Return the ``cv2.imencode`` parameter list for this encoding"""
+        if self.format == "jpeg":
+            return [
+                cv2.IMWRITE_JPEG_QUALITY, self.quality,
+                cv2.IMWRITE_JPEG_PROGRESSIVE, int(self.progressive),
+                cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+            ]
+        if self.format == "webp":
+            return [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        if self.format == "png":
+            return [cv2.IMWRITE_PNG_COMPRESSION, self.compression]
+        if self.format == "avif":
+            return [cv2.IMWRITE_AVIF_QUALITY, self.quality]
+        return []
+
+
+def _env_int(name: str, default: int, low: int, high: int) -> int:
+    return max(low, min(high, int(os.getenv(name, default))))
+
+
+DEFAULT_ENCODING = ImageEncoding(
+    format=FORMAT_ALIASES.get(os.getenv("IMAGE_OUTPUT_FORMAT", "jpeg").lower(), "jpeg"),
+    quality=_env_int("IMAGE_OUTPUT_QUALITY", 85, 1, 100),
+    progressive=os.getenv("IMAGE_JPEG_PROGRESSIVE", "false").lower() in {"1", "true", "yes"},
+    compression=_env_int("IMAGE_PNG_COMPRESSION", 3, 0, 9),
+)
+
+
+@lru_cache(maxsize=None)
+def is_supported(fmt: str) -> bool:
+    """Check once whether this OpenCV build can write the given format"""
+    if fmt == "avif" and not hasattr(cv2, "IMWRITE_AVIF_QUALITY"):
+        return False
+    try:
+        ok, _ = cv2.imencode(EXTENSIONS[fmt], np.zeros((8, 8, 3), np.uint8))
+        return bool(ok)
+    except cv2.error:
+        return False
+
+
+def _parse_accept(accept: str) -> List[str]:
+    """Return supported formats from an Accept header, best first"""
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media, _, params = part.strip().partition(";")
+        media = media.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q <= 0:
+            continue
+        for fmt, mt in MEDIA_TYPES.items():
+            if media == mt and is_supported(fmt):
+                ranked.append((-q, PREFERENCE.index(fmt), position, fmt))
+    return [fmt for *_, fmt in sorted(ranked)]
+
+
+def negotiate_encoding(
+    format: Optional[str] = None,
+    accept: Optional[str] = None,
+    quality: Optional[int] = None,
+    default: ImageEncoding = DEFAULT_ENCODING,
+) -> ImageEncoding:
+    """Pick an output encoding.
+
+    An explicit ``format`` wins; otherwise the best image type named in
+    ``accept`` is used. Wildcards are ignored so that generic ``*/*`` clients
+    keep the server default.
+    """
+    encoding = default
+    if format:
+        fmt = FORMAT_ALIASES.get(format.lower())
+        if fmt is None or not is_supported(fmt):
+            raise ValueError(f"Unsupported image format: {format}")
+        encoding = replace(encoding, format=fmt)
+    elif accept:
+        accepted = _parse_accept(accept)
+        if accepted:
+            encoding = replace(encoding, format=accepted[0])
+    if quality is not None:
+        if not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        encoding = replace(encoding, quality=quality)
+    return encoding
+
+
+def encode_image(image_array: np.ndarray, encoding: ImageEncoding = DEFAULT_ENCODING) -> bytes:
+    """Encode an image array with the given encoding"""
+    is_success, buffer = cv2.imencode(encoding.extension, image_array, encoding.imencode_params())
+    if not is_success:
+        raise ValueError(f"Failed to encode image as {encoding.format}")
+    return buffer.tobytes()
+
+
+def sniff_media_type(data: bytes) -> Optional[str]:
+    """Return the media type of encoded image bytes from their magic number"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    if data[:2] == b"BM":
+        return "image/bmp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    return None
+
+
+def stored_media_type(image_base64: Optional[str]) -> str:
+    """Sniff the media type of a stored base64 image from its first bytes"""
+    if not image_base64:
+        return DEFAULT_ENCODING.media_type
+    return sniff_media_type(base64.b64decode(image_base64[:32])) or "image/jpeg"
@@ -0,0 +1,25 @@
+"""Shared thread pool for CPU-bound pipeline stages.
+
+OpenCV releases the GIL while decoding, drawing and encoding, so running
+those stages here keeps the event loop free to accept other requests.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.cpu_count() or 1))
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="visionflow-cpu")
+
+
+async def run_cpu(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking function on the CPU executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, partial(func, *args, **kwargs))
+
+
+def queue_depth() -> int:
+    """Number of submitted tasks still waiting for a free worker"""
+    return cpu_executor._work_queue.qsize()
@@ -0,0 +1,136 @@
+"""Model loading, graph optimizations and warm-up.
+
+ultralytics and torch initialize lazily: the first prediction builds the
+predictor, fuses conv/bn layers, allocates buffers and picks kernels for each
+input shape. Running dummy batches at start moves that cost out of the first
+real requests; ``/ready`` reports ready only once it has finished.
+
+Configuration (environment):
+
+* ``MODEL_WARMUP``               run warm-up at startup (default on)
+* ``MODEL_WARMUP_BATCH_SIZES``   batch sizes to warm, e.g. ``1,8`` (default 1 and BATCH_INFERENCE_SIZE)
+* ``MODEL_WARMUP_IMGSZ``         square dummy image size (default 640)
+* ``MODEL_WARMUP_ITERATIONS``    passes per batch size (default 2)
+* ``MODEL_OPTIMIZE``             ``none`` (default), ``fuse``, ``torchscript`` or ``compile``
+* ``TORCH_NUM_THREADS``          intra-op threads (default: CPUs / WEB_CONCURRENCY)
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from ultralytics import YOLO
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() in {"1", "true", "yes"}
+MODEL_WARMUP_BATCH_SIZES = [
+    int(size) for size in os.getenv("MODEL_WARMUP_BATCH_SIZES", f"1,{os.getenv('BATCH_INFERENCE_SIZE', '8')}").split(",")
+    if size.strip()
+]
+MODEL_WARMUP_IMGSZ = int(os.getenv("MODEL_WARMUP_IMGSZ", "640"))
+MODEL_WARMUP_ITERATIONS = int(os.getenv("MODEL_WARMUP_ITERATIONS", "2"))
+MODEL_OPTIMIZE = os.getenv("MODEL_OPTIMIZE", "none").lower()
+
+# Each uvicorn worker process loads its own model; split the cores between them
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)))
+
+
+@dataclass
+class ModelState:
+    weights: str = ""
+    optimization: str = "none"
+    torch_threads: Optional[int] = None
+    warmed_up: bool = False
+    warmup_seconds: Optional[float] = None
+    warmup_batches: Dict[str, float] = field(default_factory=dict)  # batch size -> seconds of the last pass
+    error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.warmed_up or not MODEL_WARMUP
+
+
+model_state = ModelState()
+
+
+def configure_torch_threads(num_threads: int = TORCH_NUM_THREADS) -> Optional[int]:
+    try:
+        import torch
+    except ImportError:
+        return None
+    torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+
+def _optimize(model: Any, optimization: str) -> Any:
+    if optimization == "fuse":
+        model.fuse()
+    elif optimization == "torchscript":
+        # Trace once at the warm-up size and serve the traced graph
+        path = model.export(format="torchscript", imgsz=MODEL_WARMUP_IMGSZ)
+        model = YOLO(path, task=model.task)
+    elif optimization == "compile":
+        import torch
+
+        model.fuse()
+        model.model = torch.compile(model.model)
+    elif optimization != "none":
+        raise ValueError(f"Unknown MODEL_OPTIMIZE value: {optimization}")
+    return model
+
+
+def load_model(weights: str, optimization: str = MODEL_OPTIMIZE) -> Any:
+    """Load YOLO weights, apply the configured optimization and thread settings"""
+    model_state.weights = weights
+    model_state.torch_threads = configure_torch_threads()
+    model = YOLO(weights)
+    try:
+        model = _optimize(model, optimization)
+        model_state.optimization = optimization
+    except Exception as e:
+        # An optimization that does not apply to these weights must not stop the service
+        logger.warning(f"Model optimization '{optimization}' failed, serving unoptimized weights: {e}")
+    return model
+
+
+def warm_up(model: Any, batch_sizes: List[int] = MODEL_WARMUP_BATCH_SIZES) -> None:
+    """Run dummy batches at every configured size, then mark the model ready"""
+    start = time.perf_counter()
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (MODEL_WARMUP_IMGSZ, MODEL_WARMUP_IMGSZ, 3), dtype=np.uint8)
+    try:
+        for batch_size in batch_sizes:
+            for _ in range(MODEL_WARMUP_ITERATIONS):
+                batch_start = time.perf_counter()
+                model([image] * batch_size if batch_size > 1 else image, verbose=False)
+                model_state.warmup_batches[str(batch_size)] = round(time.perf_counter() - batch_start, 4)
+        model_state.warmed_up = True
+    except Exception as e:
+        model_state.error = str(e)
+        logger.error(f"Model warm-up failed: {e}")
+    model_state.warmup_seconds = round(time.perf_counter() - start, 3)
+    logger.info(f"Model warm-up finished in {model_state.warmup_seconds}s: {model_state.warmup_batches}")
+
+
+def start_warm_up(model: Any, executor: Optional[Executor] = None) -> None:
+    """Warm up off the event loop so the server can answer liveness probes meanwhile.
+
+    Pass the executor that serves model calls so warm-up never runs
+    concurrently with real inference on the same model.
+    """
+    if not MODEL_WARMUP:
+        return
+    if executor is not None:
+        executor.submit(warm_up, model)
+    else:
+        threading.Thread(target=warm_up, args=(model,), name="visionflow-warmup", daemon=True).start()
+
+
+def readiness() -> Dict[str, Any]:
+    return {"ready": model_state.ready, **asdict(model_state)}
@@ -0,0 +1,121 @@
+"""Chunked upload ingestion.
+
+Uploads are copied from the spooled multipart file into blob storage one
+chunk at a time while being hashed and size-checked, so peak memory per
+upload is a single chunk no matter how large the file is. The image type is
+taken from the file's magic bytes, not the client's ``Content-Type``.
+"""
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from encoding import sniff_media_type
+from storage import blob_store
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+MAX_BATCH_BYTES = int(os.getenv("MAX_BATCH_BYTES", 1024 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Room for multipart boundaries and part headers on single-file routes
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@dataclass
+class IngestedBlob:
+    blob_key: str
+    digest: str
+    size: int
+    media_type: str
+
+
+def ingest_fileobj(fileobj: BinaryIO, max_bytes: int = MAX_UPLOAD_BYTES) -> IngestedBlob:
+    """Copy a readable file object into blob storage, validating as it goes"""
+    hasher = hashlib.sha256()
+    size = 0
+    media_type: Optional[str] = None
+    out, tmp_path = blob_store.open_temp()
+    try:
+        with out:
+            while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+                if media_type is None:
+                    media_type = sniff_media_type(chunk[:16])
+                    if media_type is None:
+                        raise HTTPException(status_code=415, detail="Unsupported or invalid image data")
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes} bytes")
+                hasher.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file uploaded")
+        digest = hasher.hexdigest()
+        blob_key = blob_store.commit(tmp_path, digest)
+    except BaseException:
+        blob_store.discard(tmp_path)
+        raise
+    return IngestedBlob(blob_key=blob_key, digest=digest, size=size, media_type=media_type)
+
+
+async def ingest_upload(upload, max_bytes: int = MAX_UPLOAD_BYTES) -> IngestedBlob:
+    """Ingest a FastAPI ``UploadFile`` without loading it into memory"""
+    await upload.seek(0)
+    return await run_in_threadpool(ingest_fileobj, upload.file, max_bytes)
+
+
+class RequestSizeLimitMiddleware:
+    """Reject request bodies over a per-path limit before they are fully received.
+
+    A declared ``Content-Length`` over the limit is refused up front; chunked
+    bodies are counted as they arrive and cut off once they pass the limit.
+    """
+
+    def __init__(self, app, limits: Dict[str, int], default: int = MAX_BATCH_BYTES):
+        self.app = app
+        self.limits = limits
+        self.default = default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in {"POST", "PUT"}:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.limits.get(scope["path"].rstrip("/"), self.default)
+        for name, value in scope["headers"]:
+            if name != b"content-length":
+                continue
+            try:
+                length = int(value)
+            except ValueError:
+                await self._reject(send, 400, "Invalid Content-Length header")
+                return
+            if length > limit:
+                await self._reject(send, 413, f"Request body exceeds {limit} bytes")
+                return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised inside body parsing, so FastAPI turns it into a 413 response
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str) -> None:
+        body = f'{{"detail":"{detail}"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,187 @@
+"""Prometheus metrics for the detection pipeline.
+
+Pipeline code wraps each step in ``stage("...")`` so per-stage latency can be
+compared under real load; HTTP traffic is counted by ``MetricsMiddleware``
+under the route template rather than the raw path to keep label cardinality
+bounded, and a sample of requests (plus every error and slow request) is
+written as one JSON line to the ``access`` logger. Metrics are served in the
+Prometheus text format at ``/metrics``.
+"""
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database import engine
+from executor import queue_depth
+from tracing import span
+
+access_logger = logging.getLogger("access")
+
+ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "0.01"))
+ACCESS_LOG_SLOW_SECONDS = float(os.getenv("ACCESS_LOG_SLOW_SECONDS", "1.0"))
+
+# upload_read, queue_wait, decode, motion_gate, inference, postprocess, render, encode, export_build, db_commit
+STAGE_SECONDS = Histogram(
+    "visionflow_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+REQUESTS = Counter(
+    "visionflow_http_requests_total",
+    "HTTP requests by route template, method and status",
+    ["method", "route", "status"],
+)
+
+REQUEST_SECONDS = Histogram(
+    "visionflow_http_request_seconds",
+    "HTTP request latency by route template",
+    ["method", "route"],
+)
+
+CACHE_LOOKUPS = Counter(
+    "visionflow_cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss)",
+    ["cache", "result"],
+)
+
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "visionflow_cpu_executor_queue_depth",
+    "Tasks waiting for a CPU executor thread",
+)
+EXECUTOR_QUEUE_DEPTH.set_function(queue_depth)
+
+SCHEDULER_QUEUE_DEPTH = Gauge(
+    "visionflow_scheduler_queue_depth",
+    "Model calls waiting in the inference scheduler by priority class",
+    ["priority"],
+)
+
+SCHEDULER_SHED = Counter(
+    "visionflow_scheduler_shed_total",
+    "Model calls rejected or dropped by the scheduler by priority class and reason",
+    ["priority", "reason"],
+)
+
+ACTIVE_STREAMS = Gauge(
+    "visionflow_streams_active",
+    "Open live-stream WebSocket connections",
+)
+
+STREAM_FRAMES = Counter(
+    "visionflow_stream_frames_total",
+    "Live-stream frames by outcome (processed, reused, dropped, failed)",
+    ["outcome"],
+)
+
+STREAM_LATENCY_SECONDS = Histogram(
+    "visionflow_stream_latency_seconds",
+    "Time from receiving a live-stream frame to sending its detections",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+DB_POOL = Gauge(
+    "visionflow_db_pool_connections",
+    "Database connection pool state",
+    ["state"],
+)
+
+
+def _pool_stat(name: str) -> float:
+    # Pools without a given counter (e.g. SQLite's NullPool) report 0
+    method = getattr(engine.sync_engine.pool, name, None)
+    return float(method()) if callable(method) else 0.0
+
+
+for _state, _method in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+    DB_POOL.labels(_state).set_function(lambda name=_method: _pool_stat(name))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block of pipeline work under ``visionflow_stage_seconds{stage=name}``.
+
+    Inside a profiled request the block is also recorded as a trace span.
+    """
+    start = time.perf_counter()
+    try:
+        with span(name):
+            yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def _log_access(scope: Scope, route: str, status: int, duration: float) -> None:
+    if status < 500 and duration < ACCESS_LOG_SLOW_SECONDS and random.random() >= ACCESS_LOG_SAMPLE_RATE:
+        return
+    client = scope.get("client")
+    access_logger.info(json.dumps({
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": route,
+        "status": status,
+        "duration_ms": round(duration * 1000, 2),
+        "client": client[0] if client else None,
+    }))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route request metrics and sampled access logs"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Dict[object, str] = {}
+
+    def _route_for(self, scope: Scope) -> str:
+        route = scope.get("route")
+        if route is not None:
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if not self._route_paths:
+            router = scope["app"].router
+            self._route_paths = {r.endpoint: r.path for r in router.routes if hasattr(r, "endpoint")}
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router fills in the matched endpoint on the shared scope
+            duration = time.perf_counter() - start
+            route = self._route_for(scope)
+            method = scope["method"]
+            REQUESTS.labels(method, route, str(status)).inc()
+            REQUEST_SECONDS.labels(method, route).observe(duration)
+            _log_access(scope, route, status, duration)
@@ -0,0 +1,25 @@
+"""Add blob_key column to files table
+
+Revision ID: add_blob_key_column
+Revises: add_image_data_column
+Create Date: 2026-10-19 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_blob_key_column'
+down_revision = 'add_image_data_column'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Original uploads move to blob storage; image_data keeps the annotated image
+    op.add_column('files', sa.Column('blob_key', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('files', 'blob_key')
@@ -0,0 +1,51 @@
+"""Add blobs table for content-hash deduplication
+
+Revision ID: add_blobs_table
+Revises: add_blob_key_column
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_blobs_table'
+down_revision = 'add_blob_key_column'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('blobs',
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('blob_key', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('media_type', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    op.add_column('files', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('files', sa.Column('model_version', sa.String(), nullable=True))
+
+    # Backfill from blob keys, which end in the sha256 digest
+    op.execute("""
+        INSERT INTO blobs (digest, blob_key, size, media_type, created_at)
+        SELECT DISTINCT ON (split_part(blob_key, '/', 3))
+               split_part(blob_key, '/', 3), blob_key, CAST(size AS BIGINT), filetype, uploaded_at
+        FROM files
+        WHERE blob_key IS NOT NULL
+        ORDER BY split_part(blob_key, '/', 3), uploaded_at
+    """)
+    op.execute("UPDATE files SET content_hash = split_part(blob_key, '/', 3) WHERE blob_key IS NOT NULL")
+
+    op.create_index('ix_files_content_hash', 'files', ['content_hash'])
+    op.create_foreign_key('fk_files_content_hash_blobs', 'files', 'blobs', ['content_hash'], ['digest'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_files_content_hash_blobs', 'files', type_='foreignkey')
+    op.drop_index('ix_files_content_hash', table_name='files')
+    op.drop_column('files', 'model_version')
+    op.drop_column('files', 'content_hash')
+    op.drop_table('blobs')
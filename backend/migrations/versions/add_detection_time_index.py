@@ -0,0 +1,25 @@
+"""Index detections by processing time for stats queries
+
+Revision ID: add_detection_time_index
+Revises: typed_detections_schema
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_detection_time_index'
+down_revision = 'typed_detections_schema'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves time-range filters and per-day class histograms in /api/stats
+    op.create_index('ix_detections_processed_at_class_name', 'detections', ['processed_at', 'class_name'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_detections_processed_at_class_name', table_name='detections')
@@ -0,0 +1,38 @@
+"""Cache generated export artifacts per detection version
+
+Revision ID: add_export_artifacts
+Revises: add_summary_stats_tables
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_export_artifacts'
+down_revision = 'add_summary_stats_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('files', sa.Column('detection_version', sa.Integer(), nullable=False, server_default='0'))
+
+    op.add_column('exports', sa.Column('detection_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('exports', sa.Column('blob_key', sa.String(), nullable=True))
+    op.add_column('exports', sa.Column('etag', sa.String(length=64), nullable=True))
+    op.add_column('exports', sa.Column('size', sa.BigInteger(), nullable=True))
+
+    # Exports were never written before this revision; drop any strays so the unique index applies
+    op.execute("DELETE FROM exports")
+    op.create_index('ux_exports_file_id_format', 'exports', ['file_id', 'format'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_exports_file_id_format', table_name='exports')
+    op.drop_column('exports', 'size')
+    op.drop_column('exports', 'etag')
+    op.drop_column('exports', 'blob_key')
+    op.drop_column('exports', 'detection_version')
+    op.drop_column('files', 'detection_version')
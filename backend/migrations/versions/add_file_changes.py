@@ -0,0 +1,38 @@
+"""Add the file change log behind the change feed
+
+Revision ID: add_file_changes
+Revises: add_reanalysis_campaigns
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_file_changes'
+down_revision = 'add_reanalysis_campaigns'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('file_changes',
+    sa.Column('seq', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('file_id', sa.UUID(), nullable=False),
+    sa.Column('op', sa.String(length=8), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('seq')
+    )
+    op.create_index('ix_file_changes_file_id_seq', 'file_changes', ['file_id', 'seq'], unique=False)
+
+    # Every existing file starts as one upsert, oldest first, so a full sync from cursor 0 sees them all
+    op.execute("""
+        INSERT INTO file_changes (file_id, op, changed_at)
+        SELECT id, 'upsert', uploaded_at FROM files ORDER BY uploaded_at, id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_file_changes_file_id_seq', table_name='file_changes')
+    op.drop_table('file_changes')
@@ -0,0 +1,26 @@
+"""Record the uploader of each file for the retention quota
+
+Revision ID: add_file_owner
+Revises: add_superseded_exports
+Create Date: 2026-10-20 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_file_owner'
+down_revision = 'add_superseded_exports'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('files', sa.Column('owner', sa.String(), nullable=True))
+    op.create_index('ix_files_owner_uploaded_at', 'files', ['owner', 'uploaded_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_owner_uploaded_at', table_name='files')
+    op.drop_column('files', 'owner')
@@ -0,0 +1,43 @@
+"""Track re-analysis campaigns across model versions
+
+Revision ID: add_reanalysis_campaigns
+Revises: add_export_artifacts
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_reanalysis_campaigns'
+down_revision = 'add_export_artifacts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('reanalysis_campaigns',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('model_version', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('batch_size', sa.Integer(), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=False),
+    sa.Column('cursor_uploaded_at', sa.DateTime(), nullable=True),
+    sa.Column('cursor_id', sa.UUID(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('processed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('owner', sa.String(), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reanalysis_campaigns')
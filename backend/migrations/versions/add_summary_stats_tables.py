@@ -0,0 +1,76 @@
+"""Add incrementally maintained detection summary tables
+
+Revision ID: add_summary_stats_tables
+Revises: add_detection_time_index
+Create Date: 2026-10-19 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_summary_stats_tables'
+down_revision = 'add_detection_time_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('file_stats',
+    sa.Column('file_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('object_count', sa.Integer(), nullable=False),
+    sa.Column('class_counts', sa.JSON(), nullable=False),
+    sa.Column('confidence_sums', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('file_id')
+    )
+    op.create_table('daily_class_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('class_name', sa.String(), nullable=False),
+    sa.Column('detection_count', sa.BigInteger(), nullable=False),
+    sa.Column('file_count', sa.BigInteger(), nullable=False),
+    sa.Column('confidence_sum', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'class_name')
+    )
+    op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('files_analyzed', sa.BigInteger(), nullable=False),
+    sa.Column('detection_count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+    # Backfill from existing detections; files without detections have no
+    # summary until they are next analyzed
+    op.execute("""
+        WITH per_class AS (
+            SELECT file_id, class_name, count(*) AS n, sum(confidence) AS conf, min(processed_at) AS first_seen
+            FROM detections
+            GROUP BY file_id, class_name
+        )
+        INSERT INTO file_stats (file_id, day, object_count, class_counts, confidence_sums, updated_at)
+        SELECT file_id, date(min(first_seen)), sum(n),
+               json_object_agg(class_name, n), json_object_agg(class_name, conf), now()
+        FROM per_class
+        GROUP BY file_id
+    """)
+    op.execute("""
+        INSERT INTO daily_class_stats (day, class_name, detection_count, file_count, confidence_sum)
+        SELECT fs.day, c.key, sum(c.value::text::bigint), count(*), sum((fs.confidence_sums->>c.key)::double precision)
+        FROM file_stats fs, json_each(fs.class_counts) AS c
+        GROUP BY fs.day, c.key
+    """)
+    op.execute("""
+        INSERT INTO daily_stats (day, files_analyzed, detection_count)
+        SELECT day, count(*), sum(object_count)
+        FROM file_stats
+        GROUP BY day
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('daily_stats')
+    op.drop_table('daily_class_stats')
+    op.drop_table('file_stats')
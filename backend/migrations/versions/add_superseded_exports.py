@@ -0,0 +1,28 @@
+"""Add superseded export artifacts awaiting deletion by retention
+
+Revision ID: add_superseded_exports
+Revises: add_zones
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_superseded_exports'
+down_revision = 'add_zones'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('superseded_exports',
+    sa.Column('blob_key', sa.String(), nullable=False),
+    sa.Column('superseded_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('blob_key')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('superseded_exports')
@@ -0,0 +1,31 @@
+"""Add zone presets and the ROI applied to each file's detections
+
+Revision ID: add_zones
+Revises: add_file_changes
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'add_zones'
+down_revision = 'add_file_changes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('zone_presets',
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('spec', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+    op.add_column('files', sa.Column('roi', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('files', 'roi')
+    op.drop_table('zone_presets')
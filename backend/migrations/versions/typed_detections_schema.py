@@ -0,0 +1,60 @@
+"""Typed detection columns, image dimensions and read-path indexes
+
+Revision ID: typed_detections_schema
+Revises: add_blobs_table
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'typed_detections_schema'
+down_revision = 'add_blobs_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Numeric confidence and one column per box edge instead of a JSON array
+    op.alter_column('detections', 'confidence', type_=sa.Float(),
+                    postgresql_using='confidence::double precision')
+    for column in ('x_min', 'y_min', 'x_max', 'y_max'):
+        op.add_column('detections', sa.Column(column, sa.Float(), nullable=True))
+    op.execute("""
+        UPDATE detections SET
+            x_min = (box_coordinates->>0)::double precision,
+            y_min = (box_coordinates->>1)::double precision,
+            x_max = (box_coordinates->>2)::double precision,
+            y_max = (box_coordinates->>3)::double precision
+    """)
+    for column in ('x_min', 'y_min', 'x_max', 'y_max'):
+        op.alter_column('detections', column, nullable=False)
+    op.drop_column('detections', 'box_coordinates')
+
+    op.add_column('files', sa.Column('width', sa.Integer(), nullable=True))
+    op.add_column('files', sa.Column('height', sa.Integer(), nullable=True))
+    op.add_column('files', sa.Column('processing_time', sa.Float(), nullable=True))
+
+    op.create_index('ix_detections_file_id', 'detections', ['file_id'])
+    op.create_index('ix_detections_class_name_confidence', 'detections', ['class_name', 'confidence'])
+    op.create_index('ix_files_uploaded_at_id', 'files', [sa.text('uploaded_at DESC'), 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_uploaded_at_id', table_name='files')
+    op.drop_index('ix_detections_class_name_confidence', table_name='detections')
+    op.drop_index('ix_detections_file_id', table_name='detections')
+
+    op.drop_column('files', 'processing_time')
+    op.drop_column('files', 'height')
+    op.drop_column('files', 'width')
+
+    op.add_column('detections', sa.Column('box_coordinates', sa.JSON(), nullable=True))
+    op.execute("UPDATE detections SET box_coordinates = json_build_array(x_min, y_min, x_max, y_max)")
+    op.alter_column('detections', 'box_coordinates', nullable=False)
+    for column in ('x_min', 'y_min', 'x_max', 'y_max'):
+        op.drop_column('detections', column)
+    op.alter_column('detections', 'confidence', type_=sa.String(),
+                    postgresql_using='confidence::text')
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, ForeignKey, Enum, JSON
+from sqlalchemy import Column, String, DateTime, Date, ForeignKey, Enum, JSON, BigInteger, Integer, Float, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -17,6 +17,18 @@ class User(Base):
     files = relationship("File", back_populates="user")
 
 
+class Blob(Base):
+    __tablename__ = "blobs"
+
+    digest = Column(String(64), primary_key=True)  # sha256 of the stored bytes
+    blob_key = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    media_type = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    files = relationship("File", back_populates="blob")
+
+
 class File(Base):
     __tablename__ = "files"
 
@@ -25,26 +37,56 @@ class File(Base):
     filename = Column(String, nullable=False)
     filetype = Column(String, nullable=False)  # image / video
     size = Column(String)
-    image_data = Column(String)  # base64 encoded image data
+    image_data = Column(String)  # base64 encoded annotated image
+    blob_key = Column(String)  # original upload in blob storage
+    content_hash = Column(String(64), ForeignKey("blobs.digest"), index=True)
+    model_version = Column(String)  # model config that produced the current detections
+    width = Column(Integer)
+    height = Column(Integer)
+    processing_time = Column(Float)  # seconds spent on the last analysis
+    detection_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped on every detection write
+    roi = Column(String)  # canonical JSON of the zones the current detections were limited to; NULL for the full frame
+    owner = Column(String)  # client_key() of the uploader; retention's per-user quota groups by it
     uploaded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship("User", back_populates="files")
+    blob = relationship("Blob", back_populates="files")
     detections = relationship("Detection", back_populates="file", cascade="all, delete-orphan")
     exports = relationship("Export", back_populates="file", cascade="all, delete-orphan")
+    stats = relationship("FileStats", back_populates="file", uselist=False, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Newest-first listings with a stable tiebreaker for keyset pagination
+        Index("ix_files_uploaded_at_id", uploaded_at.desc(), id),
+        # A user's oldest files, for the retention quota
+        Index("ix_files_owner_uploaded_at", owner, uploaded_at),
+    )
 
 
 class Detection(Base):
     __tablename__ = "detections"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"))
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), index=True)
     class_name = Column(String, nullable=False)
-    confidence = Column(String, nullable=False)
-    box_coordinates = Column(JSON, nullable=False)  # [x1, y1, x2, y2]
+    confidence = Column(Float, nullable=False)
+    x_min = Column(Float, nullable=False)
+    y_min = Column(Float, nullable=False)
+    x_max = Column(Float, nullable=False)
+    y_max = Column(Float, nullable=False)
     processed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     file = relationship("File", back_populates="detections")
 
+    __table_args__ = (
+        Index("ix_detections_class_name_confidence", "class_name", "confidence"),
+        Index("ix_detections_processed_at_class_name", "processed_at", "class_name"),
+    )
+
+    @property
+    def bbox(self):
+        return [self.x_min, self.y_min, self.x_max, self.y_max]
+
 
 class Export(Base):
     __tablename__ = "exports"
@@ -53,6 +95,106 @@ class Export(Base):
     file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"))
     format = Column(String, nullable=False)
     download_url = Column(String, nullable=True)
+    detection_version = Column(Integer, nullable=False, default=0)  # files.detection_version the artifact was built from
+    blob_key = Column(String)  # generated artifact in blob storage
+    etag = Column(String(64))  # sha256 of the artifact
+    size = Column(BigInteger)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     file = relationship("File", back_populates="exports")
+
+    __table_args__ = (
+        # One cached artifact per file and format; stale versions are overwritten
+        Index("ux_exports_file_id_format", file_id, format, unique=True),
+    )
+
+
+# Export artifacts replaced by a newer build; retention deletes them once no download can still be opening them
+class SupersededExport(Base):
+    __tablename__ = "superseded_exports"
+
+    blob_key = Column(String, primary_key=True)
+    superseded_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# Per-file detection summary, written in the same transaction as the detections
+class FileStats(Base):
+    __tablename__ = "file_stats"
+
+    file_id = Column(UUID(as_uuid=True), ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, nullable=False)  # day the current detections were produced
+    object_count = Column(Integer, nullable=False, default=0)
+    class_counts = Column(JSON, nullable=False, default=dict)  # {class_name: count}
+    confidence_sums = Column(JSON, nullable=False, default=dict)  # {class_name: sum of confidences}
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    file = relationship("File", back_populates="stats")
+
+
+# Running per-day, per-class detection totals
+class DailyClassStats(Base):
+    __tablename__ = "daily_class_stats"
+
+    day = Column(Date, primary_key=True)
+    class_name = Column(String, primary_key=True)
+    detection_count = Column(BigInteger, nullable=False, default=0)
+    file_count = Column(BigInteger, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+
+# Running per-day totals across all classes
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    files_analyzed = Column(BigInteger, nullable=False, default=0)
+    detection_count = Column(BigInteger, nullable=False, default=0)
+
+
+# A resumable pass that re-analyzes every file whose detections predate a model version
+class ReanalysisCampaign(Base):
+    __tablename__ = "reanalysis_campaigns"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    model_version = Column(String, nullable=False)  # version files are brought up to
+    status = Column(String, nullable=False, default="running")  # running | paused | done | cancelled
+    batch_size = Column(Integer, nullable=False)
+    rate = Column(Float, nullable=False)  # files per second
+    # Keyset position: the (uploaded_at, id) of the last file handed to the model
+    cursor_uploaded_at = Column(DateTime)
+    cursor_id = Column(UUID(as_uuid=True))
+    total = Column(Integer, nullable=False, default=0)  # stale files when the campaign started
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)  # no original to re-analyze, or already current
+    last_error = Column(String)
+    # Lease held by the worker process running the campaign
+    owner = Column(String)
+    heartbeat_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime)
+
+
+# Append-only log of file changes behind GET /api/changes; superseded entries are compacted away
+class FileChange(Base):
+    __tablename__ = "file_changes"
+
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    file_id = Column(UUID(as_uuid=True), nullable=False)  # no foreign key: deletes must outlive the file
+    op = Column(String(8), nullable=False)  # upsert | delete
+    changed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Finding superseded entries during compaction
+        Index("ix_file_changes_file_id_seq", file_id, seq),
+    )
+
+
+# Saved region-of-interest / exclusion-zone specs, applied with ?source=<name>
+class ZonePreset(Base):
+    __tablename__ = "zone_presets"
+
+    source = Column(String, primary_key=True)  # camera or feed name
+    spec = Column(JSON, nullable=False)  # see zones.ZoneSpec
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,136 @@
+"""Motion gating: skip inference on frames that look like the previous one.
+
+Static-camera sequences (timelapses, surveillance stills) are mostly
+near-identical frames. ``MotionGate`` compares each frame with the last frame
+that was inferred (the keyframe) using a cheap signature, and only frames
+that changed go to the model; the others reuse the keyframe's detections.
+Comparing against the keyframe rather than the previous frame keeps slow
+drift from going unnoticed.
+
+Signatures:
+
+* ``diff`` (default) grayscale thumbnail ``MOTION_DIFF_WIDTH`` pixels wide;
+  the distance is the fraction of pixels whose value moved by more than
+  ``MOTION_PIXEL_DELTA``
+* ``hash`` 64-bit difference hash (dHash); the distance is the fraction of
+  differing bits. Cheaper and more tolerant of lighting noise, less
+  sensitive to small objects
+
+A frame is inferred when its distance exceeds the threshold, its size
+differs from the keyframe, or ``MOTION_MAX_SKIP`` frames in a row were
+skipped, which bounds how stale reused detections can get.
+
+Kept free of the model, database and web app, like ``pipeline.py``.
+"""
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from pipeline import DetectionResult
+
+METHODS = ("diff", "hash")
+MOTION_GATE_METHOD = os.getenv("MOTION_GATE_METHOD", "diff")
+DEFAULT_THRESHOLDS = {
+    "diff": float(os.getenv("MOTION_DIFF_THRESHOLD", "0.01")),
+    "hash": float(os.getenv("MOTION_HASH_THRESHOLD", "0.1")),
+}
+MOTION_MAX_SKIP = int(os.getenv("MOTION_MAX_SKIP", "30"))
+MOTION_DIFF_WIDTH = int(os.getenv("MOTION_DIFF_WIDTH", "64"))
+MOTION_PIXEL_DELTA = int(os.getenv("MOTION_PIXEL_DELTA", "25"))
+MOTION_HASH_DEAD_BAND = 2
+
+
+def frame_signature(image: np.ndarray, method: str = MOTION_GATE_METHOD) -> np.ndarray:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    if method == "hash":
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+        # A small dead band keeps flat regions, where neighbours differ only by noise, from flipping bits
+        return small[:, 1:] - small[:, :-1] > MOTION_HASH_DEAD_BAND
+    height, width = gray.shape[:2]
+    size = (MOTION_DIFF_WIDTH, max(1, round(height * MOTION_DIFF_WIDTH / width)))
+    # Blur away sensor noise and compression artifacts before differencing
+    return cv2.GaussianBlur(cv2.resize(gray, size, interpolation=cv2.INTER_AREA), (3, 3), 0)
+
+
+def frame_distance(a: np.ndarray, b: np.ndarray, method: str = MOTION_GATE_METHOD) -> float:
+    """0.0 for identical signatures, up to 1.0"""
+    if a.shape != b.shape:
+        return 1.0
+    if method == "hash":
+        return np.count_nonzero(a != b) / a.size
+    return np.count_nonzero(cv2.absdiff(a, b) > MOTION_PIXEL_DELTA) / a.size
+
+
+class MotionGate:
+    """Decides, frame by frame in sequence order, which frames need inference"""
+
+    def __init__(self, method: str = MOTION_GATE_METHOD, threshold: Optional[float] = None, max_skip: int = MOTION_MAX_SKIP):
+        if method not in METHODS:
+            raise ValueError(f"Motion gate method must be one of: {', '.join(METHODS)}")
+        self.method = method
+        self.threshold = DEFAULT_THRESHOLDS[method] if threshold is None else threshold
+        self.max_skip = max_skip
+        self.keyframe: Optional[np.ndarray] = None
+        self.detections: List[DetectionResult] = []  # the keyframe's
+        self.run = 0  # frames skipped since the keyframe
+        self.frames = 0
+        self.skipped = 0
+
+    def signature(self, image: np.ndarray) -> np.ndarray:
+        return frame_signature(image, self.method)
+
+    def check(self, signature: np.ndarray, commit: bool = True) -> bool:
+        """True if the frame must be inferred; it then becomes the keyframe, or with ``commit=False``
+        only once its detections are passed to ``keep``"""
+        self.frames += 1
+        if (
+            self.keyframe is None
+            or self.run >= self.max_skip
+            or frame_distance(signature, self.keyframe, self.method) > self.threshold
+        ):
+            if commit:
+                self.keyframe = signature
+                self.run = 0
+            return True
+        self.run += 1
+        self.skipped += 1
+        return False
+
+    def keep(self, signature: np.ndarray, detections: List[DetectionResult]) -> None:
+        """Make an inferred frame the keyframe, once its inference has succeeded"""
+        self.keyframe = signature
+        self.run = 0
+        self.detections = detections
+
+    def reset(self) -> None:
+        """Infer the next frame whatever it looks like, e.g. after a gap in the sequence"""
+        self.keyframe = None
+
+    def changed(self, image: np.ndarray) -> bool:
+        return self.check(self.signature(image))
+
+    def expand(self, keep: List[bool], inferred: List[List[DetectionResult]]) -> List[List[DetectionResult]]:
+        """Detections for every frame of a checked run, in order: each keyframe's own
+        (from ``inferred``, one list per kept frame), and copies of the latest keyframe's for the rest"""
+        results = []
+        inferred_iter = iter(inferred)
+        for kept in keep:
+            if kept:
+                self.detections = next(inferred_iter)
+                results.append(self.detections)
+            else:
+                results.append([det.model_copy(update={"id": str(uuid.uuid4())}) for det in self.detections])
+        return results
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "threshold": self.threshold,
+            "frames": self.frames,
+            "inferred": self.frames - self.skipped,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / self.frames, 4) if self.frames else 0.0,
+        }
@@ -0,0 +1,28 @@
+"""Opaque keyset-pagination cursors.
+
+A cursor encodes the sort key of the last row a client has seen, so the next
+page is a range condition on an index rather than an ever-growing OFFSET.
+"""
+import base64
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+
+def encode_cursor(timestamp: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, uuid.UUID]]:
+    """Return the (timestamp, id) a cursor points at, or None for the first page"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), uuid.UUID(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
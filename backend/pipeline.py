@@ -0,0 +1,93 @@
+"""CPU stages of the detection pipeline: decode, post-process, draw, encode.
+
+Kept free of the model, database and web app so the same functions can be
+imported by benchmarks and offline tools without loading weights.
+"""
+import base64
+import uuid
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from pydantic import BaseModel, Field
+
+from encoding import DEFAULT_ENCODING, ImageEncoding, encode_image
+
+# Color palette for different classes
+COLORS = [
+    "#FF6B6B", "#4ECDC4", "#45B7D1", "#96CEB4", "#FFEAA7",
+    "#DDA0DD", "#98D8C8", "#F7DC6F", "#BB8FCE", "#85C1E9"
+]
+
+
+class DetectionResult(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    class_name: str
+    confidence: float
+    bbox: List[float]  # [x1, y1, x2, y2]
+    color: str
+
+
+def get_color_for_class(class_index: int) -> str:
+    return COLORS[class_index % len(COLORS)]
+
+
+def decode_image_bytes(data: Optional[bytes]) -> Optional[np.ndarray]:
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def process_image_detections(results, original_image: np.ndarray, names: Dict[int, str]) -> List[DetectionResult]:
+    """Process YOLO results and return detection objects"""
+    detections = []
+
+    if results[0].boxes is not None:
+        for i, box in enumerate(results[0].boxes):
+            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+            confidence = float(box.conf[0].cpu().numpy())
+            class_id = int(box.cls[0].cpu().numpy())
+            class_name = names[class_id]
+
+            detection = DetectionResult(
+                class_name=class_name,
+                confidence=confidence,
+                bbox=[float(x1), float(y1), float(x2), float(y2)],
+                color=get_color_for_class(class_id)
+            )
+            detections.append(detection)
+
+    return detections
+
+
+def draw_detections_on_image(image: np.ndarray, detections: List[DetectionResult]) -> np.ndarray:
+    """Draw bounding boxes and labels on image"""
+    result_image = image.copy()
+
+    for detection in detections:
+        x1, y1, x2, y2 = [int(coord) for coord in detection.bbox]
+
+        # Convert hex color to BGR
+        color_hex = detection.color.lstrip('#')
+        color_rgb = tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
+        color_bgr = color_rgb[::-1]  # Convert RGB to BGR
+
+        # Draw rectangle
+        cv2.rectangle(result_image, (x1, y1), (x2, y2), color_bgr, 8)
+
+        # Draw label background
+        label = f"{detection.class_name}: {detection.confidence:.2f}"
+        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
+        cv2.rectangle(result_image, (x1, y1 - label_size[1] - 10),
+                     (x1 + label_size[0], y1), color_bgr, -1)
+
+        # Draw label text
+        cv2.putText(result_image, label, (x1, y1 - 5),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+    return result_image
+
+
+def encode_image_to_base64(image_array: np.ndarray, encoding: ImageEncoding = DEFAULT_ENCODING) -> str:
+    """Convert image array to base64 string"""
+    return base64.b64encode(encode_image(image_array, encoding)).decode('utf-8')
@@ -0,0 +1,296 @@
+"""Re-analysis campaigns: bring every analyzed file up to the current model.
+
+After a weights upgrade ``files.model_version`` tells which files carry
+detections from an older model. A campaign walks those files newest first in
+keyset-paginated batches, hands each batch to the server's batch processor
+(one batched model call at ``BATCH`` priority, then one transaction per file
+that swaps its detections), and sleeps between batches to stay under its
+``rate``. Interactive requests keep priority over campaign work in the
+inference scheduler.
+
+Campaign progress lives in ``reanalysis_campaigns``: the keyset cursor is
+saved after every batch, so a paused campaign, or one whose worker process
+died, resumes where it stopped. The process running a campaign holds a lease
+it renews every batch; another process takes over once the lease expires.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import desc, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from admin import require_admin
+from database import AsyncSessionLocal, get_db
+from models import File as FileModel, ReanalysisCampaign
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin/reanalysis", dependencies=[Depends(require_admin)])
+
+REANALYSIS_BATCH_SIZE = int(os.getenv("REANALYSIS_BATCH_SIZE", os.getenv("BATCH_INFERENCE_SIZE", "8")))
+REANALYSIS_RATE = float(os.getenv("REANALYSIS_RATE", "2"))  # files per second
+REANALYSIS_LEASE_SECONDS = int(os.getenv("REANALYSIS_LEASE_SECONDS", "300"))
+
+ACTIVE = ("running", "paused")
+
+# (db, file_ids, user) -> {"done": [...], "failed": [...], "skipped": [...]}
+BatchProcessor = Callable[[AsyncSession, List[uuid.UUID], str], Awaitable[Dict[str, List[uuid.UUID]]]]
+
+
+def stale_files(model_version: str):
+    """Files analyzed by some other model; never-analyzed uploads are left alone"""
+    return (FileModel.model_version.isnot(None)) & (FileModel.model_version != model_version)
+
+
+def campaign_to_dict(campaign: ReanalysisCampaign) -> Dict[str, Any]:
+    finished = campaign.processed + campaign.failed + campaign.skipped
+    return {
+        "id": str(campaign.id),
+        "model_version": campaign.model_version,
+        "status": campaign.status,
+        "batch_size": campaign.batch_size,
+        "rate": campaign.rate,
+        "total": campaign.total,
+        "processed": campaign.processed,
+        "failed": campaign.failed,
+        "skipped": campaign.skipped,
+        "progress": round(finished / campaign.total, 4) if campaign.total else 1.0,
+        "last_error": campaign.last_error,
+        "owner": campaign.owner,
+        "created_at": campaign.created_at.isoformat(),
+        "updated_at": campaign.updated_at.isoformat(),
+        "finished_at": campaign.finished_at.isoformat() if campaign.finished_at else None,
+    }
+
+
+class CampaignRunner:
+    def __init__(self):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.processor: Optional[BatchProcessor] = None
+        self.model_version: Optional[str] = None
+        self.tasks: Dict[uuid.UUID, asyncio.Task] = {}
+
+    def configure(self, processor: BatchProcessor, model_version: str) -> None:
+        self.processor = processor
+        self.model_version = model_version
+
+    async def claim(self, campaign_id: uuid.UUID) -> bool:
+        """Take the lease on a running campaign unless a live worker holds it"""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(ReanalysisCampaign)
+                .where(
+                    ReanalysisCampaign.id == campaign_id,
+                    ReanalysisCampaign.status == "running",
+                    or_(
+                        ReanalysisCampaign.owner.is_(None),
+                        ReanalysisCampaign.owner == self.owner,
+                        ReanalysisCampaign.heartbeat_at < now - timedelta(seconds=REANALYSIS_LEASE_SECONDS),
+                    ),
+                )
+                .values(owner=self.owner, heartbeat_at=now)
+            )
+            await db.commit()
+            return result.rowcount == 1
+
+    async def start(self, campaign_id: uuid.UUID) -> bool:
+        if not await self.claim(campaign_id):
+            return False
+        task = self.tasks.get(campaign_id)
+        if task is None or task.done():
+            self.tasks[campaign_id] = asyncio.create_task(self._run(campaign_id))
+        return True
+
+    async def watch(self) -> None:
+        """Pick up running campaigns for this model whose worker stopped renewing its lease"""
+        while True:
+            try:
+                async with AsyncSessionLocal() as db:
+                    ids = (await db.execute(
+                        select(ReanalysisCampaign.id).where(
+                            ReanalysisCampaign.status == "running",
+                            ReanalysisCampaign.model_version == self.model_version,
+                        )
+                    )).scalars().all()
+                for campaign_id in ids:
+                    if await self.start(campaign_id):
+                        logger.info(f"Running re-analysis campaign {campaign_id}")
+            except Exception as e:
+                logger.error(f"Re-analysis watch failed: {e}")
+            await asyncio.sleep(REANALYSIS_LEASE_SECONDS / 2)
+
+    async def _next_batch(self, db: AsyncSession, campaign: ReanalysisCampaign) -> List[Any]:
+        stmt = select(FileModel.id, FileModel.uploaded_at).where(stale_files(campaign.model_version))
+        if campaign.cursor_id is not None:
+            stmt = stmt.where(
+                tuple_(FileModel.uploaded_at, FileModel.id) < tuple_(campaign.cursor_uploaded_at, campaign.cursor_id)
+            )
+        stmt = stmt.order_by(desc(FileModel.uploaded_at), desc(FileModel.id)).limit(campaign.batch_size)
+        return (await db.execute(stmt)).all()
+
+    async def _run(self, campaign_id: uuid.UUID) -> None:
+        user = f"campaign:{campaign_id}"
+        try:
+            while True:
+                started = time.monotonic()
+                async with AsyncSessionLocal() as db:
+                    campaign = await db.get(ReanalysisCampaign, campaign_id)
+                    if campaign is None or campaign.status != "running" or campaign.owner != self.owner:
+                        return
+                    rows = await self._next_batch(db, campaign)
+                    if not rows:
+                        campaign.status = "done"
+                        campaign.finished_at = campaign.updated_at = datetime.utcnow()
+                        campaign.owner = None
+                        await db.commit()
+                        logger.info(f"Re-analysis campaign {campaign_id} finished")
+                        return
+                    rate = campaign.rate
+
+                try:
+                    async with AsyncSessionLocal() as work_db:
+                        outcome = await self.processor(work_db, [row.id for row in rows], user)
+                    error = None
+                except Exception as e:
+                    # The batch is not retried; its files stay stale for a later campaign
+                    logger.error(f"Re-analysis campaign {campaign_id} batch failed: {e}")
+                    outcome = {"done": [], "failed": [row.id for row in rows], "skipped": []}
+                    error = str(e)
+
+                # Advance the cursor unless another process has taken the campaign over;
+                # a pause or cancel in the meantime released the lease but keeps this batch
+                async with AsyncSessionLocal() as db:
+                    values = dict(
+                        cursor_uploaded_at=rows[-1].uploaded_at,
+                        cursor_id=rows[-1].id,
+                        processed=ReanalysisCampaign.processed + len(outcome["done"]),
+                        failed=ReanalysisCampaign.failed + len(outcome["failed"]),
+                        skipped=ReanalysisCampaign.skipped + len(outcome["skipped"]),
+                        heartbeat_at=datetime.utcnow(),
+                        updated_at=datetime.utcnow(),
+                    )
+                    if error is not None:
+                        values["last_error"] = error
+                    result = await db.execute(
+                        update(ReanalysisCampaign)
+                        .where(
+                            ReanalysisCampaign.id == campaign_id,
+                            or_(ReanalysisCampaign.owner == self.owner, ReanalysisCampaign.owner.is_(None)),
+                        )
+                        .values(**values)
+                    )
+                    await db.commit()
+                    if result.rowcount != 1:
+                        return
+
+                await asyncio.sleep(max(0.0, len(rows) / rate - (time.monotonic() - started)))
+        except Exception as e:
+            logger.error(f"Re-analysis campaign {campaign_id} stopped: {e}")
+        finally:
+            self.tasks.pop(campaign_id, None)
+
+
+runner = CampaignRunner()
+
+
+async def _get_campaign(db: AsyncSession, campaign_id: uuid.UUID) -> ReanalysisCampaign:
+    campaign = await db.get(ReanalysisCampaign, campaign_id)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+
+async def _set_status(db: AsyncSession, campaign_id: uuid.UUID, allowed: tuple, status: str) -> ReanalysisCampaign:
+    campaign = await _get_campaign(db, campaign_id)
+    if campaign.status not in allowed:
+        raise HTTPException(status_code=409, detail=f"Campaign is {campaign.status}")
+    campaign.status = status
+    campaign.updated_at = datetime.utcnow()
+    # Releasing the lease lets whichever process resumes the campaign claim it
+    campaign.owner = None
+    if status == "cancelled":
+        campaign.finished_at = campaign.updated_at
+    await db.commit()
+    return campaign
+
+
+@router.get("/versions")
+async def model_versions(db: AsyncSession = Depends(get_db)):
+    """Analyzed files per model version, and how many a campaign would re-analyze"""
+    rows = (await db.execute(
+        select(FileModel.model_version, func.count())
+        .where(FileModel.model_version.isnot(None))
+        .group_by(FileModel.model_version)
+    )).all()
+    counts = {version: count for version, count in rows}
+    return {
+        "current": runner.model_version,
+        "files_by_version": counts,
+        "stale": sum(count for version, count in counts.items() if version != runner.model_version),
+    }
+
+
+@router.post("")
+async def create_campaign(
+    batch_size: int = Query(REANALYSIS_BATCH_SIZE, ge=1, le=256),
+    rate: float = Query(REANALYSIS_RATE, gt=0),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start re-analyzing every file whose detections come from another model version"""
+    version = runner.model_version
+    active = (await db.execute(
+        select(ReanalysisCampaign.id)
+        .where(ReanalysisCampaign.model_version == version, ReanalysisCampaign.status.in_(ACTIVE))
+    )).scalar_one_or_none()
+    if active is not None:
+        raise HTTPException(status_code=409, detail=f"Campaign {active} is already active for this model")
+
+    total = (await db.execute(select(func.count()).select_from(FileModel).where(stale_files(version)))).scalar_one()
+    campaign = ReanalysisCampaign(model_version=version, status="running", batch_size=batch_size, rate=rate, total=total)
+    db.add(campaign)
+    await db.commit()
+    await runner.start(campaign.id)
+    logger.info(f"Started re-analysis campaign {campaign.id}: {total} files to {version}")
+    return campaign_to_dict(campaign)
+
+
+@router.get("")
+async def list_campaigns(limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_db)):
+    campaigns = (await db.execute(
+        select(ReanalysisCampaign).order_by(desc(ReanalysisCampaign.created_at)).limit(limit)
+    )).scalars().all()
+    return [campaign_to_dict(c) for c in campaigns]
+
+
+@router.get("/{campaign_id}")
+async def get_campaign(campaign_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    return campaign_to_dict(await _get_campaign(db, campaign_id))
+
+
+@router.post("/{campaign_id}/pause")
+async def pause_campaign(campaign_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    """Stop after the batch in progress; the cursor is kept for resume"""
+    return campaign_to_dict(await _set_status(db, campaign_id, ("running",), "paused"))
+
+
+@router.post("/{campaign_id}/resume")
+async def resume_campaign(campaign_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    campaign = await _get_campaign(db, campaign_id)
+    if campaign.model_version != runner.model_version:
+        raise HTTPException(status_code=409, detail="Campaign targets a model this server does not serve")
+    campaign = await _set_status(db, campaign_id, ("paused",), "running")
+    await runner.start(campaign.id)
+    return campaign_to_dict(campaign)
+
+
+@router.post("/{campaign_id}/cancel")
+async def cancel_campaign(campaign_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    return campaign_to_dict(await _set_status(db, campaign_id, ACTIVE, "cancelled"))
@@ -0,0 +1,136 @@
+"""Fast JSON for the analysis read endpoints.
+
+Listing analyses through ``AnalysisResult``/``DetectionResult`` builds and
+validates a Pydantic model per detection and then serializes them with the
+stdlib ``json`` module; with thousands of detections that dominates the
+request. Here responses are built as plain dicts and lists straight from SQL
+rows (values read from our own database need no re-validation) and returned
+as ``ORJSONResponse``, which FastAPI sends as is: no response_model pass, and
+orjson encodes UUIDs and datetimes natively.
+
+Two layouts:
+
+* ``rows`` (default) the ``AnalysisResult`` shape, one object per detection
+* ``columnar`` per file, parallel arrays: ``ids``, ``class_ids``,
+  ``confidences`` and ``boxes`` (flat ``[x1, y1, x2, y2, ...]``), with class
+  names and colors sent once in a top-level ``classes`` table
+"""
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from encoding import stored_media_type
+from models import Detection, File as FileModel
+from pipeline import get_color_for_class
+
+ROWS = "rows"
+COLUMNAR = "columnar"
+LAYOUTS = (ROWS, COLUMNAR)
+
+FILE_COLUMNS = (
+    FileModel.id,
+    FileModel.filename,
+    FileModel.filetype,
+    FileModel.image_data,
+    FileModel.processing_time,
+    FileModel.uploaded_at,
+    FileModel.model_version,
+)
+# Without the annotated image: its first bytes are enough to tell the media type
+SUMMARY_COLUMNS = tuple(column for column in FILE_COLUMNS if column is not FileModel.image_data) + (
+    func.substr(FileModel.image_data, 1, 32).label("image_head"),
+)
+DETECTION_COLUMNS = (
+    Detection.id,
+    Detection.file_id,
+    Detection.class_name,
+    Detection.confidence,
+    Detection.x_min,
+    Detection.y_min,
+    Detection.x_max,
+    Detection.y_max,
+)
+
+
+def parse_layout(layout: str) -> str:
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LAYOUTS)}")
+    return layout
+
+
+async def detections_by_file(db: AsyncSession, file_ids: List[Any]) -> Dict[Any, List[Any]]:
+    """Detection rows for the files, in one IN query on ix_detections_file_id"""
+    grouped: Dict[Any, List[Any]] = defaultdict(list)
+    if file_ids:
+        rows = await db.execute(select(*DETECTION_COLUMNS).where(Detection.file_id.in_(file_ids)))
+        for row in rows:
+            grouped[row.file_id].append(row)
+    return grouped
+
+
+class AnalysisEncoder:
+    """Turns file and detection rows into response dicts for one layout"""
+
+    def __init__(self, layout: str, class_ids: Dict[str, int], include_images: bool = True):
+        self.layout = layout
+        self.class_ids = class_ids
+        self.include_images = include_images
+        self.colors: Dict[str, str] = {}
+        self.seen_classes: Dict[str, int] = {}
+        # Select file rows with these, so images are not read from the database unless sent
+        self.file_columns = FILE_COLUMNS if include_images else SUMMARY_COLUMNS
+
+    def _color(self, class_name: str) -> str:
+        color = self.colors.get(class_name)
+        if color is None:
+            color = self.colors[class_name] = get_color_for_class(self.class_ids.get(class_name, 0))
+        return color
+
+    def _detections(self, rows: Iterable[Any]) -> Any:
+        if self.layout == COLUMNAR:
+            ids, class_ids, confidences, boxes = [], [], [], []
+            for det in rows:
+                class_id = self.class_ids.get(det.class_name, 0)
+                self.seen_classes[det.class_name] = class_id
+                ids.append(det.id)
+                class_ids.append(class_id)
+                confidences.append(det.confidence)
+                boxes.extend((det.x_min, det.y_min, det.x_max, det.y_max))
+            return {"ids": ids, "class_ids": class_ids, "confidences": confidences, "boxes": boxes}
+        return [
+            {
+                "id": det.id,
+                "class_name": det.class_name,
+                "confidence": det.confidence,
+                "bbox": [det.x_min, det.y_min, det.x_max, det.y_max],
+                "color": self._color(det.class_name),
+            }
+            for det in rows
+        ]
+
+    def analysis(self, file: Any, detection_rows: List[Any], **extra: Any) -> Dict[str, Any]:
+        image_data = file.image_data if self.include_images else None
+        return {
+            "id": file.id,
+            "filename": file.filename,
+            "file_type": file.filetype,
+            "image_data": image_data,
+            "image_mime": stored_media_type(image_data if self.include_images else file.image_head),
+            "detections": self._detections(detection_rows),
+            "total_objects": len(detection_rows),
+            "processing_time": file.processing_time or 0.0,
+            "timestamp": file.uploaded_at,
+            **extra,
+        }
+
+    def classes(self) -> Optional[List[Dict[str, Any]]]:
+        """Class table for the columnar layout, covering every class encoded so far"""
+        if self.layout != COLUMNAR:
+            return None
+        return [
+            {"id": class_id, "name": name, "color": self._color(name)}
+            for name, class_id in sorted(self.seen_classes.items(), key=lambda item: item[1])
+        ]
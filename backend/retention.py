@@ -0,0 +1,367 @@
+"""Retention and compaction of stored files.
+
+Three policies, each optional and configured through the environment:
+
+* ``RETENTION_MAX_AGE_DAYS``      delete files uploaded longer ago than this
+* ``RETENTION_USER_QUOTA_BYTES``  delete a user's oldest files past their quota
+* ``RETENTION_MAX_TOTAL_BYTES``   delete the oldest files until storage fits
+
+Quotas count the upload size of each file a user owns (``files.owner``, the
+caller's ``client_key``); files without an owner, such as ones loaded by the
+batch CLI, count only towards the total.
+
+Work happens in batches of ``RETENTION_BATCH_SIZE`` files, each in its own
+short transaction that skips rows locked by other writers. Blobs are removed
+(or moved to ``RETENTION_ARCHIVE_DIR`` when set) only after the rows that
+referenced them are committed, and only once no file references them: each
+is re-checked under a lock on its ``blobs`` row, which an upload of the same
+bytes holds from registering the blob until it commits.
+
+Every run also deletes export artifacts superseded by a rebuild more than
+``RETENTION_EXPORT_GRACE_SECONDS`` ago, so a download that looked up the old
+artifact just before the rebuild can still open it.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import BigInteger, cast, delete, exists, func, select
+
+from admin import require_admin
+from changes import DELETE, record_changes
+from database import AsyncSessionLocal, dialect_insert
+from ingest import IngestedBlob
+from models import Blob, Export, File as FileModel, SupersededExport
+from stats import remove_file_stats
+from storage import blob_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/admin/retention", dependencies=[Depends(require_admin)])
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+@dataclass
+class RetentionPolicy:
+    max_age_days: Optional[int] = None
+    max_total_bytes: Optional[int] = None
+    user_quota_bytes: Optional[int] = None
+    batch_size: int = 500
+    batch_pause: float = 0.05  # seconds between batches, to let other writers in
+    archive_dir: Optional[Path] = None
+    export_grace_seconds: int = 600
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        archive_dir = os.getenv("RETENTION_ARCHIVE_DIR")
+        return cls(
+            max_age_days=_env_int("RETENTION_MAX_AGE_DAYS"),
+            max_total_bytes=_env_int("RETENTION_MAX_TOTAL_BYTES"),
+            user_quota_bytes=_env_int("RETENTION_USER_QUOTA_BYTES"),
+            batch_size=_env_int("RETENTION_BATCH_SIZE") or 500,
+            archive_dir=Path(archive_dir) if archive_dir else None,
+            export_grace_seconds=_env_int("RETENTION_EXPORT_GRACE_SECONDS") or 600,
+        )
+
+
+@dataclass
+class RetentionReport:
+    started_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    finished_at: Optional[str] = None
+    dry_run: bool = False
+    files_deleted: int = 0
+    blobs_removed: int = 0
+    bytes_reclaimed: int = 0
+    batches: int = 0
+    by_policy: Dict[str, int] = field(default_factory=dict)
+    duration_seconds: float = 0.0
+
+
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "3600"))
+
+last_report: Optional[RetentionReport] = None
+
+
+async def _remove_orphan_blobs(digests: List[str], policy: RetentionPolicy) -> Tuple[int, int]:
+    """Remove the blobs among ``digests`` that no file references; return (blobs, bytes reclaimed)"""
+    removed = reclaimed = 0
+    for digest in sorted(digests):
+        async with AsyncSessionLocal() as db:
+            # The lock waits for any upload still holding the row, and the
+            # references are checked after it is taken, so a file added since
+            # the purge keeps its blob
+            blob = (await db.execute(
+                select(Blob).where(Blob.digest == digest).with_for_update()
+            )).scalar_one_or_none()
+            if blob is None:
+                continue
+            referenced = (await db.execute(
+                select(exists().where(FileModel.content_hash == digest))
+            )).scalar_one()
+            if referenced:
+                continue
+            # A crash after this leaves an unreferenced row without bytes, which
+            # the next upload of the same content simply stores again
+            if policy.archive_dir is not None:
+                reclaimed += blob_store.archive(blob.blob_key, policy.archive_dir)
+            else:
+                reclaimed += blob_store.delete(blob.blob_key)
+            await db.delete(blob)
+            await db.commit()
+            removed += 1
+    return removed, reclaimed
+
+
+async def discard_blobs(blobs: Iterable[IngestedBlob]) -> int:
+    """Delete blobs stored by an upload that failed, unless some file uses them; return bytes freed.
+
+    The blobs get a row first, if they have none, so that removing them takes
+    the same lock and reference check as retention and cannot race an upload
+    of the same bytes.
+    """
+    blobs = {blob.digest: blob for blob in blobs}
+    if not blobs:
+        return 0
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            dialect_insert(db, Blob).on_conflict_do_nothing(index_elements=["digest"]),
+            [
+                {"digest": b.digest, "blob_key": b.blob_key, "size": b.size, "media_type": b.media_type, "created_at": datetime.utcnow()}
+                for b in blobs.values()
+            ],
+        )
+        await db.commit()
+    _, reclaimed = await _remove_orphan_blobs(list(blobs), RetentionPolicy())
+    return reclaimed
+
+
+async def _purge_files(file_ids: List[uuid.UUID], policy: RetentionPolicy, report: RetentionReport, reason: str) -> int:
+    """Delete one batch of files and any blobs left unreferenced; return bytes reclaimed"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(
+                FileModel.id,
+                FileModel.content_hash,
+                func.coalesce(func.length(FileModel.image_data), 0).label("annotated_bytes"),
+            )
+            .where(FileModel.id.in_(file_ids))
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            return 0
+
+        ids = [row.id for row in rows]
+        export_keys = set((await db.execute(
+            select(Export.blob_key).where(Export.file_id.in_(ids), Export.blob_key.isnot(None))
+        )).scalars())
+        await remove_file_stats(db, ids)
+        # Detections, exports and file_stats go with the files via ON DELETE CASCADE
+        await db.execute(delete(FileModel).where(FileModel.id.in_(ids)))
+        if export_keys:
+            export_keys -= set((await db.execute(
+                select(Export.blob_key).where(Export.blob_key.in_(export_keys))
+            )).scalars())
+        await record_changes(db, ids, DELETE)
+        await db.commit()
+
+    # Storage is touched only after the rows are gone, so a crash leaves stray
+    # blobs on disk rather than files pointing at missing blobs
+    reclaimed = sum(row.annotated_bytes for row in rows)
+    digests = {row.content_hash for row in rows if row.content_hash}
+    blobs_removed, blob_bytes = await _remove_orphan_blobs(list(digests), policy)
+    reclaimed += blob_bytes
+    # Cached exports can always be rebuilt, so they are never archived
+    for key in export_keys:
+        reclaimed += blob_store.delete(key)
+
+    report.files_deleted += len(ids)
+    report.blobs_removed += blobs_removed
+    report.bytes_reclaimed += reclaimed
+    report.batches += 1
+    report.by_policy[reason] = report.by_policy.get(reason, 0) + len(ids)
+    await asyncio.sleep(policy.batch_pause)
+    return reclaimed
+
+
+async def _stored_bytes() -> int:
+    async with AsyncSessionLocal() as db:
+        blob_bytes = (await db.execute(select(func.coalesce(func.sum(Blob.size), 0)))).scalar_one()
+        annotated_bytes = (await db.execute(
+            select(func.coalesce(func.sum(func.length(FileModel.image_data)), 0))
+        )).scalar_one()
+    return int(blob_bytes) + int(annotated_bytes)
+
+
+async def _oldest_file_ids(limit: int, *filters) -> List[Any]:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(FileModel.id, cast(FileModel.size, BigInteger).label("size"))
+            .where(*filters)
+            .order_by(FileModel.uploaded_at, FileModel.id)
+            .limit(limit)
+        )).all()
+
+
+async def _enforce_max_age(policy: RetentionPolicy, report: RetentionReport) -> None:
+    cutoff = datetime.utcnow() - timedelta(days=policy.max_age_days)
+    if report.dry_run:
+        async with AsyncSessionLocal() as db:
+            expired = (await db.execute(
+                select(func.count(FileModel.id)).where(FileModel.uploaded_at < cutoff)
+            )).scalar_one()
+        report.by_policy["max_age"] = expired
+        return
+    while True:
+        rows = await _oldest_file_ids(policy.batch_size, FileModel.uploaded_at < cutoff)
+        if not rows:
+            return
+        deleted_before = report.files_deleted
+        await _purge_files([row.id for row in rows], policy, report, "max_age")
+        if report.files_deleted == deleted_before:
+            # Everything left is locked by other writers; try again next run
+            return
+
+
+async def _enforce_max_total_bytes(policy: RetentionPolicy, report: RetentionReport) -> None:
+    excess = await _stored_bytes() - policy.max_total_bytes
+    if report.dry_run:
+        report.by_policy["max_total_bytes_excess"] = max(excess, 0)
+        return
+    while excess > 0:
+        rows = await _oldest_file_ids(policy.batch_size)
+        if not rows:
+            return
+        # Only take as many of the oldest files as it takes to fit the limit
+        batch, freed = [], 0
+        for row in rows:
+            batch.append(row.id)
+            freed += row.size or 0
+            if freed >= excess:
+                break
+        deleted_before = report.files_deleted
+        excess -= await _purge_files(batch, policy, report, "max_total_bytes")
+        if report.files_deleted == deleted_before:
+            return
+
+
+async def _enforce_user_quota(policy: RetentionPolicy, report: RetentionReport) -> None:
+    usage = func.sum(cast(FileModel.size, BigInteger))
+    async with AsyncSessionLocal() as db:
+        over_quota = (await db.execute(
+            select(FileModel.owner, usage.label("used"))
+            .where(FileModel.owner.isnot(None))
+            .group_by(FileModel.owner)
+            .having(usage > policy.user_quota_bytes)
+            .order_by(FileModel.owner)
+        )).all()
+
+    for owner, used in over_quota:
+        excess = int(used) - policy.user_quota_bytes
+        if report.dry_run:
+            report.by_policy[f"user_quota_excess:{owner}"] = excess
+            continue
+        while excess > 0:
+            rows = await _oldest_file_ids(policy.batch_size, FileModel.owner == owner)
+            if not rows:
+                break
+            # Only take as many of the user's oldest files as it takes to fit the quota
+            batch, freed = [], 0
+            for row in rows:
+                batch.append(row.id)
+                freed += row.size or 0
+                if freed >= excess:
+                    break
+            deleted_before = report.files_deleted
+            await _purge_files(batch, policy, report, "user_quota")
+            if report.files_deleted == deleted_before:
+                break
+            # The quota is on upload sizes, whatever deduplication shares on disk
+            excess -= freed
+
+
+async def _remove_superseded_exports(policy: RetentionPolicy, report: RetentionReport) -> None:
+    cutoff = datetime.utcnow() - timedelta(seconds=policy.export_grace_seconds)
+    expired = SupersededExport.superseded_at < cutoff
+    if report.dry_run:
+        async with AsyncSessionLocal() as db:
+            count = (await db.execute(select(func.count()).where(expired))).scalar_one()
+        report.by_policy["superseded_exports"] = count
+        return
+    while True:
+        async with AsyncSessionLocal() as db:
+            keys = (await db.execute(
+                select(SupersededExport.blob_key).where(expired).limit(policy.batch_size)
+            )).scalars().all()
+            if not keys:
+                return
+            # An identical rebuild may have made an artifact current again
+            current = set((await db.execute(
+                select(Export.blob_key).where(Export.blob_key.in_(keys))
+            )).scalars())
+            await db.execute(delete(SupersededExport).where(SupersededExport.blob_key.in_(keys)))
+            await db.commit()
+        for key in keys:
+            if key not in current:
+                report.bytes_reclaimed += blob_store.delete(key)
+        report.by_policy["superseded_exports"] = report.by_policy.get("superseded_exports", 0) + len(keys) - len(current)
+        report.batches += 1
+        await asyncio.sleep(policy.batch_pause)
+
+
+async def run_retention(policy: Optional[RetentionPolicy] = None, dry_run: bool = False) -> RetentionReport:
+    """Apply every configured policy once and return what was reclaimed"""
+    global last_report
+    policy = policy or RetentionPolicy.from_env()
+    report = RetentionReport(dry_run=dry_run)
+    start = time.time()
+
+    if policy.max_age_days is not None:
+        await _enforce_max_age(policy, report)
+    if policy.user_quota_bytes is not None:
+        await _enforce_user_quota(policy, report)
+    if policy.max_total_bytes is not None:
+        await _enforce_max_total_bytes(policy, report)
+    await _remove_superseded_exports(policy, report)
+
+    report.finished_at = datetime.utcnow().isoformat()
+    report.duration_seconds = time.time() - start
+    if not dry_run:
+        last_report = report
+    logger.info(
+        f"Retention {'dry run' if dry_run else 'run'}: {report.files_deleted} files, "
+        f"{report.blobs_removed} blobs, {report.bytes_reclaimed} bytes reclaimed in {report.batches} batches"
+    )
+    return report
+
+
+async def retention_loop() -> None:
+    """Run retention every RETENTION_INTERVAL_SECONDS for the life of the process"""
+    while True:
+        try:
+            await run_retention()
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}")
+        await asyncio.sleep(RETENTION_INTERVAL_SECONDS)
+
+
+@router.post("/run")
+async def trigger_retention(dry_run: bool = False):
+    """Run the configured retention policies now"""
+    return asdict(await run_retention(dry_run=dry_run))
+
+
+@router.get("/report")
+async def get_retention_report():
+    """Report from the last completed retention run"""
+    return asdict(last_report) if last_report else {"status": "never_run"}
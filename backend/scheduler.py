@@ -0,0 +1,327 @@
+"""Priority-aware admission control in front of the shared model.
+
+Every model call goes through ``InferenceScheduler.infer`` instead of calling
+the model from the event loop. Calls are queued in one of two classes:
+
+* ``INTERACTIVE`` synchronous requests such as ``/detect``; always dispatched
+  first, rejected with 429 once a user exceeds their token-bucket rate and
+  with 503 once the interactive queue is full
+* ``STREAM`` batched frames from live streams; dispatched after interactive
+  work and ahead of batch work, but at most ``STREAM_MAX_CONSECUTIVE`` times
+  in a row while batch work is ready, so busy streams cannot starve batch
+  work. Not rate limited: each stream has at most one frame in flight and
+  drops stale frames itself (see ``streams.py``)
+* ``BATCH`` background analyses; dispatched when no interactive work is
+  waiting and it is not the streams' turn, round-robin across users so one
+  large backlog cannot starve other users. Each user's token bucket paces
+  them only while stream work is waiting too; a model with nothing else to
+  do takes batch work regardless of the buckets
+
+All queues are bounded, and the per-user share of the batch queue is capped.
+Request handlers shed work beyond that with 503 and ``Retry-After`` rather
+than queueing it without limit; background callers (batch chunks,
+re-analysis, stream batchers) pass ``admit=False`` and wait for room instead,
+since there is no client to retry. The model runs on dedicated threads (``MODEL_CONCURRENCY``,
+default 1) so the event loop stays free while it computes.
+
+Work carrying a ``Deadline`` is dropped without reaching the model once the
+deadline passes or its client disconnects while still queued.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+from deadlines import ClientDisconnected, Deadline, DeadlineExceeded
+from metrics import SCHEDULER_QUEUE_DEPTH, SCHEDULER_SHED, STAGE_SECONDS
+
+INTERACTIVE = "interactive"
+STREAM = "stream"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, STREAM, BATCH)
+
+MODEL_CONCURRENCY = int(os.getenv("MODEL_CONCURRENCY", "1"))
+INTERACTIVE_QUEUE_LIMIT = int(os.getenv("INTERACTIVE_QUEUE_LIMIT", "32"))
+STREAM_QUEUE_LIMIT = int(os.getenv("STREAM_QUEUE_LIMIT", "8"))
+BATCH_QUEUE_LIMIT = int(os.getenv("BATCH_QUEUE_LIMIT", "2048"))
+BATCH_USER_QUEUE_LIMIT = int(os.getenv("BATCH_USER_QUEUE_LIMIT", "512"))
+# Stream dispatches in a row before ready batch work gets one; batch gets at least 1/(N+1) of the model
+STREAM_MAX_CONSECUTIVE = int(os.getenv("STREAM_MAX_CONSECUTIVE", "3"))
+
+# Model calls per second and burst size, per user and class
+INTERACTIVE_USER_RATE = float(os.getenv("INTERACTIVE_USER_RATE", "10"))
+INTERACTIVE_USER_BURST = float(os.getenv("INTERACTIVE_USER_BURST", "20"))
+BATCH_USER_RATE = float(os.getenv("BATCH_USER_RATE", "5"))
+BATCH_USER_BURST = float(os.getenv("BATCH_USER_BURST", "10"))
+
+RETRY_AFTER_SECONDS = 2
+# How often a queued interactive caller checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+def client_key(request: Request) -> str:
+    """Identify the caller for fairness: X-User-Id when sent, else the client address"""
+    user = request.headers.get("x-user-id")
+    if user:
+        return f"user:{user}"
+    return f"ip:{request.client.host}" if request.client else "anonymous"
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+@dataclass
+class Job:
+    func: Callable[[Any], Any]
+    arg: Any
+    user: str
+    future: asyncio.Future
+    priority: str = INTERACTIVE
+    deadline: Optional[Deadline] = None
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class _ClassQueue:
+    """Per-user FIFOs served round-robin"""
+
+    def __init__(self, limit: int, user_limit: Optional[int]):
+        self.limit = limit
+        self.user_limit = user_limit
+        self.by_user: Dict[str, Deque[Job]] = {}
+        self.order: Deque[str] = deque()
+        self.size = 0
+
+    def has_room(self, user: str) -> bool:
+        if self.size >= self.limit:
+            return False
+        return self.user_limit is None or len(self.by_user.get(user, ())) < self.user_limit
+
+    def push(self, job: Job) -> None:
+        if job.user not in self.by_user:
+            self.by_user[job.user] = deque()
+            self.order.append(job.user)
+        self.by_user[job.user].append(job)
+        self.size += 1
+
+    def pop(self, ready: Callable[[str], bool]) -> Optional[Job]:
+        """Take the next job from the first user, in round-robin order, for whom ``ready`` holds"""
+        for _ in range(len(self.order)):
+            user = self.order[0]
+            self.order.rotate(-1)
+            if not ready(user):
+                continue
+            jobs = self.by_user[user]
+            job = jobs.popleft()
+            if not jobs:
+                del self.by_user[user]
+                self.order.remove(user)
+            self.size -= 1
+            return job
+        return None
+
+
+class InferenceScheduler:
+    def __init__(self, concurrency: int = MODEL_CONCURRENCY):
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="visionflow-model")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.queues = {
+            INTERACTIVE: _ClassQueue(INTERACTIVE_QUEUE_LIMIT, None),
+            STREAM: _ClassQueue(STREAM_QUEUE_LIMIT, None),
+            BATCH: _ClassQueue(BATCH_QUEUE_LIMIT, BATCH_USER_QUEUE_LIMIT),
+        }
+        self.buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._stream_run = 0  # stream jobs dispatched since the last batch job
+        self._wakeup: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Condition] = None
+        self._workers = []
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # First use, or a new event loop (e.g. after a test client restart)
+        self._loop = loop
+        self._reset()
+        self._wakeup = asyncio.Event()
+        self._room = asyncio.Condition()
+        self._workers = [loop.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def _bucket(self, priority: str, user: str) -> TokenBucket:
+        key = (priority, user)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if priority == INTERACTIVE:
+                bucket = TokenBucket(INTERACTIVE_USER_RATE, INTERACTIVE_USER_BURST)
+            else:
+                bucket = TokenBucket(BATCH_USER_RATE, BATCH_USER_BURST)
+            self.buckets[key] = bucket
+        return bucket
+
+    def _shed(self, priority: str, reason: str, status_code: int, detail: str) -> HTTPException:
+        SCHEDULER_SHED.labels(priority, reason).inc()
+        return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+    def admit(self, priority: str, user: str) -> None:
+        """Raise 429/503 if work of this class from this user would be rejected right now"""
+        if priority not in self.queues:
+            raise ValueError(f"Unknown priority: {priority}")
+        queue = self.queues[priority]
+        if not queue.has_room(user):
+            raise self._shed(priority, "queue_full", 503, "Server busy, try again shortly")
+        if priority == INTERACTIVE and self._bucket(priority, user).wait_time() > 0:
+            raise self._shed(priority, "rate_limited", 429, "Too many requests")
+
+    async def infer(
+        self,
+        func: Callable[[Any], Any],
+        arg: Any,
+        priority: str = INTERACTIVE,
+        user: str = "anonymous",
+        deadline: Optional[Deadline] = None,
+        admit: bool = True,
+    ) -> Any:
+        """Queue ``func(arg)`` (a model call) and return its result once dispatched.
+
+        With ``admit`` the call is shed like ``admit()`` would; without, it waits
+        for room in its queue and is never rate limited at admission.
+        """
+        self._ensure_started()
+        if admit:
+            self.admit(priority, user)
+        elif priority not in self.queues:
+            raise ValueError(f"Unknown priority: {priority}")
+        else:
+            queue = self.queues[priority]
+            async with self._room:
+                await self._room.wait_for(lambda: queue.has_room(user))
+        if deadline is not None:
+            await deadline.check("queue")
+        if priority == INTERACTIVE:
+            # Interactive calls are rate limited at admission; batch calls are paced at dispatch
+            self._bucket(priority, user).try_take()
+
+        job = Job(func, arg, user, self._loop.create_future(), priority, deadline)
+        self.queues[priority].push(job)
+        SCHEDULER_QUEUE_DEPTH.labels(priority).set(self.queues[priority].size)
+        self._wakeup.set()
+        if deadline is None:
+            return await job.future
+        return await self._wait(job)
+
+    async def _wait(self, job: Job) -> Any:
+        """Wait for a job, cancelling it if its deadline passes or its client goes away.
+
+        A cancelled job stays in its queue until popped; the worker skips it.
+        """
+        deadline = job.deadline
+        while True:
+            timeout = deadline.remaining()
+            if deadline.request is not None:
+                timeout = DISCONNECT_POLL_SECONDS if timeout is None else min(timeout, DISCONNECT_POLL_SECONDS)
+            try:
+                done, _ = await asyncio.wait({job.future}, timeout=None if timeout is None else max(timeout, 0))
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            if done:
+                return job.future.result()
+            if deadline.expired():
+                job.future.cancel()
+                SCHEDULER_SHED.labels(job.priority, "expired").inc()
+                raise DeadlineExceeded("inference")
+            if deadline.request is not None and await deadline.request.is_disconnected():
+                job.future.cancel()
+                SCHEDULER_SHED.labels(job.priority, "disconnected").inc()
+                raise ClientDisconnected("inference")
+
+    def _next_job(self) -> Optional[Job]:
+        """Pick the next job to run, or None when every queue is empty"""
+        job = self.queues[INTERACTIVE].pop(lambda user: True)
+        if job is not None:
+            return job
+        stream, batch = self.queues[STREAM], self.queues[BATCH]
+        if self._stream_run < STREAM_MAX_CONSECUTIVE or not batch.size:
+            job = stream.pop(lambda user: True)
+            if job is not None:
+                self._stream_run = self._stream_run + 1 if batch.size else 0
+                return job
+        job = batch.pop(lambda user: self._bucket(BATCH, user).try_take())
+        if job is None:
+            # Batch work waiting on its buckets does not hold streams back
+            job = stream.pop(lambda user: True)
+            if job is not None:
+                return job
+            # Nothing else wants the model; leaving it idle to honor the buckets would only slow batch work
+            job = batch.pop(lambda user: True)
+        if job is not None:
+            self._stream_run = 0
+        return job
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            for priority in PRIORITIES:
+                SCHEDULER_QUEUE_DEPTH.labels(priority).set(self.queues[priority].size)
+            async with self._room:
+                self._room.notify_all()
+            if job.future.cancelled():
+                continue
+            if job.deadline is not None and job.deadline.expired():
+                # Expired while queued: never spend model time on it
+                SCHEDULER_SHED.labels(job.priority, "expired").inc()
+                job.future.set_exception(DeadlineExceeded("inference"))
+                continue
+            STAGE_SECONDS.labels("queue_wait").observe(time.perf_counter() - job.enqueued)
+            try:
+                result = await loop.run_in_executor(self.executor, job.func, job.arg)
+            except Exception as e:
+                if not job.future.cancelled():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.cancelled():
+                    job.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            priority: {"queued": queue.size, "users": len(queue.order)}
+            for priority, queue in self.queues.items()
+        }
+
+
+scheduler = InferenceScheduler()
@@ -0,0 +1,292 @@
+"""Detection search and aggregate statistics.
+
+Filtering, grouping and counting run in the database against the detection
+indexes; nothing here loads whole tables into Python.
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import desc, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from models import DailyClassStats, DailyStats, Detection, File as FileModel
+from pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api")
+
+MAX_PAGE_SIZE = 500
+
+
+def _detection_filters(
+    class_name: Optional[List[str]],
+    min_confidence: Optional[float],
+    max_confidence: Optional[float],
+) -> List[Any]:
+    filters = []
+    if class_name:
+        filters.append(Detection.class_name.in_(class_name))
+    if min_confidence is not None:
+        filters.append(Detection.confidence >= min_confidence)
+    if max_confidence is not None:
+        filters.append(Detection.confidence <= max_confidence)
+    return filters
+
+
+def _file_filters(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    user_id: Optional[uuid.UUID],
+) -> List[Any]:
+    filters = []
+    if since is not None:
+        filters.append(FileModel.uploaded_at >= since)
+    if until is not None:
+        filters.append(FileModel.uploaded_at < until)
+    if user_id is not None:
+        filters.append(FileModel.user_id == user_id)
+    return filters
+
+
+@router.get("/detections/search")
+async def search_detections(
+    class_name: Optional[List[str]] = Query(None),
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    max_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    min_count: int = Query(1, ge=1),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    user_id: Optional[uuid.UUID] = None,
+    include_detections: bool = False,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Find files with at least ``min_count`` detections matching the filters, newest first.
+
+    Example: ``?class_name=person&min_confidence=0.7&min_count=3&since=2026-10-12``.
+    Pages are keyed on (uploaded_at, id); pass ``next_cursor`` back as ``cursor``.
+    """
+    try:
+        detection_filters = _detection_filters(class_name, min_confidence, max_confidence)
+        file_filters = _file_filters(since, until, user_id)
+        position = decode_cursor(cursor)
+        if position is not None:
+            file_filters.append(tuple_(FileModel.uploaded_at, FileModel.id) < tuple_(*position))
+
+        match_count = func.count(Detection.id).label("match_count")
+        stmt = (
+            select(FileModel.id, FileModel.filename, FileModel.uploaded_at, match_count)
+            .join(Detection, Detection.file_id == FileModel.id)
+            .where(*file_filters, *detection_filters)
+            .group_by(FileModel.id, FileModel.filename, FileModel.uploaded_at)
+            .having(match_count >= min_count)
+            .order_by(desc(FileModel.uploaded_at), desc(FileModel.id))
+            .limit(limit + 1)
+        )
+        rows = (await db.execute(stmt)).all()
+        # One row past the page tells whether another page exists
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items: List[Dict[str, Any]] = [
+            {
+                "file_id": str(row.id),
+                "filename": row.filename,
+                "uploaded_at": row.uploaded_at.isoformat(),
+                "match_count": row.match_count,
+            }
+            for row in rows
+        ]
+
+        if include_detections and rows:
+            det_stmt = (
+                select(Detection)
+                .where(Detection.file_id.in_([row.id for row in rows]), *detection_filters)
+                .order_by(Detection.file_id, desc(Detection.confidence))
+            )
+            by_file: Dict[str, List[Dict[str, Any]]] = {}
+            for det in (await db.execute(det_stmt)).scalars():
+                by_file.setdefault(str(det.file_id), []).append({
+                    "id": str(det.id),
+                    "class_name": det.class_name,
+                    "confidence": det.confidence,
+                    "bbox": det.bbox,
+                })
+            for item in items:
+                item["detections"] = by_file.get(item["file_id"], [])
+
+        next_cursor = encode_cursor(rows[-1].uploaded_at, rows[-1].id) if has_more else None
+        return {"items": items, "next_cursor": next_cursor}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching detections: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error searching detections")
+
+
+async def _summary_stats(
+    db: AsyncSession,
+    group_by: str,
+    class_name: Optional[List[str]],
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> List[Dict[str, Any]]:
+    if group_by == "day" and not class_name:
+        filters = []
+        if since is not None:
+            filters.append(DailyStats.day >= since.date())
+        if until is not None:
+            filters.append(DailyStats.day < until.date())
+        stmt = select(DailyStats).where(*filters).order_by(DailyStats.day)
+        return [
+            {"day": str(row.day), "count": row.detection_count, "files": row.files_analyzed}
+            for row in (await db.execute(stmt)).scalars()
+        ]
+
+    filters = []
+    if class_name:
+        filters.append(DailyClassStats.class_name.in_(class_name))
+    if since is not None:
+        filters.append(DailyClassStats.day >= since.date())
+    if until is not None:
+        filters.append(DailyClassStats.day < until.date())
+    keys = {
+        "class": [DailyClassStats.class_name],
+        "day": [DailyClassStats.day],
+        "class_day": [DailyClassStats.day, DailyClassStats.class_name],
+    }[group_by]
+
+    # Each file sits in exactly one day, so summing file_count across days stays distinct
+    stmt = (
+        select(
+            *keys,
+            func.sum(DailyClassStats.detection_count).label("count"),
+            func.sum(DailyClassStats.file_count).label("files"),
+            func.sum(DailyClassStats.confidence_sum).label("confidence_sum"),
+        )
+        .where(*filters)
+        .group_by(*keys)
+        .having(func.sum(DailyClassStats.detection_count) > 0)
+        .order_by(*keys)
+    )
+    groups = []
+    for row in (await db.execute(stmt)).all():
+        group: Dict[str, Any] = {
+            "count": int(row.count),
+            "files": int(row.files),
+            "avg_confidence": float(row.confidence_sum) / int(row.count),
+        }
+        if group_by in {"day", "class_day"}:
+            group["day"] = str(row.day)
+        if group_by in {"class", "class_day"}:
+            group["class_name"] = row.class_name
+        groups.append(group)
+    return groups
+
+
+@router.get("/stats/overview")
+async def get_stats_overview(db: AsyncSession = Depends(get_db)):
+    """Dashboard totals read from the daily summary tables"""
+    try:
+        totals = (await db.execute(
+            select(
+                func.coalesce(func.sum(DailyStats.files_analyzed), 0),
+                func.coalesce(func.sum(DailyStats.detection_count), 0),
+            )
+        )).one()
+        class_rows = (await db.execute(
+            select(DailyClassStats.class_name, func.sum(DailyClassStats.detection_count).label("count"))
+            .group_by(DailyClassStats.class_name)
+            .having(func.sum(DailyClassStats.detection_count) > 0)
+            .order_by(desc("count"))
+        )).all()
+        return {
+            "files_analyzed": int(totals[0]),
+            "total_objects": int(totals[1]),
+            "classes": {row.class_name: int(row.count) for row in class_rows},
+        }
+    except Exception as e:
+        logger.error(f"Error computing stats overview: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error computing stats overview")
+
+
+@router.get("/stats")
+async def get_stats(
+    group_by: str = Query("class", pattern="^(class|day|class_day)$"),
+    class_name: Optional[List[str]] = Query(None),
+    min_confidence: Optional[float] = Query(None, ge=0.0, le=1.0),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Detection counts grouped by class, by day, or by class per day.
+
+    Days are taken from ``detections.processed_at``. Without a confidence
+    filter the answer comes from the incrementally maintained daily summary
+    tables (day granularity for ``since``/``until``); with one, the detections
+    table is aggregated directly.
+    """
+    try:
+        if min_confidence is None:
+            groups = await _summary_stats(db, group_by, class_name, since, until)
+            return {
+                "group_by": group_by,
+                "source": "summary",
+                "total_detections": sum(g["count"] for g in groups),
+                "groups": groups,
+            }
+
+        filters = _detection_filters(class_name, min_confidence, None)
+        if since is not None:
+            filters.append(Detection.processed_at >= since)
+        if until is not None:
+            filters.append(Detection.processed_at < until)
+
+        day = func.date(Detection.processed_at).label("day")
+        keys = {
+            "class": [Detection.class_name],
+            "day": [day],
+            "class_day": [day, Detection.class_name],
+        }[group_by]
+
+        stmt = (
+            select(
+                *keys,
+                func.count(Detection.id).label("count"),
+                func.count(func.distinct(Detection.file_id)).label("files"),
+                func.avg(Detection.confidence).label("avg_confidence"),
+            )
+            .where(*filters)
+            .group_by(*keys)
+            .order_by(*keys)
+        )
+        rows = (await db.execute(stmt)).all()
+
+        groups = []
+        for row in rows:
+            group: Dict[str, Any] = {
+                "count": row.count,
+                "files": row.files,
+                "avg_confidence": float(row.avg_confidence) if row.avg_confidence is not None else None,
+            }
+            if group_by in {"day", "class_day"}:
+                group["day"] = str(row.day)
+            if group_by in {"class", "class_day"}:
+                group["class_name"] = row.class_name
+            groups.append(group)
+
+        return {
+            "group_by": group_by,
+            "source": "detections",
+            "total_detections": sum(g["count"] for g in groups),
+            "groups": groups,
+        }
+    except Exception as e:
+        logger.error(f"Error computing stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error computing stats")
@@ -1,30 +1,56 @@
 from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException, Request, Response, BackgroundTasks
-from fastapi.responses import StreamingResponse, JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, FileResponse, ORJSONResponse
 from dotenv import load_dotenv
-from starlette.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from fastapi import Depends
-from database import get_db
-from models import File as FileModel, Detection, User, Export
+from sqlalchemy import select, desc, delete, insert, update
+from sqlalchemy.orm import selectinload
+from fastapi import Depends, Query
+from starlette.concurrency import run_in_threadpool
+from database import get_db, AsyncSessionLocal, dialect_insert
+from models import File as FileModel, Detection, User, Export, Blob, SupersededExport
+from encoding import ImageEncoding, DEFAULT_ENCODING, negotiate_encoding, encode_image, sniff_media_type, stored_media_type
+from executor import run_cpu
+from pipeline import (
+    DetectionResult, get_color_for_class, decode_image_bytes, process_image_detections,
+    draw_detections_on_image, encode_image_to_base64,
+)
+from ingest import IngestedBlob, ingest_upload, ingest_fileobj, RequestSizeLimitMiddleware, MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD
+from storage import blob_store
+from search import router as search_router
+from stats import flush_file_stats, stage_file_stats
+from retention import discard_blobs, retention_loop, router as retention_router
+from responses import COLUMNAR, ROWS, AnalysisEncoder, detections_by_file, parse_layout
+from changes import MAX_PAGE_SIZE as MAX_CHANGES_PAGE_SIZE, changed_files, compaction_loop, flush_changes, parse_cursor, record_changes, stage_changes
+from reanalysis import router as reanalysis_router, runner as reanalysis_runner
+from bulk_export import router as bulk_export_router
+from zones import ImageZones, image_zones, resolve_roi, router as zones_router
+from motion import MOTION_GATE_METHOD, MotionGate
+from streams import batcher as stream_batcher, router as streams_router
+from cors import CORSMiddleware
+from metrics import MetricsMiddleware, metrics_response, record_cache, stage
+from deadlines import ANALYSIS_JOB_TTL_SECONDS, DETECT_TIMEOUT_SECONDS, Deadline
+from inference import load_model, readiness, start_warm_up
+from scheduler import BATCH, INTERACTIVE, client_key, scheduler
+from tracing import ProfilingMiddleware, record_model_speed, router as traces_router
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterable, Tuple
 import uuid
 from datetime import datetime
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import base64
 import tempfile
 import zipfile
+import zlib
 import json
 import io
 from PIL import Image
 import shutil
+import mimetypes
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -37,113 +63,45 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Initialize YOLO model
-model = YOLO("yolov8n.pt")
-
-# Custom CORS middleware for additional debugging and fallback
-class CustomCORSMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Log request details for debugging
-        logger.info(f"Request: {request.method} {request.url} - Origin: {request.headers.get('origin')}")
-        
-        # Handle preflight OPTIONS requests
-        if request.method == "OPTIONS":
-            response = Response()
-            origin = request.headers.get("origin")
-            
-            # Allow specific origins
-            allowed_origins = [
-                "http://localhost:3000",
-                "https://vision-flow-alpha.vercel.app"
-            ]
-            
-            if origin and (origin in allowed_origins or origin.endswith(".vercel.app")):
-                response.headers["Access-Control-Allow-Origin"] = origin
-            else:
-                response.headers["Access-Control-Allow-Origin"] = "*"
-                
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Max-Age"] = "3600"
-            
-            logger.info(f"CORS preflight response headers: {dict(response.headers)}")
-            return response
-        
-        # Process the request
-        response = await call_next(request)
-        
-        # Add CORS headers to all responses as fallback
-        origin = request.headers.get("origin")
-        if origin:
-            allowed_origins = [
-                "http://localhost:3000",
-                "https://vision-flow-alpha.vercel.app"
-            ]
-            
-            if origin in allowed_origins or origin.endswith(".vercel.app"):
-                response.headers["Access-Control-Allow-Origin"] = origin
-                response.headers["Access-Control-Allow-Credentials"] = "true"
-            else:
-                response.headers["Access-Control-Allow-Origin"] = "*"
-        
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "*"
-        
-        logger.info(f"Response headers: {dict(response.headers)}")
-        return response
+MODEL_WEIGHTS = os.getenv("MODEL_WEIGHTS", "yolov8n.pt")
+# Identifies the weights/settings behind stored detections; change it to stop reusing old results
+MODEL_VERSION = os.getenv("MODEL_VERSION", MODEL_WEIGHTS)
+model = load_model(MODEL_WEIGHTS)
+CLASS_IDS = {name: class_id for class_id, name in model.names.items()}
 
 # Create the main app without a prefix
 app = FastAPI()
 
-# Add custom CORS middleware first for debugging and fallback
-app.add_middleware(CustomCORSMiddleware)
-
-# Configure standard CORS middleware as backup
+# Bound request bodies before they are parsed; single-image routes get the per-file limit
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[
-        "http://localhost:3000",
-        "https://vision-flow-alpha.vercel.app",
-    ],
-    # Allow any *.vercel.app deployment previews
-    allow_origin_regex=r"https://.*\.vercel\.app",
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["*"],
-    expose_headers=["*"],
-    max_age=3600,
+    RequestSizeLimitMiddleware,
+    limits={
+        "/api/upload": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+        "/api/detect": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+    },
 )
 
-# Add explicit OPTIONS handler for CORS preflight requests
-@app.options("/{path:path}")
-async def options_handler(path: str):
-    """Handle CORS preflight requests"""
-    return JSONResponse(
-        content={"message": "OK"},
-        headers={
-            "Access-Control-Allow-Origin": "*",
-            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-            "Access-Control-Allow-Headers": "*",
-            "Access-Control-Max-Age": "3600",
-        }
-    )
+# Admin-only span tracing for requests sent with X-Profile / ?profile=1
+app.add_middleware(ProfilingMiddleware)
+
+# Wraps the remaining middleware, so request metrics include the time spent in it
+app.add_middleware(MetricsMiddleware)
+
+# CORS for the allowlisted frontends (ALLOWED_ORIGINS / ALLOWED_ORIGIN_REGEX), preflights included.
+# Added last so it is outermost: responses produced by the middleware above
+# (413s, profiling and metrics errors) carry CORS headers too
+app.add_middleware(CORSMiddleware)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Define Models
-class DetectionResult(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    class_name: str
-    confidence: float
-    bbox: List[float]  # [x1, y1, x2, y2]
-    color: str
-
 class AnalysisResult(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     filename: str
     file_type: str
-    image_data: str  # base64 encoded image
+    image_data: Optional[str] = None  # base64 encoded image, None until analyzed
+    image_mime: str = "image/jpeg"
     detections: List[DetectionResult]
     total_objects: int
     processing_time: float
@@ -157,99 +115,188 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
-# Color palette for different classes
-COLORS = [
-    "#FF6B6B", "#4ECDC4", "#45B7D1", "#96CEB4", "#FFEAA7", 
-    "#DDA0DD", "#98D8C8", "#F7DC6F", "#BB8FCE", "#85C1E9"
-]
-
-def get_color_for_class(class_index: int) -> str:
-    return COLORS[class_index % len(COLORS)]
-
-def encode_image_to_base64(image_array: np.ndarray) -> str:
-    """Convert image array to base64 string"""
-    is_success, buffer = cv2.imencode(".jpg", image_array)
-    if not is_success:
-        raise ValueError("Failed to encode image")
-    return base64.b64encode(buffer).decode('utf-8')
-
-def process_image_detections(results, original_image: np.ndarray) -> List[DetectionResult]:
-    """Process YOLO results and return detection objects"""
-    detections = []
-    
-    if results[0].boxes is not None:
-        for i, box in enumerate(results[0].boxes):
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-            confidence = float(box.conf[0].cpu().numpy())
-            class_id = int(box.cls[0].cpu().numpy())
-            class_name = model.names[class_id]
-            
-            detection = DetectionResult(
-                class_name=class_name,
-                confidence=confidence,
-                bbox=[float(x1), float(y1), float(x2), float(y2)],
-                color=get_color_for_class(class_id)
-            )
-            detections.append(detection)
-    
-    return detections
+def get_color_for_class_name(class_name: str) -> str:
+    return get_color_for_class(CLASS_IDS.get(class_name, 0))
 
-def draw_detections_on_image(image: np.ndarray, detections: List[DetectionResult]) -> np.ndarray:
-    """Draw bounding boxes and labels on image"""
-    result_image = image.copy()
-    
-    for detection in detections:
-        x1, y1, x2, y2 = [int(coord) for coord in detection.bbox]
-        
-        # Convert hex color to BGR
-        color_hex = detection.color.lstrip('#')
-        color_rgb = tuple(int(color_hex[i:i+2], 16) for i in (0, 2, 4))
-        color_bgr = color_rgb[::-1]  # Convert RGB to BGR
-        
-        # Draw rectangle
-        cv2.rectangle(result_image, (x1, y1), (x2, y2), color_bgr, 8)
-        
-        # Draw label background
-        label = f"{detection.class_name}: {detection.confidence:.2f}"
-        label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 2)[0]
-        cv2.rectangle(result_image, (x1, y1 - label_size[1] - 10), 
-                     (x1 + label_size[0], y1), color_bgr, -1)
-        
-        # Draw label text
-        cv2.putText(result_image, label, (x1, y1 - 5), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-    
-    return result_image
+def resolve_encoding(request: Request, format: Optional[str] = None, quality: Optional[int] = None) -> ImageEncoding:
+    """Negotiate the output image encoding from query parameters and Accept header"""
+    try:
+        return negotiate_encoding(format, request.headers.get("accept"), quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def read_original_bytes(file: FileModel) -> Optional[bytes]:
+    """Return the uploaded bytes of a file from blob storage, or the legacy base64 column"""
+    if file.blob_key:
+        return blob_store.read(file.blob_key)
+    if file.image_data:
+        return base64.b64decode(file.image_data)
+    return None
+
+def load_original_image(file: FileModel) -> Optional[np.ndarray]:
+    return decode_image_bytes(read_original_bytes(file))
+
+def zones_for_image(roi: Optional[str], image: np.ndarray) -> Optional[ImageZones]:
+    """Resolve a request's zone spec against the decoded image"""
+    try:
+        return image_zones(roi, image)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def roi_input(image: np.ndarray, zones: Optional[ImageZones]) -> np.ndarray:
+    """The part of the image the model sees"""
+    return image if zones is None else zones.crop(image)
+
+def roi_detections(results, model_input: np.ndarray, zones: Optional[ImageZones]) -> List[DetectionResult]:
+    """Post-process model output on the ROI crop into full-image detections inside the zones"""
+    detections = process_image_detections(results, model_input, model.names)
+    return detections if zones is None else zones.apply(detections)
+
+def build_detection_rows(file_id: uuid.UUID, detections: List[DetectionResult]) -> List[Detection]:
+    """Map detection results to ORM rows for a file"""
+    return [
+        Detection(
+            id=uuid.UUID(det.id),
+            file_id=file_id,
+            class_name=det.class_name,
+            confidence=det.confidence,
+            x_min=det.bbox[0],
+            y_min=det.bbox[1],
+            x_max=det.bbox[2],
+            y_max=det.bbox[3]
+        ) for det in detections
+    ]
+
+async def save_detections(db: AsyncSession, file_id: uuid.UUID, detections: List[DetectionResult]) -> None:
+    """Add a file's detection rows and update its summary statistics in the same transaction.
+
+    Also bumps the file's detection version, which invalidates cached exports.
+    """
+    db.add_all(build_detection_rows(file_id, detections))
+    stage_file_stats(db, file_id, detections)
+    stage_changes(db, [file_id])
+    await db.execute(
+        update(FileModel)
+        .where(FileModel.id == file_id)
+        .values(detection_version=FileModel.detection_version + 1)
+    )
+
+async def commit_analysis(db: AsyncSession) -> None:
+    """Commit, writing the staged statistics and change-feed rows last.
+
+    Locks on the shared daily rows and the change feed are then held only for
+    the commit itself, and feed rows are numbered in commit order.
+    """
+    await flush_file_stats(db)
+    await flush_changes(db)
+    await db.commit()
+
+def detection_from_row(det: Detection) -> DetectionResult:
+    return DetectionResult(
+        id=str(det.id),
+        class_name=det.class_name,
+        confidence=det.confidence,
+        bbox=det.bbox,
+        color=get_color_for_class_name(det.class_name)
+    )
+
+def analysis_from_file(file: FileModel, detections: List[DetectionResult]) -> AnalysisResult:
+    """Build the API representation of a stored file and its detections"""
+    return AnalysisResult(
+        id=str(file.id),
+        filename=file.filename,
+        file_type=file.filetype,
+        image_data=file.image_data,
+        image_mime=stored_media_type(file.image_data),
+        detections=detections,
+        total_objects=len(detections),
+        processing_time=file.processing_time or 0.0,
+        timestamp=file.uploaded_at
+    )
+
+async def register_blob(db: AsyncSession, blob: IngestedBlob) -> None:
+    """Record a stored blob once; re-uploads of the same bytes hit the unique digest"""
+    stmt = dialect_insert(db, Blob).values(
+        digest=blob.digest,
+        blob_key=blob.blob_key,
+        size=blob.size,
+        media_type=blob.media_type,
+        created_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=["digest"])
+    await db.execute(stmt)
+    # The same lock the file's foreign key takes; from here until commit retention cannot remove the blob
+    await db.execute(select(Blob.digest).where(Blob.digest == blob.digest).with_for_update(key_share=True))
+    check_blobs_stored([blob])
+
+def check_blobs_stored(blobs: Iterable[IngestedBlob]) -> None:
+    """Refuse an upload whose deduplicated bytes retention removed before its blob row was locked"""
+    if any(not blob_store.exists(blob.blob_key) for blob in blobs):
+        raise HTTPException(status_code=503, detail="Stored content was removed concurrently; retry the upload")
+
+async def reuse_analysis(db: AsyncSession, file: FileModel) -> Optional[List[DetectionResult]]:
+    """Copy detections and the annotated image from an identical file analyzed by the current model.
+
+    Returns the copied detections, or None when there is nothing to reuse.
+    """
+    if not file.content_hash:
+        return None
+    stmt = (
+        select(FileModel)
+        .where(
+            FileModel.content_hash == file.content_hash,
+            FileModel.model_version == MODEL_VERSION,
+            FileModel.roi.is_not_distinct_from(file.roi),
+            FileModel.image_data.isnot(None),
+            FileModel.id != file.id
+        )
+        .order_by(desc(FileModel.uploaded_at))
+        .limit(1)
+    )
+    source = (await db.execute(stmt)).scalar_one_or_none()
+    record_cache("analysis_reuse", source is not None)
+    if source is None:
+        return None
+
+    det_res = await db.execute(select(Detection).where(Detection.file_id == source.id))
+    detections = [
+        detection_from_row(det).model_copy(update={"id": str(uuid.uuid4())})
+        for det in det_res.scalars().all()
+    ]
+    await save_detections(db, file.id, detections)
+    file.image_data = source.image_data
+    file.model_version = MODEL_VERSION
+    file.width, file.height = source.width, source.height
+    logger.info(f"Reused analysis of {source.id} for duplicate upload {file.id}")
+    return detections
 
 @api_router.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+async def upload_file(request: Request, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
     """Upload image and store it without running YOLO analysis."""
     try:
-        # Validate file type
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="Only image files are supported")
-        
-        # Read file contents
-        contents = await file.read()
-        if len(contents) == 0:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
-        
-        logger.info(f"Uploading file: {file.filename}, size: {len(contents)} bytes, type: {file.content_type}")
+        # Stream into blob storage; the type is sniffed from the file's magic bytes
+        with stage("upload_read"):
+            blob = await ingest_upload(file)
         
-        # Encode image to base64 for storage
-        image_base64 = base64.b64encode(contents).decode('utf-8')
+        logger.info(f"Uploading file: {file.filename}, size: {blob.size} bytes, type: {blob.media_type}")
         
         # Create file record matching the database schema
+        await register_blob(db, blob)
         file_record = FileModel(
             filename=file.filename,
-            filetype=file.content_type,  # Match database field name
-            size=str(len(contents)),     # Match database field name and type
-            image_data=image_base64      # Store base64 encoded image
+            filetype=blob.media_type,    # Match database field name
+            size=str(blob.size),         # Match database field name and type
+            blob_key=blob.blob_key,      # Original bytes live in blob storage
+            content_hash=blob.digest,    # Links duplicates to the same blob
+            owner=client_key(request)
         )
         
-        # Save to database
+        # Save to database, picking up detections from an identical earlier upload
         db.add(file_record)
-        await db.commit()
+        await db.flush()
+        reused = await reuse_analysis(db, file_record)
+        if reused is None:
+            stage_changes(db, [file_record.id])
+        await commit_analysis(db)
         await db.refresh(file_record)
         
         logger.info(f"File uploaded successfully with ID: {file_record.id}")
@@ -258,6 +305,7 @@ async def upload_file(file: UploadFile = File(...), db: AsyncSession = Depends(g
             "status": "success",
             "file_id": str(file_record.id),
             "filename": file.filename,
+            "analyzed": reused is not None,
             "message": "File uploaded and stored"
         }
         
@@ -272,88 +320,119 @@ async def upload_file(file: UploadFile = File(...), db: AsyncSession = Depends(g
 # Old synchronous analyze endpoint removed - now using background processing
 
 @api_router.post("/detect", response_model=AnalysisResult)
-async def detect_objects(file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
-    """Detect objects in uploaded image using YOLOv8"""
+async def detect_objects(
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    quality: Optional[int] = None,
+    roi: Optional[str] = None,
+    source: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Detect objects in uploaded image using YOLOv8, optionally within zones (``roi`` JSON or a ``source`` preset)"""
+    user = client_key(request)
     try:
-        # Validate file type
-        if not file.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="Only image files are supported")
-        
-        # Read image
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Invalid image format")
+        # Shed load before doing any work for a request the scheduler would reject
+        scheduler.admit(INTERACTIVE, user)
+        deadline = Deadline.from_request(request, DETECT_TIMEOUT_SECONDS)
+        encoding = resolve_encoding(request, format, quality)
+        roi_spec = await resolve_roi(db, roi, source)
+
+        # Stream into blob storage and link the file to its blob
+        with stage("upload_read"):
+            blob = await ingest_upload(file)
+        await register_blob(db, blob)
+        file_record = FileModel(
+            filename=file.filename,
+            filetype=blob.media_type,
+            size=str(blob.size),
+            blob_key=blob.blob_key,
+            content_hash=blob.digest,
+            roi=roi_spec,
+            owner=user
+        )
+        db.add(file_record)
+        await db.flush()
         
-        # Run YOLO detection
+        # Identical bytes already analyzed by the current model skip inference
         start_time = datetime.now()
-        results = model(image)
+        detections = await reuse_analysis(db, file_record)
+        if detections is not None and quality is None and stored_media_type(file_record.image_data) == encoding.media_type:
+            image_base64 = file_record.image_data
+        else:
+            await deadline.check("decode")
+            with stage("decode"):
+                image = await run_cpu(lambda: decode_image_bytes(blob_store.read(blob.blob_key)))
+            if image is None:
+                raise HTTPException(status_code=400, detail="Invalid image format")
+            
+            if detections is None:
+                # Run YOLO detection on the region of interest only
+                zones = zones_for_image(roi_spec, image)
+                model_input = roi_input(image, zones)
+                with stage("inference"):
+                    results = await scheduler.infer(model, model_input, INTERACTIVE, user, deadline)
+                    record_model_speed(results)
+                with stage("postprocess"):
+                    detections = roi_detections(results, model_input, zones)
+                await save_detections(db, file_record.id, detections)
+                file_record.model_version = MODEL_VERSION
+                file_record.height, file_record.width = image.shape[:2]
+            
+            # Create annotated image
+            await deadline.check("render")
+            with stage("render"):
+                annotated_image = draw_detections_on_image(image, detections)
+            
+            # Convert to base64 in the negotiated format
+            await deadline.check("encode")
+            with stage("encode"):
+                image_base64 = await run_cpu(encode_image_to_base64, annotated_image, encoding)
+            file_record.image_data = image_base64
         processing_time = (datetime.now() - start_time).total_seconds()
-        
-        # Process detections
-        detections = process_image_detections(results, image)
-        
-        # Create annotated image
-        annotated_image = draw_detections_on_image(image, detections)
-        
-        # Convert to base64
-        image_base64 = encode_image_to_base64(annotated_image)
+        file_record.processing_time = processing_time
         
         # Create result object
         result = AnalysisResult(
+            id=str(file_record.id),
             filename=file.filename,
-            file_type=file.content_type,
+            file_type=blob.media_type,
             image_data=image_base64,
+            image_mime=encoding.media_type,
             detections=detections,
             total_objects=len(detections),
             processing_time=processing_time
         )
         
-        # Persist to PostgreSQL
-        file_record = FileModel(
-            filename=file.filename,
-            file_type=file.content_type,
-            file_size=len(contents),
-            image_data=image_base64,
-            processing_time=processing_time
-        )
-        db.add(file_record)
-        await db.flush()
-
-        for det in detections:
-            det_row = Detection(
-                file_id=file_record.id,
-                class_name=det.class_name,
-                confidence=det.confidence,
-                x_min=det.bbox[0],
-                y_min=det.bbox[1],
-                x_max=det.bbox[2],
-                y_max=det.bbox[3]
-            )
-            db.add(det_row)
-
-        await db.commit()
+        # Persist to PostgreSQL; nobody is waiting for the result of an abandoned request
+        await deadline.check("db_commit")
+        with stage("db_commit"):
+            await commit_analysis(db)
 
         return result
         
     except HTTPException:
         # Re-raise HTTP exceptions as-is
+        await db.rollback()
         raise
     except Exception as e:
+        await db.rollback()
         logger.error(f"Error processing image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing image: {str(e)}")
 
 @api_router.post("/export")
-async def export_file(payload: Dict[str, Any], db: AsyncSession = Depends(get_db)):
+async def export_file(payload: Dict[str, Any], request: Request, db: AsyncSession = Depends(get_db)):
     """Export annotated image or detections.
-    Expected JSON payload: {"file_id": str, "format": "jpg|json|yolo"}
+    Expected JSON payload: {"file_id": str, "format": "jpg|png|webp|avif|image|json|yolo", "quality": int}
     """
     file_id = payload.get("file_id")
     export_format = payload.get("format", "jpg").lower()
+    quality = payload.get("quality")
     if not file_id:
         raise HTTPException(status_code=400, detail="file_id required")
+    # bool is an int subclass, but {"quality": true} is not a quality
+    if quality is not None and (not isinstance(quality, int) or isinstance(quality, bool) or not 1 <= quality <= 100):
+        raise HTTPException(status_code=400, detail="quality must be an integer between 1 and 100")
     try:
         file_uuid = uuid.UUID(file_id)
         stmt = select(FileModel).where(FileModel.id == file_uuid)
@@ -366,20 +445,32 @@ async def export_file(payload: Dict[str, Any], db: AsyncSession = Depends(get_db
         det_res = await db.execute(det_stmt)
         detections = det_res.scalars().all()
 
-        # JPG/PNG returns annotated image stored in image_data
-        if export_format in ["jpg", "jpeg", "png"]:
+        # Image formats return the annotated image stored in image_data,
+        # re-encoded only when the stored container differs from the request
+        if export_format in ["jpg", "jpeg", "png", "webp", "avif", "image"]:
             if not file.image_data:
                 raise HTTPException(status_code=400, detail="Annotated image not available")
+            requested = None if export_format == "image" else export_format
+            encoding = resolve_encoding(request, requested, quality)
             image_bytes = base64.b64decode(file.image_data)
-            headers = {"Content-Disposition": f"attachment; filename={file.filename}_annotated.jpg"}
-            return StreamingResponse(io.BytesIO(image_bytes), media_type="image/jpeg", headers=headers)
+            reencode = quality is not None or sniff_media_type(image_bytes) != encoding.media_type
+            record_cache("export_image", not reencode)
+            if reencode:
+                with stage("decode"):
+                    image = await run_cpu(cv2.imdecode, np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+                if image is None:
+                    raise HTTPException(status_code=400, detail="Invalid image data")
+                with stage("encode"):
+                    image_bytes = await run_cpu(encode_image, image, encoding)
+            headers = {"Content-Disposition": f"attachment; filename={file.filename}_annotated{encoding.extension}"}
+            return StreamingResponse(io.BytesIO(image_bytes), media_type=encoding.media_type, headers=headers)
 
         elif export_format == "json":
             det_json = [
                 {
                     "class_name": d.class_name,
                     "confidence": d.confidence,
-                    "bbox": d.box_coordinates,
+                    "bbox": d.bbox,
                 }
                 for d in detections
             ]
@@ -388,7 +479,7 @@ async def export_file(payload: Dict[str, Any], db: AsyncSession = Depends(get_db
         elif export_format == "yolo":
             lines = []
             for d in detections:
-                x1, y1, x2, y2 = d.box_coordinates
+                x1, y1, x2, y2 = d.bbox
                 lines.append(f"{d.class_name} {x1} {y1} {x2} {y2} {d.confidence}")
             yolo_bytes = "\n".join(lines).encode()
             headers = {"Content-Disposition": f"attachment; filename={file.filename}.txt"}
@@ -401,161 +492,264 @@ async def export_file(payload: Dict[str, Any], db: AsyncSession = Depends(get_db
         logger.error(f"Export error: {e}")
         raise HTTPException(status_code=500, detail="Error exporting results")
 
+async def get_file_with_detections(db: AsyncSession, file_id: str) -> Optional[FileModel]:
+    """Load one file and its detections, or None for unknown or malformed IDs"""
+    try:
+        file_uuid = uuid.UUID(file_id)
+    except ValueError:
+        return None
+    stmt = select(FileModel).options(selectinload(FileModel.detections)).where(FileModel.id == file_uuid)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
 @api_router.get("/analyses", response_model=List[AnalysisResult])
-async def get_analyses(db: AsyncSession = Depends(get_db)):
-    """Get all analysis results"""
+async def get_analyses(layout: str = ROWS, db: AsyncSession = Depends(get_db)):
+    """Get all analysis results.
+
+    ``layout=columnar`` returns ``{"classes": [...], "analyses": [...]}`` with
+    each file's detections as parallel arrays.
+    """
+    encoder = AnalysisEncoder(parse_layout(layout), CLASS_IDS)
     try:
-        # Get files with their detections, ordered by created_at desc
-        stmt = select(FileModel).order_by(desc(FileModel.created_at)).limit(100)
-        result = await db.execute(stmt)
-        files = result.scalars().all()
-        
-        analyses = []
-        for file in files:
-            # Convert file and detections to AnalysisResult format
-            detections = [
-                DetectionResult(
-                    id=str(det.id),
-                    class_name=det.class_name,
-                    confidence=det.confidence,
-                    bbox=[det.x_min, det.y_min, det.x_max, det.y_max],
-                    color=get_color_for_class(hash(det.class_name) % len(COLORS))
-                ) for det in file.detections
-            ]
-            
-            analysis = AnalysisResult(
-                id=str(file.id),
-                filename=file.filename,
-                file_type=file.file_type,
-                image_data=file.image_data,
-                detections=detections,
-                total_objects=len(detections),
-                processing_time=file.processing_time or 0.0,
-                timestamp=file.created_at
-            )
-            analyses.append(analysis)
-            
-        return analyses
+        # Newest first via ix_files_uploaded_at_id; detections come in one IN query on ix_detections_file_id
+        stmt = (
+            select(*encoder.file_columns)
+            .order_by(desc(FileModel.uploaded_at), desc(FileModel.id))
+            .limit(100)
+        )
+        files = (await db.execute(stmt)).all()
+        detections = await detections_by_file(db, [file.id for file in files])
+
+        # Plain rows straight to orjson, without building response models
+        analyses = [encoder.analysis(file, detections[file.id]) for file in files]
+        if encoder.layout == COLUMNAR:
+            return ORJSONResponse({"classes": encoder.classes(), "analyses": analyses})
+        return ORJSONResponse(analyses)
     except Exception as e:
         logger.error(f"Error fetching analyses: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching analyses")
 
+@api_router.get("/changes")
+async def get_changes(
+    since: Optional[str] = None,
+    limit: int = 100,
+    include_images: bool = False,
+    layout: str = ROWS,
+    db: AsyncSession = Depends(get_db),
+):
+    """Files created, updated or deleted after the ``since`` cursor, oldest change first.
+
+    Start with no cursor for a full sync, then pass back ``cursor``; repeat
+    while ``has_more``. Annotated images are left out unless
+    ``include_images`` is set; fetch them per file from ``/analyses/{id}``.
+    """
+    encoder = AnalysisEncoder(parse_layout(layout), CLASS_IDS, include_images)
+    page = await changed_files(db, parse_cursor(since), max(1, min(limit, MAX_CHANGES_PAGE_SIZE)))
+    files = []
+    if page.upserted:
+        result = await db.execute(select(*encoder.file_columns).where(FileModel.id.in_(page.upserted)))
+        by_id = {file.id: file for file in result.all()}
+        detections = await detections_by_file(db, list(by_id))
+        for file_id in page.upserted:
+            file = by_id.get(file_id)
+            if file is None:
+                # Deleted since the change was logged; its delete entry is still settling
+                continue
+            files.append(encoder.analysis(
+                file, detections[file_id], analyzed=file.model_version is not None, seq=page.seqs[file_id],
+            ))
+    body = {
+        "cursor": str(page.cursor),
+        "has_more": page.has_more,
+        "files": files,
+        "deleted": [{"id": file_id, "seq": page.seqs[file_id]} for file_id in page.deleted],
+    }
+    if encoder.layout == COLUMNAR:
+        body["classes"] = encoder.classes()
+    return ORJSONResponse(body)
+
 @api_router.get("/analyses/{analysis_id}", response_model=AnalysisResult)
-async def get_analysis(analysis_id: str, db: AsyncSession = Depends(get_db)):
+async def get_analysis(analysis_id: str, layout: str = ROWS, db: AsyncSession = Depends(get_db)):
     """Get specific analysis result"""
+    encoder = AnalysisEncoder(parse_layout(layout), CLASS_IDS)
     try:
-        # Get file by ID with its detections
-        stmt = select(FileModel).where(FileModel.id == analysis_id)
-        result = await db.execute(stmt)
-        file = result.scalar_one_or_none()
-        
+        try:
+            file_uuid = uuid.UUID(analysis_id)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        file = (await db.execute(select(*encoder.file_columns).where(FileModel.id == file_uuid))).one_or_none()
         if not file:
             raise HTTPException(status_code=404, detail="Analysis not found")
-        
-        # Convert file and detections to AnalysisResult format
-        detections = [
-            DetectionResult(
-                id=str(det.id),
-                class_name=det.class_name,
-                confidence=det.confidence,
-                bbox=[det.x_min, det.y_min, det.x_max, det.y_max],
-                color=get_color_for_class(hash(det.class_name) % len(COLORS))
-            ) for det in file.detections
-        ]
-        
-        analysis = AnalysisResult(
-            id=str(file.id),
-            filename=file.filename,
-            file_type=file.file_type,
-            image_data=file.image_data,
-            detections=detections,
-            total_objects=len(detections),
-            processing_time=file.processing_time or 0.0,
-            timestamp=file.created_at
-        )
-        
-        return analysis
+
+        detections = await detections_by_file(db, [file.id])
+        analysis = encoder.analysis(file, detections[file.id])
+        if encoder.layout == COLUMNAR:
+            analysis["classes"] = encoder.classes()
+        return ORJSONResponse(analysis)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error fetching analysis: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching analysis")
 
-@api_router.post("/export/{analysis_id}")
-async def export_analysis(analysis_id: str, format: str = "yolo", db: AsyncSession = Depends(get_db)):
-    """Export analysis results in specified format"""
-    try:
-        # Get file by ID with its detections
-        stmt = select(FileModel).where(FileModel.id == analysis_id)
-        result = await db.execute(stmt)
-        file = result.scalar_one_or_none()
-        
-        if not file:
-            raise HTTPException(status_code=404, detail="Analysis not found")
-        
-        # Create temporary directory
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_path = Path(temp_dir)
-            
-            # Save original image
-            image_data = base64.b64decode(file.image_data)
-            image_path = temp_path / f"{file.filename}"
-            with open(image_path, 'wb') as f:
-                f.write(image_data)
-            
-            # Generate annotations based on format
-            if format == "yolo":
-                annotations_path = temp_path / f"{Path(file.filename).stem}.txt"
-                with open(annotations_path, 'w') as f:
-                    for det in file.detections:
-                        # Convert to YOLO format (normalized coordinates)
-                        # Note: This is a simplified conversion - in real implementation,
-                        # you'd need image dimensions for proper normalization
-                        f.write(f"0 {det.x_min} {det.y_min} {det.x_max} {det.y_max}\n")
-            
-            elif format == "coco":
-                coco_data = {
-                    "images": [{"id": 1, "file_name": file.filename}],
-                    "annotations": [],
-                    "categories": []
+EXPORT_FORMATS = ("yolo", "coco")
+
+def build_export_archive(file: FileModel, image_data: bytes, export_format: str) -> bytes:
+    """Build the export ZIP: the image plus annotations in the requested format"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zipf:
+        zipf.writestr(file.filename, image_data)
+
+        if export_format == "yolo":
+            lines = []
+            for det in file.detections:
+                # YOLO format: class x_center y_center width height, normalized
+                # when the image dimensions are known
+                width, height = file.width or 1, file.height or 1
+                x_center = (det.x_min + det.x_max) / 2 / width
+                y_center = (det.y_min + det.y_max) / 2 / height
+                box_w = (det.x_max - det.x_min) / width
+                box_h = (det.y_max - det.y_min) / height
+                class_id = CLASS_IDS.get(det.class_name, 0)
+                lines.append(f"{class_id} {x_center:.6f} {y_center:.6f} {box_w:.6f} {box_h:.6f}\n")
+            zipf.writestr(f"{Path(file.filename).stem}.txt", "".join(lines))
+
+        elif export_format == "coco":
+            coco_data = {
+                "images": [{"id": 1, "file_name": file.filename, "width": file.width, "height": file.height}],
+                "annotations": [],
+                "categories": [
+                    {"id": CLASS_IDS.get(name, 0), "name": name}
+                    for name in sorted({det.class_name for det in file.detections})
+                ]
+            }
+
+            for i, det in enumerate(file.detections):
+                box_w = det.x_max - det.x_min
+                box_h = det.y_max - det.y_min
+                annotation = {
+                    "id": i,
+                    "image_id": 1,
+                    "category_id": CLASS_IDS.get(det.class_name, 0),
+                    "bbox": [det.x_min, det.y_min, box_w, box_h],
+                    "area": box_w * box_h,
+                    "score": det.confidence,
+                    "iscrowd": 0
                 }
-                
-                for i, det in enumerate(file.detections):
-                    annotation = {
-                        "id": i,
-                        "image_id": 1,
-                        "category_id": 1,
-                        "bbox": [det.x_min, det.y_min, det.x_max, det.y_max],
-                        "area": (det.x_max - det.x_min) * (det.y_max - det.y_min),
-                        "iscrowd": 0
-                    }
-                    coco_data["annotations"].append(annotation)
-                
-                annotations_path = temp_path / "annotations.json"
-                with open(annotations_path, 'w') as f:
-                    json.dump(coco_data, f, indent=2)
-            
-            # Create ZIP file
-            zip_path = temp_path / f"export_{analysis_id}.zip"
-            with zipfile.ZipFile(zip_path, 'w') as zipf:
-                for file_path in temp_path.glob("*"):
-                    if file_path != zip_path:
-                        zipf.write(file_path, file_path.name)
-            
-            # Return ZIP file - read the file content before the temp directory is deleted
-            with open(zip_path, 'rb') as f:
-                zip_content = f.read()
-            
-            return StreamingResponse(
-                io.BytesIO(zip_content),
-                media_type="application/zip",
-                headers={"Content-Disposition": f"attachment; filename=export_{analysis_id}.zip"}
+                coco_data["annotations"].append(annotation)
+            zipf.writestr("annotations.json", json.dumps(coco_data, indent=2))
+    return buffer.getvalue()
+
+async def store_export(db: AsyncSession, file: FileModel, export_format: str) -> Export:
+    """Build an export for the file's current detections, store it and record it in ``exports``"""
+    # The annotated image, or the original upload if not analyzed yet
+    if file.image_data:
+        image_data = base64.b64decode(file.image_data)
+    else:
+        image_data = await run_in_threadpool(read_original_bytes, file)
+    with stage("export_build"):
+        archive = await run_cpu(build_export_archive, file, image_data or b"", export_format)
+    blob_key, digest = await run_in_threadpool(blob_store.put, archive)
+
+    previous_key = (await db.execute(
+        select(Export.blob_key).where(Export.file_id == file.id, Export.format == export_format)
+    )).scalar_one_or_none()
+
+    values = dict(
+        id=uuid.uuid4(),
+        file_id=file.id,
+        format=export_format,
+        download_url=f"/api/export/{file.id}?format={export_format}",
+        detection_version=file.detection_version,
+        blob_key=blob_key,
+        etag=digest,
+        size=len(archive),
+        created_at=datetime.utcnow()
+    )
+    stmt = dialect_insert(db, Export).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["file_id", "format"],
+        set_={name: getattr(stmt.excluded, name) for name in values if name not in {"id", "file_id", "format"}}
+    )
+    await db.execute(stmt)
+    if previous_key and previous_key != blob_key:
+        # A download may still be about to open the old artifact; retention deletes it later
+        await db.execute(
+            dialect_insert(db, SupersededExport)
+            .values(blob_key=previous_key, superseded_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=["blob_key"])
+        )
+    with stage("db_commit"):
+        await db.commit()
+    return Export(**values)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+@api_router.api_route("/export/{analysis_id}", methods=["GET", "POST"])
+async def export_analysis(analysis_id: str, request: Request, format: str = "yolo", db: AsyncSession = Depends(get_db)):
+    """Export analysis results in specified format.
+
+    The ZIP is built once per (file, format, detection version), kept in blob
+    storage and recorded in ``exports``; repeat requests stream the stored
+    artifact and honour ``If-None-Match``.
+    """
+    export_format = format.lower()
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    try:
+        file_uuid = uuid.UUID(analysis_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+
+    try:
+        export = (await db.execute(
+            select(Export)
+            .join(FileModel, FileModel.id == Export.file_id)
+            .where(
+                Export.file_id == file_uuid,
+                Export.format == export_format,
+                Export.detection_version == FileModel.detection_version
             )
-            
+        )).scalar_one_or_none()
+
+        cached = export is not None and blob_store.exists(export.blob_key)
+        record_cache("export", cached)
+        if not cached:
+            file = await get_file_with_detections(db, analysis_id)
+            if not file:
+                raise HTTPException(status_code=404, detail="Analysis not found")
+            export = await store_export(db, file, export_format)
+            logger.info(f"Generated {export_format} export for {analysis_id}")
+
+        etag = f'"{export.etag}"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+        headers["Content-Disposition"] = f"attachment; filename=export_{analysis_id}.zip"
+        return FileResponse(blob_store.path_for(export.blob_key), media_type="application/zip", headers=headers)
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error exporting analysis: {str(e)}")
         raise HTTPException(status_code=500, detail="Error exporting analysis")
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return metrics_response()
+
+@app.get("/ready", include_in_schema=False)
+async def ready():
+    """Readiness probe: 503 until model warm-up has finished"""
+    state = readiness()
+    return JSONResponse(content=state, status_code=200 if state["ready"] else 503)
+
 # Add root endpoint for health checks and CORS verification
 @app.get("/")
 async def app_root():
@@ -593,10 +787,18 @@ async def get_status_checks(db: AsyncSession = Depends(get_db)):
 # In-memory caches for analysis status and results (for demo/free tier only)
 analysis_status: Dict[str, str] = {}
 analysis_results: Dict[str, Any] = {}
+analysis_rois: Dict[str, Optional[str]] = {}  # zone spec each cached result was produced with
 
 # ---------------- Background Analysis Helpers -----------------
-async def analyze_file_internal(file_id: str, db: AsyncSession):
-    """Internal function to run YOLO analysis - used by both sync and async endpoints"""
+async def analyze_file_internal(
+    file_id: str,
+    db: AsyncSession,
+    priority: str = BATCH,
+    user: str = "anonymous",
+    deadline: Optional[Deadline] = None,
+    roi: Optional[str] = None,
+):
+    """Internal function to run YOLO analysis for background analysis jobs; the model call waits for queue room instead of shedding"""
     import time
     start_time = time.time()
     
@@ -611,41 +813,55 @@ async def analyze_file_internal(file_id: str, db: AsyncSession):
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Delete existing detections for this file
-    delete_stmt = delete(Detection).where(Detection.file_id == file.id)
-    await db.execute(delete_stmt)
-    
-    # Decode base64 image
-    image_data = base64.b64decode(file.image_data)
-    image_array = np.frombuffer(image_data, np.uint8)
-    image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-    
-    if image is None:
-        raise HTTPException(status_code=400, detail="Invalid image data")
-    
-    # Run YOLO detection
-    results = model(image)
-    detections = process_image_detections(results, image)
-    
-    # Draw bounding boxes on image
-    annotated_image = draw_detections_on_image(image.copy(), detections)
-    annotated_base64 = encode_image_to_base64(annotated_image)
-    
-    # Store detections in database
-    for det in detections:
-        detection = Detection(
-            file_id=file.id,
-            class_name=det.class_name,
-            confidence=str(det.confidence),
-            box_coordinates=det.bbox
-        )
-        db.add(detection)
-    
-    # Update file with annotated image
-    file.image_data = annotated_base64
-    
-    await db.commit()
-    await db.refresh(file)
+    analyzed = file.model_version == MODEL_VERSION and file.image_data is not None and file.roi == roi
+    record_cache("analysis_result", analyzed)
+    if analyzed:
+        # Already analyzed by the current model; serve the stored result
+        det_res = await db.execute(select(Detection).where(Detection.file_id == file.id))
+        detections = [detection_from_row(det) for det in det_res.scalars().all()]
+    else:
+        # Delete existing detections for this file
+        delete_stmt = delete(Detection).where(Detection.file_id == file.id)
+        await db.execute(delete_stmt)
+        file.roi = roi
+        
+        # Identical bytes analyzed with the same zones need no inference
+        detections = await reuse_analysis(db, file)
+        if detections is None:
+            deadline = deadline or Deadline()
+            # Decode the original upload
+            await deadline.check("decode")
+            with stage("decode"):
+                image = await run_cpu(load_original_image, file)
+            
+            if image is None:
+                raise HTTPException(status_code=400, detail="Invalid image data")
+            
+            # Run YOLO detection on the region of interest only
+            zones = zones_for_image(roi, image)
+            model_input = roi_input(image, zones)
+            with stage("inference"):
+                results = await scheduler.infer(model, model_input, priority, user, deadline, admit=False)
+                record_model_speed(results)
+            with stage("postprocess"):
+                detections = roi_detections(results, model_input, zones)
+            
+            # Draw bounding boxes on image
+            await deadline.check("render")
+            with stage("render"):
+                annotated_image = draw_detections_on_image(image.copy(), detections)
+            
+            # Store detections and annotated image in database
+            await save_detections(db, file.id, detections)
+            with stage("encode"):
+                file.image_data = await run_cpu(encode_image_to_base64, annotated_image, DEFAULT_ENCODING)
+            file.model_version = MODEL_VERSION
+            file.height, file.width = image.shape[:2]
+        
+        file.processing_time = time.time() - start_time
+        with stage("db_commit"):
+            await commit_analysis(db)
+        await db.refresh(file)
     
     processing_time = time.time() - start_time
     
@@ -654,14 +870,15 @@ async def analyze_file_internal(file_id: str, db: AsyncSession):
         id=str(file.id),
         filename=file.filename,
         file_type=file.filetype,
-        image_data=annotated_base64,
+        image_data=file.image_data,
+        image_mime=stored_media_type(file.image_data),
         detections=detections,
         total_objects=len(detections),
         processing_time=processing_time,
-        timestamp=file.created_at
+        timestamp=file.uploaded_at
     )
 
-async def _run_analysis(file_id: str):
+async def _run_analysis(file_id: str, user: str = "anonymous", deadline: Optional[Deadline] = None, roi: Optional[str] = None):
     """Background task that runs YOLO detection and stores result in cache and DB."""
     from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
     # Create a new session because the background task has no request context
@@ -672,7 +889,7 @@ async def _run_analysis(file_id: str):
         try:
             logger.info(f"[BG] Running analysis for {file_id}")
             # Re-use existing analyze logic via internal function
-            result = await analyze_file_internal(file_id, db)
+            result = await analyze_file_internal(file_id, db, BATCH, user, deadline, roi)
             analysis_results[file_id] = result.dict()  # Convert to dict for JSON serialization
             analysis_status[file_id] = "done"
             logger.info(f"[BG] Analysis complete for {file_id}")
@@ -684,15 +901,29 @@ async def _run_analysis(file_id: str):
 # ---------------- API Endpoints -----------------
 
 @api_router.post("/analyze/{file_id}")
-async def start_analysis(file_id: str, background_tasks: BackgroundTasks):
+async def start_analysis(
+    file_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    roi: Optional[str] = None,
+    source: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
     """Kick off background analysis and return immediately"""
-    # If already processing or done, short-circuit
+    roi_spec = await resolve_roi(db, roi, source)
+    # If already processing, or done with the same zones, short-circuit
     status = analysis_status.get(file_id)
-    if status in {"processing", "done"}:
+    if status == "processing" or (status == "done" and analysis_rois.get(file_id) == roi_spec):
         return {"status": status, "file_id": file_id}
 
+    # Background work is queued as batch priority; refuse it up front when that queue is full
+    user = client_key(request)
+    scheduler.admit(BATCH, user)
+    # The job outlives this request, so its TTL is not tied to the connection
+    deadline = Deadline.from_request(request, ANALYSIS_JOB_TTL_SECONDS, attach=False)
     analysis_status[file_id] = "processing"
-    background_tasks.add_task(_run_analysis, file_id)
+    analysis_rois[file_id] = roi_spec
+    background_tasks.add_task(_run_analysis, file_id, user, deadline, roi_spec)
     return {"status": "processing", "file_id": file_id}
 
 @api_router.get("/analysis/{file_id}")
@@ -707,7 +938,382 @@ async def get_analysis_status(file_id: str):
     else:
         return {"status": "not_found"}
 
+# ---------------- Batch Upload and Analysis -----------------
+
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "5000"))
+BATCH_INFERENCE_SIZE = int(os.getenv("BATCH_INFERENCE_SIZE", "8"))
+
+# In-memory batch progress, keyed by batch ID (same lifetime as analysis_status)
+batch_jobs: Dict[str, Dict[str, Any]] = {}
+
+def _ingest_zip_images(fileobj, max_images: int) -> Tuple[List[Any], bool]:
+    """Stream the image members of a ZIP archive into blob storage, at most ``max_images`` of them.
+
+    Returns (filename, IngestedBlob or None, error) tuples, one per image member
+    read, and whether the archive held more images than that.
+    """
+    ingested = []
+    stored = 0
+    with zipfile.ZipFile(fileobj) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            content_type = mimetypes.guess_type(info.filename)[0] or ""
+            if not content_type.startswith("image/"):
+                continue
+            if stored >= max_images:
+                return ingested, True
+            name = Path(info.filename).name
+            if info.file_size > MAX_UPLOAD_BYTES:
+                ingested.append((name, None, f"File exceeds {MAX_UPLOAD_BYTES} bytes"))
+                continue
+            try:
+                with archive.open(info) as member:
+                    ingested.append((name, ingest_fileobj(member), None))
+                stored += 1
+            except HTTPException as e:
+                ingested.append((name, None, e.detail))
+            except (zipfile.BadZipFile, zlib.error, EOFError):
+                ingested.append((name, None, "Corrupt archive member"))
+    return ingested, False
+
+
+async def _analyze_file_batch(
+    file_ids: List[uuid.UUID],
+    db: AsyncSession,
+    user: str = "anonymous",
+    gate: Optional[MotionGate] = None,
+) -> Dict[str, List[uuid.UUID]]:
+    """Run one batched YOLO call over several stored files and persist the results.
+
+    With a motion gate the files are treated as consecutive frames, in the
+    order given, and frames unchanged since the last inferred one reuse its detections.
+    """
+    result = await db.execute(select(FileModel).where(FileModel.id.in_(file_ids)))
+    order = {file_id: i for i, file_id in enumerate(file_ids)}
+    files = sorted(result.scalars().all(), key=lambda f: order[f.id])
+    await db.execute(delete(Detection).where(Detection.file_id.in_([f.id for f in files])))
+
+    # Identical bytes already analyzed by the current model need no inference
+    reused = []
+    pending = []
+    for file in files:
+        if await reuse_analysis(db, file) is None:
+            pending.append(file)
+        else:
+            reused.append(file.id)
+
+    images = await run_cpu(lambda: [load_original_image(f) for f in pending])
+    valid = [(f, image) for f, image in zip(pending, images) if image is not None]
+    failed = [f.id for f, image in zip(pending, images) if image is None]
+
+    if valid:
+        if gate is None:
+            keep = [True] * len(valid)
+        else:
+            with stage("motion_gate"):
+                keep = await run_cpu(lambda: [gate.changed(image) for _, image in valid])
+            for kept in keep:
+                record_cache("motion_gate", not kept)
+        keyframes = [image for (_, image), kept in zip(valid, keep) if kept]
+        inferred = []
+        if keyframes:
+            with stage("inference"):
+                results = await scheduler.infer(model, keyframes, BATCH, user, admit=False)
+                record_model_speed(results)
+            inferred = [process_image_detections([r], image, model.names) for r, image in zip(results, keyframes)]
+        all_detections = inferred if gate is None else gate.expand(keep, inferred)
+        for (file, image), detections in zip(valid, all_detections):
+            annotated_image = await run_cpu(draw_detections_on_image, image, detections)
+            file.image_data = await run_cpu(encode_image_to_base64, annotated_image, DEFAULT_ENCODING)
+            file.model_version = MODEL_VERSION
+            file.height, file.width = image.shape[:2]
+            await save_detections(db, file.id, detections)
+    await commit_analysis(db)
+    return {"done": reused + [f.id for f, _ in valid], "failed": failed}
+
+async def _lock_stale_file(db: AsyncSession, file_id: uuid.UUID) -> Optional[FileModel]:
+    """Lock a file for a detection swap; None if it is gone or already on the current model"""
+    stmt = (
+        select(FileModel)
+        .where(FileModel.id == file_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    file = (await db.execute(stmt)).scalar_one_or_none()
+    if file is None or file.model_version == MODEL_VERSION:
+        return None
+    return file
+
+def _read_blob_image(blob_key: str) -> Optional[np.ndarray]:
+    try:
+        return decode_image_bytes(blob_store.read(blob_key))
+    except OSError:
+        return None
+
+async def _reanalyze_files(db: AsyncSession, file_ids: List[uuid.UUID], user: str = "anonymous") -> Dict[str, List[uuid.UUID]]:
+    """Re-run detection for files analyzed by an older model; used by re-analysis campaigns.
+
+    Each file's old detections are replaced in a single transaction, so readers
+    see either the old or the new set. Only originals in blob storage are
+    analyzed: legacy files keep just the annotated image, and analyzing that
+    would detect and draw over the old boxes.
+    """
+    done: List[uuid.UUID] = []
+    failed: List[uuid.UUID] = []
+    skipped: List[uuid.UUID] = []
+    pending = []
+    for file_id in file_ids:
+        file = await _lock_stale_file(db, file_id)
+        if file is None or not file.blob_key:
+            await db.rollback()
+            skipped.append(file_id)
+            continue
+        # Identical bytes already re-analyzed by the current model need no inference
+        await db.execute(delete(Detection).where(Detection.file_id == file.id))
+        if await reuse_analysis(db, file) is not None:
+            await commit_analysis(db)
+            done.append(file_id)
+        else:
+            pending.append((file.id, file.blob_key, file.roi))
+            await db.rollback()
+
+    images = await run_cpu(lambda: [_read_blob_image(blob_key) for _, blob_key, _ in pending])
+    valid = []
+    for (file_id, _, roi), image in zip(pending, images):
+        if image is None:
+            failed.append(file_id)
+            continue
+        try:
+            # Keep each file limited to the zones it was analyzed with
+            zones = image_zones(roi, image)
+        except ValueError:
+            failed.append(file_id)
+            continue
+        valid.append((file_id, image, zones, roi_input(image, zones)))
+    if not valid:
+        return {"done": done, "failed": failed, "skipped": skipped}
+
+    with stage("inference"):
+        results = await scheduler.infer(model, [model_input for *_, model_input in valid], BATCH, user, admit=False)
+    for (file_id, image, zones, model_input), file_results in zip(valid, results):
+        detections = roi_detections([file_results], model_input, zones)
+        annotated_image = await run_cpu(draw_detections_on_image, image, detections)
+        image_data = await run_cpu(encode_image_to_base64, annotated_image, DEFAULT_ENCODING)
+
+        file = await _lock_stale_file(db, file_id)
+        if file is None:
+            # Deleted, or re-analyzed through the API while this batch was in the model
+            await db.rollback()
+            skipped.append(file_id)
+            continue
+        await db.execute(delete(Detection).where(Detection.file_id == file_id))
+        await save_detections(db, file_id, detections)
+        file.image_data = image_data
+        file.model_version = MODEL_VERSION
+        file.height, file.width = image.shape[:2]
+        with stage("db_commit"):
+            await commit_analysis(db)
+        done.append(file_id)
+    return {"done": done, "failed": failed, "skipped": skipped}
+
+async def _run_batch_analysis(batch_id: str, file_ids: List[uuid.UUID], user: str = "anonymous", gate: Optional[MotionGate] = None):
+    """Background task that analyzes a whole batch in chunks of BATCH_INFERENCE_SIZE"""
+    batch = batch_jobs[batch_id]
+    batch["status"] = "processing"
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(file_ids), BATCH_INFERENCE_SIZE):
+            chunk = file_ids[start:start + BATCH_INFERENCE_SIZE]
+            try:
+                outcome = await _analyze_file_batch(chunk, db, user, gate)
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"[BG] Batch {batch_id} chunk failed: {e}")
+                outcome = {"done": [], "failed": chunk}
+                if gate is not None:
+                    gate.reset()
+            for fid in outcome["done"]:
+                analysis_status[str(fid)] = "done"
+            for fid in outcome["failed"]:
+                analysis_status[str(fid)] = "error"
+                analysis_results[str(fid)] = {"detail": "Batch analysis failed"}
+            batch["completed"] += len(outcome["done"])
+            batch["failed"] += len(outcome["failed"])
+            if gate is not None:
+                batch["motion"] = gate.report()
+    batch["status"] = "done"
+    batch["finished_at"] = datetime.utcnow().isoformat()
+    logger.info(f"[BG] Batch {batch_id} complete: {batch['completed']} done, {batch['failed']} failed")
+
+@api_router.post("/batch")
+async def create_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    analyze: bool = True,
+    motion_gate: bool = False,
+    motion_method: str = MOTION_GATE_METHOD,
+    motion_threshold: Optional[float] = Query(None, gt=0, lt=1),
+    db: AsyncSession = Depends(get_db),
+):
+    """Upload many images (or ZIP archives of images) in one request and analyze them as one job.
+
+    ``motion_gate`` treats the images as a static-camera sequence in upload
+    (and archive) order and skips inference on frames that did not change.
+    """
+    owner = client_key(request)
+    gate = None
+    if analyze:
+        scheduler.admit(BATCH, owner)
+        if motion_gate:
+            try:
+                gate = MotionGate(motion_method, motion_threshold)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+    rows: List[Dict[str, Any]] = []
+    blobs: Dict[str, IngestedBlob] = {}
+    accepted: List[Dict[str, Any]] = []
+    skipped: List[Dict[str, Any]] = []
+
+    too_many = HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_FILES} files")
+
+    def add_row(index: int, filename: str, blob):
+        blobs[blob.digest] = blob
+        file_id = uuid.uuid4()
+        rows.append({
+            "id": file_id,
+            "filename": filename,
+            "filetype": blob.media_type,
+            "size": str(blob.size),
+            "blob_key": blob.blob_key,
+            "content_hash": blob.digest,
+            "owner": owner,
+            "uploaded_at": datetime.utcnow(),
+        })
+        accepted.append({"index": index, "file_id": str(file_id), "filename": filename})
+
+    try:
+        for index, upload in enumerate(files):
+            content_type = upload.content_type or ""
+            if content_type in {"application/zip", "application/x-zip-compressed"} or (upload.filename or "").lower().endswith(".zip"):
+                try:
+                    members, truncated = await run_in_threadpool(_ingest_zip_images, upload.file, BATCH_MAX_FILES - len(rows))
+                except zipfile.BadZipFile:
+                    skipped.append({"index": index, "filename": upload.filename, "reason": "Invalid ZIP archive"})
+                    continue
+                for name, blob, error in members:
+                    if blob is None:
+                        skipped.append({"index": index, "filename": name, "reason": error})
+                    else:
+                        add_row(index, name, blob)
+                if truncated:
+                    raise too_many
+                continue
+            if len(rows) >= BATCH_MAX_FILES:
+                raise too_many
+            try:
+                blob = await ingest_upload(upload)
+            except HTTPException as e:
+                skipped.append({"index": index, "filename": upload.filename, "reason": e.detail})
+                continue
+            add_row(index, upload.filename, blob)
+
+        if not rows:
+            raise HTTPException(status_code=400, detail="No valid images in batch")
+
+        # One multi-row INSERT per table instead of a round trip per file
+        await db.execute(
+            dialect_insert(db, Blob).on_conflict_do_nothing(index_elements=["digest"]),
+            [
+                {"digest": b.digest, "blob_key": b.blob_key, "size": b.size, "media_type": b.media_type, "created_at": datetime.utcnow()}
+                for b in blobs.values()
+            ]
+        )
+        await db.execute(insert(FileModel), rows)
+        check_blobs_stored(blobs.values())
+        await record_changes(db, [row["id"] for row in rows])
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        await discard_blobs(blobs.values())
+        raise
+    except Exception as e:
+        await db.rollback()
+        await discard_blobs(blobs.values())
+        logger.error(f"Error ingesting batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+    batch_id = str(uuid.uuid4())
+    file_ids = [row["id"] for row in rows]
+    batch_jobs[batch_id] = {
+        "batch_id": batch_id,
+        "status": "queued" if analyze else "uploaded",
+        "total": len(file_ids),
+        "completed": 0,
+        "failed": 0,
+        "file_ids": [str(fid) for fid in file_ids],
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    if analyze:
+        for fid in file_ids:
+            analysis_status[str(fid)] = "processing"
+        if gate is not None:
+            batch_jobs[batch_id]["motion"] = gate.report()
+        background_tasks.add_task(_run_batch_analysis, batch_id, file_ids, owner, gate)
+
+    logger.info(f"Batch {batch_id} stored {len(file_ids)} files, skipped {len(skipped)}")
+    return {
+        "status": batch_jobs[batch_id]["status"],
+        "batch_id": batch_id,
+        "total": len(file_ids),
+        "files": accepted,
+        "skipped": skipped,
+    }
+
+@api_router.get("/batch/{batch_id}")
+async def get_batch_status(batch_id: str, include_files: bool = False):
+    """Aggregate progress of a batch job"""
+    batch = batch_jobs.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    finished = batch["completed"] + batch["failed"]
+    response = {k: v for k, v in batch.items() if k != "file_ids"}
+    response["progress"] = finished / batch["total"] if batch["total"] else 1.0
+    if include_files:
+        response["files"] = {fid: analysis_status.get(fid, "not_found") for fid in batch["file_ids"]}
+    return response
+
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(search_router)
+app.include_router(retention_router)
+app.include_router(traces_router)
+app.include_router(reanalysis_router)
+app.include_router(bulk_export_router)
+app.include_router(zones_router)
+app.include_router(streams_router)
+
+@app.on_event("startup")
+async def warm_up_model():
+    start_warm_up(model, scheduler.executor)
+
+@app.on_event("startup")
+async def start_retention():
+    # Runs even with no policy configured, to delete superseded export artifacts
+    asyncio.create_task(retention_loop())
+
+@app.on_event("startup")
+async def start_change_compaction():
+    asyncio.create_task(compaction_loop())
+
+@app.on_event("startup")
+async def start_reanalysis():
+    # Resumes campaigns left running by a restart or by a worker that died
+    reanalysis_runner.configure(_reanalyze_files, MODEL_VERSION)
+    asyncio.create_task(reanalysis_runner.watch())
+
+@app.on_event("startup")
+async def start_streams():
+    stream_batcher.configure(model)
 
 # Database connections are handled by SQLAlchemy engine
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""Incrementally maintained detection statistics.
+
+Every write of a file's detections stages the file's new summary with
+``stage_file_stats``; ``flush_file_stats`` then swaps the summary rows and
+shifts the daily totals by the difference, as the last work before commit so
+the row locks on the shared daily rows are held only for the commit itself.
+Dashboards then read a handful of summary rows instead of aggregating the
+detections table.
+"""
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import uuid
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import dialect_insert
+from models import DailyClassStats, DailyStats, FileStats
+
+_PENDING_KEY = "pending_file_stats"
+
+
+@dataclass
+class _Summary:
+    day: date
+    class_counts: Dict[str, int]
+    confidence_sums: Dict[str, float]
+
+
+@dataclass
+class _DailyDeltas:
+    """Net change to the daily totals from a set of summary swaps"""
+    days: Dict[date, List[int]] = field(default_factory=lambda: defaultdict(lambda: [0, 0]))
+    classes: Dict[Tuple[date, str], List[float]] = field(default_factory=lambda: defaultdict(lambda: [0, 0, 0.0]))
+
+    def add(self, day: date, class_counts: Dict[str, int], confidence_sums: Dict[str, float], sign: int) -> None:
+        """Add (sign=1) or subtract (sign=-1) one file's contribution"""
+        totals = self.days[day]
+        totals[0] += sign
+        totals[1] += sign * sum(class_counts.values())
+        for class_name, count in class_counts.items():
+            totals = self.classes[(day, class_name)]
+            totals[0] += sign * count
+            totals[1] += sign
+            totals[2] += sign * confidence_sums.get(class_name, 0.0)
+
+
+def _summarize(detections: Iterable, day: date) -> _Summary:
+    class_counts: Counter = Counter()
+    confidence_sums: Dict[str, float] = defaultdict(float)
+    for det in detections:
+        class_counts[det.class_name] += 1
+        confidence_sums[det.class_name] += det.confidence
+    return _Summary(day, dict(class_counts), dict(confidence_sums))
+
+
+async def _shift_daily(db: AsyncSession, deltas: _DailyDeltas) -> None:
+    """Apply the net deltas with one upsert per table.
+
+    Rows go in key order so that concurrent transactions lock the shared daily
+    rows in the same order and cannot deadlock; rows that net to zero are not
+    touched at all.
+    """
+    day_rows = [
+        {"day": day, "files_analyzed": files, "detection_count": count}
+        for day, (files, count) in sorted(deltas.days.items())
+        if files or count
+    ]
+    if day_rows:
+        day_stmt = dialect_insert(db, DailyStats)
+        day_stmt = day_stmt.on_conflict_do_update(
+            index_elements=["day"],
+            set_={
+                "files_analyzed": DailyStats.files_analyzed + day_stmt.excluded.files_analyzed,
+                "detection_count": DailyStats.detection_count + day_stmt.excluded.detection_count,
+            },
+        )
+        await db.execute(day_stmt.values(day_rows))
+
+    class_rows = [
+        {"day": day, "class_name": class_name, "detection_count": count, "file_count": files, "confidence_sum": confidence}
+        for (day, class_name), (count, files, confidence) in sorted(deltas.classes.items())
+        if count or files or confidence
+    ]
+    if class_rows:
+        class_stmt = dialect_insert(db, DailyClassStats)
+        class_stmt = class_stmt.on_conflict_do_update(
+            index_elements=["day", "class_name"],
+            set_={
+                "detection_count": DailyClassStats.detection_count + class_stmt.excluded.detection_count,
+                "file_count": DailyClassStats.file_count + class_stmt.excluded.file_count,
+                "confidence_sum": DailyClassStats.confidence_sum + class_stmt.excluded.confidence_sum,
+            },
+        )
+        await db.execute(class_stmt.values(class_rows))
+
+
+def stage_file_stats(
+    db: AsyncSession,
+    file_id: uuid.UUID,
+    detections: Iterable,
+    day: Optional[date] = None,
+) -> None:
+    """Queue the replacement of a file's summary with ``detections`` (anything with class_name/confidence).
+
+    Nothing is written until ``flush_file_stats``; staging the same file again
+    replaces the earlier summary.
+    """
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    pending[file_id] = _summarize(detections, day or datetime.utcnow().date())
+
+
+async def flush_file_stats(db: AsyncSession) -> None:
+    """Write the summaries staged in this transaction; call right before commit"""
+    pending: Dict[uuid.UUID, _Summary] = db.info.pop(_PENDING_KEY, {})
+    if not pending:
+        return
+    file_ids = sorted(pending)
+    now = datetime.utcnow()
+
+    # Claim a row for files seen for the first time. A concurrent first
+    # analysis of the same file waits here and then takes the update path
+    # below, so neither fails on the primary key nor double counts the file.
+    insert_stmt = dialect_insert(db, FileStats).values([
+        {
+            "file_id": file_id,
+            "day": pending[file_id].day,
+            "object_count": 0,
+            "class_counts": {},
+            "confidence_sums": {},
+            "updated_at": now,
+        }
+        for file_id in file_ids
+    ]).on_conflict_do_nothing(index_elements=["file_id"]).returning(FileStats.file_id)
+    created = set((await db.execute(insert_stmt)).scalars())
+
+    result = await db.execute(
+        select(FileStats)
+        .where(FileStats.file_id.in_(file_ids))
+        .order_by(FileStats.file_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    deltas = _DailyDeltas()
+    for stats in result.scalars():
+        if stats.file_id not in created:
+            deltas.add(stats.day, stats.class_counts, stats.confidence_sums, sign=-1)
+        summary = pending[stats.file_id]
+        deltas.add(summary.day, summary.class_counts, summary.confidence_sums, sign=1)
+        stats.day = summary.day
+        stats.object_count = sum(summary.class_counts.values())
+        stats.class_counts = summary.class_counts
+        stats.confidence_sums = summary.confidence_sums
+        stats.updated_at = now
+    await _shift_daily(db, deltas)
+
+
+async def remove_file_stats(db: AsyncSession, file_ids: List[uuid.UUID]) -> None:
+    """Take files out of the daily totals before they (or their detections) are deleted"""
+    if not file_ids:
+        return
+    result = await db.execute(
+        select(FileStats)
+        .where(FileStats.file_id.in_(file_ids))
+        .order_by(FileStats.file_id)
+        .with_for_update()
+    )
+    deltas = _DailyDeltas()
+    for stats in result.scalars().all():
+        deltas.add(stats.day, stats.class_counts, stats.confidence_sums, sign=-1)
+        await db.delete(stats)
+    await _shift_daily(db, deltas)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction) -> None:
+    # Summaries staged in a rolled-back transaction describe writes that never happened
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,105 @@
+"""Content-addressed blob storage for uploaded images.
+
+Blobs are keyed by the SHA-256 of their contents and laid out as
+``<root>/ab/cd/abcd...`` so a directory never holds more than a few thousand
+entries. Writers stream into a temporary file next to the final location and
+are renamed into place once the digest is known.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+ROOT_DIR = Path(__file__).parent
+
+BLOB_STORAGE_DIR = Path(os.getenv("BLOB_STORAGE_DIR", ROOT_DIR / "blobs"))
+
+
+def blob_key_for(digest: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+class LocalBlobStore:
+    """Blob store backed by a local (or network-mounted) directory"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key
+
+    def open_temp(self) -> Tuple[BinaryIO, Path]:
+        """Open a temporary file to stream a new blob into"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        return os.fdopen(fd, "wb"), Path(tmp_path)
+
+    def commit(self, tmp_path: Path, digest: str) -> str:
+        """Move a fully written temporary file to its content-addressed key"""
+        key = blob_key_for(digest)
+        final_path = self.path_for(key)
+        if final_path.exists():
+            # Same bytes already stored; keep the existing blob
+            tmp_path.unlink(missing_ok=True)
+            return key
+        final_path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, final_path)
+        return key
+
+    def put(self, data: bytes) -> Tuple[str, str]:
+        """Store an in-memory blob and return its (key, digest)"""
+        digest = hashlib.sha256(data).hexdigest()
+        fh, tmp_path = self.open_temp()
+        try:
+            with fh:
+                fh.write(data)
+        except BaseException:
+            self.discard(tmp_path)
+            raise
+        return self.commit(tmp_path, digest), digest
+
+    def discard(self, tmp_path: Path) -> None:
+        tmp_path.unlink(missing_ok=True)
+
+    def exists(self, key: str) -> bool:
+        return self.path_for(key).exists()
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.path_for(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path_for(key), "rb")
+
+    def read(self, key: str) -> bytes:
+        return self.path_for(key).read_bytes()
+
+    def archive(self, key: str, archive_root: Path) -> int:
+        """Move a blob under ``archive_root`` (same key layout) and return its size"""
+        path = self.path_for(key)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        target = Path(archive_root) / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(target))
+        return size
+
+    def delete(self, key: str) -> int:
+        """Remove a blob and return the number of bytes freed"""
+        path = self.path_for(key)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            return size
+        except FileNotFoundError:
+            return 0
+
+
+blob_store = LocalBlobStore(BLOB_STORAGE_DIR)
@@ -0,0 +1,335 @@
+"""Live stream ingestion over WebSocket.
+
+A client connects to ``/api/streams/ws`` and sends one encoded image (JPEG,
+PNG, ...) per binary message. Each frame the server finishes is answered with
+a compact text message::
+
+    {"n": 42, "boxes": [[class_id, confidence, x1, y1, x2, y2], ...],
+     "latency_ms": 18.3, "reused": false}
+
+where ``n`` counts the binary messages received on this connection (so a
+client can match results to the frames it sent) and class ids index the
+``classes`` table sent in the initial ``hello`` message. Frames that cannot
+be decoded get ``{"n": ..., "error": ...}``.
+
+Latest frame wins: a stream holds at most one frame waiting and one in the
+model. A frame arriving while another is still waiting replaces it, and the
+replaced frame is counted as dropped, so latency stays bounded by one model
+call however fast frames arrive. Frames of all streams that are waiting at
+the same moment go to the model together, as one batched call at the
+scheduler's ``STREAM`` priority.
+
+Optional query parameters: ``source`` applies that camera's zone preset
+(``zones.py``) and ``motion_gate=true`` reuses the previous detections for
+unchanged frames (``motion.py``). Every ``STREAM_STATS_INTERVAL_SECONDS`` the
+server sends ``{"type": "stats", ...}`` with achieved FPS, drops and latency
+percentiles; ``GET /api/streams`` lists the same for every open stream.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+
+from database import AsyncSessionLocal
+from executor import run_cpu
+from ingest import MAX_UPLOAD_BYTES
+from metrics import ACTIVE_STREAMS, STREAM_FRAMES, STREAM_LATENCY_SECONDS, stage
+from motion import MotionGate
+from pipeline import DetectionResult, decode_image_bytes, process_image_detections
+from scheduler import STREAM, scheduler
+from zones import ImageZones, image_zones, resolve_roi
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/streams")
+
+STREAM_MAX_CONCURRENT = int(os.getenv("STREAM_MAX_CONCURRENT", "64"))
+STREAM_MAX_BATCH = int(os.getenv("STREAM_MAX_BATCH", "16"))
+# How long the first waiting frame holds the model call open for frames of other streams
+STREAM_BATCH_WAIT_SECONDS = float(os.getenv("STREAM_BATCH_WAIT_MS", "2")) / 1000
+STREAM_STATS_INTERVAL_SECONDS = float(os.getenv("STREAM_STATS_INTERVAL_SECONDS", "5"))
+STREAM_STATS_WINDOW = 120  # frames the FPS and latency figures are computed over
+
+# WebSocket close codes
+POLICY_VIOLATION = 1008
+MESSAGE_TOO_BIG = 1009
+TRY_AGAIN_LATER = 1013
+
+
+class FrameBatcher:
+    """Collects frames from all streams into batched model calls"""
+
+    def __init__(self):
+        self.model = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def configure(self, model) -> None:
+        self.model = model
+
+    async def detect(self, image: np.ndarray) -> Any:
+        """Model results for one image, batched with whatever other streams are waiting"""
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.task.get_loop() is not loop:
+            self.queue = asyncio.Queue()
+            self.task = loop.create_task(self._run())
+        future = loop.create_future()
+        await self.queue.put((image, future))
+        return await future
+
+    async def _next_batch(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + STREAM_BATCH_WAIT_SECONDS
+        while len(batch) < STREAM_MAX_BATCH:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Streams that went away while waiting need no model time
+        return [(image, future) for image, future in batch if not future.cancelled()]
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            if not batch:
+                continue
+            try:
+                with stage("inference"):
+                    results = await scheduler.infer(self.model, [image for image, _ in batch], STREAM, "streams", admit=False)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+batcher = FrameBatcher()
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 1) if values else 0.0
+
+
+@dataclass
+class Stream:
+    id: str
+    source: Optional[str] = None
+    started: float = field(default_factory=time.monotonic)
+    received: int = 0
+    processed: int = 0
+    dropped: int = 0  # replaced by a newer frame before reaching the model
+    reused: int = 0  # skipped by the motion gate
+    failed: int = 0
+    latest: Optional[Tuple[int, bytes, float]] = None  # (n, data, received at)
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    received_times: Deque[float] = field(default_factory=lambda: deque(maxlen=STREAM_STATS_WINDOW))
+    sent_times: Deque[float] = field(default_factory=lambda: deque(maxlen=STREAM_STATS_WINDOW))
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=STREAM_STATS_WINDOW))
+
+    def offer(self, data: bytes) -> None:
+        """Queue a frame, replacing one that is still waiting"""
+        now = time.monotonic()
+        self.received += 1
+        self.received_times.append(now)
+        if self.latest is not None:
+            self.dropped += 1
+            STREAM_FRAMES.labels("dropped").inc()
+        self.latest = (self.received, data, now)
+        self.ready.set()
+
+    async def take(self) -> Tuple[int, bytes, float]:
+        while self.latest is None:
+            self.ready.clear()
+            await self.ready.wait()
+        frame, self.latest = self.latest, None
+        return frame
+
+    def sent(self, received_at: float) -> float:
+        now = time.monotonic()
+        latency = now - received_at
+        self.sent_times.append(now)
+        self.latencies.append(latency * 1000)
+        STREAM_LATENCY_SECONDS.observe(latency)
+        return latency * 1000
+
+    @staticmethod
+    def _rate(times: Deque[float]) -> float:
+        if len(times) < 2 or times[-1] <= times[0]:
+            return 0.0
+        return round((len(times) - 1) / (times[-1] - times[0]), 2)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        return {
+            "stream": self.id,
+            "source": self.source,
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "reused": self.reused,
+            "failed": self.failed,
+            "input_fps": self._rate(self.received_times),
+            "fps": self._rate(self.sent_times),
+            "latency_ms": {
+                "p50": _percentile(latencies, 50),
+                "p95": _percentile(latencies, 95),
+                "max": round(max(latencies), 1) if latencies else 0.0,
+            },
+        }
+
+
+streams: Dict[str, Stream] = {}
+
+
+def _boxes(detections: List[DetectionResult], class_ids: Dict[str, int]) -> List[List[Any]]:
+    return [
+        [class_ids.get(det.class_name, -1), round(det.confidence, 3), *(round(v, 1) for v in det.bbox)]
+        for det in detections
+    ]
+
+
+def _decode_frame(data: bytes, gate: Optional[MotionGate]) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+    """The decoded frame, and its motion signature when the stream is gated"""
+    image = decode_image_bytes(data)
+    if image is None or gate is None:
+        return image, None
+    return image, gate.signature(image)
+
+
+async def _detect_frame(
+    image: np.ndarray,
+    signature: Optional[np.ndarray],
+    roi: Optional[str],
+    gate: Optional[MotionGate],
+) -> Tuple[List[DetectionResult], bool]:
+    """Detections for one decoded frame, and whether they were reused from an earlier frame"""
+    if gate is not None and not gate.check(signature, commit=False):
+        return gate.expand([False], [])[0], True
+    zones: Optional[ImageZones] = image_zones(roi, image)
+    model_input = image if zones is None else zones.crop(image)
+    results = await batcher.detect(model_input)
+    detections = process_image_detections([results], model_input, batcher.model.names)
+    if zones is not None:
+        detections = zones.apply(detections)
+    if gate is not None:
+        # Only now, so a frame whose inference failed never becomes the keyframe later frames reuse
+        gate.keep(signature, detections)
+    return detections, False
+
+
+async def _process(websocket: WebSocket, stream: Stream, roi: Optional[str], gate: Optional[MotionGate]) -> None:
+    class_ids = {name: class_id for class_id, name in batcher.model.names.items()}
+    last_stats = time.monotonic()
+    while True:
+        n, data, received_at = await stream.take()
+        with stage("decode"):
+            image, signature = await run_cpu(_decode_frame, data, gate)
+        if image is None:
+            stream.failed += 1
+            STREAM_FRAMES.labels("failed").inc()
+            await websocket.send_text(orjson.dumps({"n": n, "error": "Invalid image data"}).decode())
+            continue
+        try:
+            detections, reused = await _detect_frame(image, signature, roi, gate)
+        except (HTTPException, ValueError) as e:
+            # Scheduler shedding or a zone outside this frame: report it and move on to the next frame
+            stream.failed += 1
+            STREAM_FRAMES.labels("failed").inc()
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            await websocket.send_text(orjson.dumps({"n": n, "error": detail}).decode())
+            continue
+
+        stream.processed += 1
+        if reused:
+            stream.reused += 1
+        STREAM_FRAMES.labels("reused" if reused else "processed").inc()
+        latency_ms = stream.sent(received_at)
+        await websocket.send_text(orjson.dumps({
+            "n": n,
+            "boxes": _boxes(detections, class_ids),
+            "latency_ms": round(latency_ms, 1),
+            "reused": reused,
+        }).decode())
+
+        if time.monotonic() - last_stats >= STREAM_STATS_INTERVAL_SECONDS:
+            last_stats = time.monotonic()
+            await websocket.send_text(orjson.dumps({"type": "stats", **stream.stats()}).decode())
+
+
+@router.websocket("/ws")
+async def stream_frames(websocket: WebSocket, source: Optional[str] = None, motion_gate: bool = False):
+    """Run detection on frames pushed over a WebSocket, newest frame first"""
+    await websocket.accept()
+    if batcher.model is None or len(streams) >= STREAM_MAX_CONCURRENT:
+        await websocket.close(code=TRY_AGAIN_LATER, reason="Too many streams")
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            roi = await resolve_roi(db, None, source)
+    except HTTPException as e:
+        await websocket.close(code=POLICY_VIOLATION, reason=e.detail)
+        return
+
+    stream = Stream(id=str(uuid.uuid4()), source=source)
+    streams[stream.id] = stream
+    ACTIVE_STREAMS.inc()
+    gate = MotionGate() if motion_gate else None
+    await websocket.send_text(orjson.dumps({
+        "type": "hello",
+        "stream": stream.id,
+        "classes": {str(class_id): name for class_id, name in batcher.model.names.items()},
+    }).decode())
+    worker = asyncio.create_task(_process(websocket, stream, roi, gate))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            data = message.get("bytes")
+            if data is None:
+                continue  # text messages are not part of the protocol
+            if len(data) > MAX_UPLOAD_BYTES:
+                await websocket.close(code=MESSAGE_TOO_BIG, reason=f"Frames are limited to {MAX_UPLOAD_BYTES} bytes")
+                break
+            if worker.done():
+                break
+            stream.offer(data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        worker.cancel()
+        try:
+            await worker
+        except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+            pass
+        except Exception as e:
+            logger.error(f"Stream {stream.id} failed: {e}")
+        streams.pop(stream.id, None)
+        ACTIVE_STREAMS.dec()
+        logger.info(f"Stream {stream.id} closed: {stream.stats()}")
+
+
+@router.get("")
+async def list_streams():
+    """FPS, drops and latency of every open stream"""
+    return [stream.stats() for stream in streams.values()]
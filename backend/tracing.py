@@ -0,0 +1,264 @@
+"""Opt-in per-request tracing for diagnosing slow requests.
+
+An admin sends ``X-Profile: 1`` (or ``?profile=1``) together with a valid
+``X-Admin-Token``; the request then records a span tree: the HTTP request at
+the root, the pipeline stages timed by ``metrics.stage`` below it, YOLO's own
+preprocess/forward/NMS split under inference, and one span per SQL statement.
+``X-Profile: sample`` additionally runs a pyinstrument sampling profiler when
+that package is installed.
+
+The response carries ``X-Trace-Id``; the trace is written to ``TRACE_DIR`` as
+OTLP/JSON (the OpenTelemetry file exporter format), with the sampling profile
+next to it in speedscope format.
+"""
+import json
+import logging
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from admin import is_admin, require_admin
+from database import engine
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # sampling profiles are optional
+    Profiler = None
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+TRACE_DIR = Path(os.getenv("TRACE_DIR", ROOT_DIR / "traces"))
+MAX_STATEMENT_LENGTH = 2000
+
+router = APIRouter(prefix="/api/admin/traces", dependencies=[Depends(require_admin)])
+
+
+@dataclass
+class Span:
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Trace:
+    trace_id: str = field(default_factory=lambda: secrets.token_hex(16))
+    spans: List[Span] = field(default_factory=list)
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("visionflow_trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("visionflow_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+def _start_span(trace: Trace, name: str, attributes: Dict[str, Any]) -> Span:
+    span_ = Span(name, secrets.token_hex(8), _parent.get(), time.time_ns(), attributes=attributes)
+    trace.spans.append(span_)
+    return span_
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a child span of the current one; does nothing outside a traced request"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    span_ = _start_span(trace, name, attributes)
+    token = _parent.set(span_.span_id)
+    try:
+        yield span_
+    finally:
+        _parent.reset(token)
+        span_.end_ns = time.time_ns()
+
+
+def record_model_speed(results: Any) -> None:
+    """Split the current inference span using YOLO's own per-image timings.
+
+    Ultralytics reports preprocess, inference and postprocess (NMS) in
+    milliseconds on each result; they become consecutive child spans.
+    """
+    trace = _trace.get()
+    if trace is None or not results:
+        return
+    speed = getattr(results[0], "speed", None) or {}
+    start = time.time_ns() - int(sum(speed.values()) * len(results) * 1e6)
+    for key, name in (("preprocess", "yolo.preprocess"), ("inference", "yolo.forward"), ("postprocess", "yolo.nms")):
+        if key not in speed:
+            continue
+        span_ = _start_span(trace, name, {"images": len(results)})
+        span_.start_ns = start
+        start = span_.end_ns = start + int(speed[key] * len(results) * 1e6)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _trace.get()
+    if trace is not None:
+        context._trace_span = _start_span(trace, "db.statement", {
+            "db.system": conn.dialect.name,
+            "db.statement": statement[:MAX_STATEMENT_LENGTH],
+            "db.executemany": executemany,
+        })
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span_ = getattr(context, "_trace_span", None)
+    if span_ is not None:
+        span_.end_ns = time.time_ns()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span_.attributes["db.rowcount"] = cursor.rowcount
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    """Render a trace as an OTLP/JSON ExportTraceServiceRequest"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "visionflow-api"}}]},
+            "scopeSpans": [{
+                "scope": {"name": "visionflow.tracing"},
+                "spans": [
+                    {
+                        "traceId": trace.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent_id or "",
+                        "name": s.name,
+                        "kind": 2 if s.parent_id is None else 1,  # SERVER for the root, INTERNAL below
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                    }
+                    for s in trace.spans
+                ],
+            }],
+        }]
+    }
+
+
+def _write_trace(trace: Trace, profile: Optional[str]) -> None:
+    TRACE_DIR.mkdir(parents=True, exist_ok=True)
+    if profile is not None:
+        (TRACE_DIR / f"{trace.trace_id}.speedscope.json").write_text(profile)
+    (TRACE_DIR / f"{trace.trace_id}.json").write_text(json.dumps(to_otlp(trace)))
+
+
+def _profile_mode(scope: Scope) -> Optional[str]:
+    """Return "spans" or "sample" when the request asks for profiling and is allowed to"""
+    mode = token = None
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            mode = value.decode("latin-1")
+        elif name == b"x-admin-token":
+            token = value.decode("latin-1")
+    if mode is None and b"profile=" in scope.get("query_string", b""):
+        for pair in scope["query_string"].decode("latin-1").split("&"):
+            key, _, value = pair.partition("=")
+            if key == "profile":
+                mode = value
+    if not mode or mode in {"0", "false"} or not is_admin(token):
+        return None
+    return "sample" if mode == "sample" else "spans"
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware that traces requests flagged for profiling by an admin"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = _profile_mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        trace_token = _trace.set(trace)
+        profiler = None
+        if mode == "sample" and Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-trace-id", trace.trace_id.encode())]
+                root.attributes["http.status_code"] = message["status"]
+            await send(message)
+
+        try:
+            with span(f"{scope['method']} {scope['path']}", **{
+                "http.method": scope["method"],
+                "http.target": scope["path"],
+                "visionflow.profile": mode,
+            }) as root:
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            _trace.reset(trace_token)
+            profile = None
+            if profiler is not None:
+                profiler.stop()
+                profile = profiler.output(SpeedscopeRenderer())
+                root.attributes["visionflow.profile_file"] = f"{trace.trace_id}.speedscope.json"
+            elif mode == "sample":
+                root.attributes["visionflow.profile_file"] = "unavailable (pyinstrument not installed)"
+            try:
+                await run_in_threadpool(_write_trace, trace, profile)
+            except OSError as e:
+                logger.error(f"Could not write trace {trace.trace_id}: {e}")
+
+
+@router.get("")
+async def list_traces(limit: int = 50):
+    """Most recently written traces"""
+    if not TRACE_DIR.exists():
+        return []
+    paths = sorted(
+        (p for p in TRACE_DIR.glob("*.json") if not p.name.endswith(".speedscope.json")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )[:limit]
+    return [{"trace_id": p.stem, "written_at": p.stat().st_mtime} for p in paths]
+
+
+@router.get("/{trace_id}")
+async def get_trace(trace_id: str):
+    """One stored trace in OTLP/JSON"""
+    if len(trace_id) != 32 or any(c not in "0123456789abcdef" for c in trace_id):
+        raise HTTPException(status_code=404, detail="Trace not found")
+    path = TRACE_DIR / f"{trace_id}.json"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return json.loads(await run_in_threadpool(path.read_text))
@@ -0,0 +1,253 @@
+"""Region-of-interest and exclusion-zone inference.
+
+A zone spec limits detection to part of the frame::
+
+    {"include": [[x1, y1, x2, y2], [[x, y], [x, y], [x, y], ...]],
+     "exclude": [...], "normalized": false, "anchor": "center"}
+
+Each zone is a rectangle (four numbers) or a polygon (three or more points),
+in pixels, or in fractions of the image size when ``normalized`` is true.
+The model only sees the bounding rectangle of the include zones (the whole
+frame when there are none), which saves compute on cameras that care about a
+small area. Boxes are mapped back to full-image coordinates and kept when
+their anchor point (box ``center`` or ``bottom`` center, i.e. where an object
+stands) lies inside an include zone and outside every exclude zone.
+
+Specs come from the ``roi`` query parameter, or from a preset saved per
+camera/feed under ``/api/admin/zones`` and selected with ``source``.
+"""
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from admin import require_admin
+from database import get_db
+from models import ZonePreset
+from pipeline import DetectionResult
+
+router = APIRouter(prefix="/api/admin/zones", dependencies=[Depends(require_admin)])
+
+ANCHORS = ("center", "bottom")
+MAX_ZONES = 32
+MAX_POINTS = 256
+
+
+def _is_coordinate(value: Any) -> bool:
+    # json.loads accepts NaN and Infinity, and bool is an int subclass
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _parse_zone(zone: Any) -> List[List[float]]:
+    """A rectangle or polygon as a list of [x, y] points"""
+    if not isinstance(zone, list):
+        raise ValueError("Each zone must be [x1, y1, x2, y2] or a list of [x, y] points")
+    if len(zone) == 4 and not any(isinstance(v, list) for v in zone):
+        if not all(_is_coordinate(v) for v in zone):
+            raise ValueError("Rectangle coordinates must be finite numbers")
+        x1, y1, x2, y2 = (float(v) for v in zone)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError("Rectangle zones need x1 < x2 and y1 < y2")
+        return [[x1, y1], [x2, y1], [x2, y2], [x1, y2]]
+    if not 3 <= len(zone) <= MAX_POINTS:
+        raise ValueError(f"Polygon zones need 3 to {MAX_POINTS} points")
+    points = []
+    for point in zone:
+        if not (isinstance(point, list) and len(point) == 2 and all(_is_coordinate(v) for v in point)):
+            raise ValueError("Polygon points must be [x, y] pairs of finite numbers")
+        points.append([float(point[0]), float(point[1])])
+    return points
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Even-odd ray casting for many points at once: (N, 2) points, (K, 2) polygon -> (N,) bool"""
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    # (N, K): does the horizontal ray from each point cross each edge
+    straddles = (y1 <= y) != (y2 <= y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    crossings = straddles & (x < x_cross)
+    return np.count_nonzero(crossings, axis=1) % 2 == 1
+
+
+@dataclass
+class ZoneSpec:
+    include: List[List[List[float]]] = field(default_factory=list)
+    exclude: List[List[List[float]]] = field(default_factory=list)
+    normalized: bool = False
+    anchor: str = "center"
+
+    @classmethod
+    def parse(cls, raw: Any) -> "ZoneSpec":
+        """Validate a spec from JSON; raises ValueError"""
+        if not isinstance(raw, dict):
+            raise ValueError("Zone spec must be an object")
+        unknown = set(raw) - {"include", "exclude", "normalized", "anchor"}
+        if unknown:
+            raise ValueError(f"Unknown zone spec keys: {', '.join(sorted(unknown))}")
+        include, exclude = raw.get("include") or [], raw.get("exclude") or []
+        if not isinstance(include, list) or not isinstance(exclude, list):
+            raise ValueError("include and exclude must be lists of zones")
+        if len(include) + len(exclude) > MAX_ZONES:
+            raise ValueError(f"At most {MAX_ZONES} zones per spec")
+        anchor = raw.get("anchor", "center")
+        if anchor not in ANCHORS:
+            raise ValueError(f"anchor must be one of: {', '.join(ANCHORS)}")
+        return cls(
+            include=[_parse_zone(zone) for zone in include],
+            exclude=[_parse_zone(zone) for zone in exclude],
+            normalized=bool(raw.get("normalized", False)),
+            anchor=anchor,
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "ZoneSpec":
+        return cls.parse(json.loads(text))
+
+    def is_empty(self) -> bool:
+        return not self.include and not self.exclude
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"include": self.include, "exclude": self.exclude, "normalized": self.normalized, "anchor": self.anchor}
+
+    def to_json(self) -> str:
+        """Canonical form stored in ``files.roi``; equal specs give equal strings"""
+        return json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+
+    def for_image(self, width: int, height: int) -> "ImageZones":
+        scale = np.array([width, height], dtype=np.float64) if self.normalized else np.ones(2)
+        include = [np.asarray(zone, dtype=np.float64) * scale for zone in self.include]
+        exclude = [np.asarray(zone, dtype=np.float64) * scale for zone in self.exclude]
+        if include:
+            points = np.concatenate(include)
+            x0, y0 = np.floor(points.min(axis=0)).astype(int)
+            x1, y1 = np.ceil(points.max(axis=0)).astype(int)
+            x0, y0 = max(x0, 0), max(y0, 0)
+            x1, y1 = min(x1, width), min(y1, height)
+            if x1 <= x0 or y1 <= y0:
+                raise ValueError("Region of interest lies outside the image")
+        else:
+            x0, y0, x1, y1 = 0, 0, width, height
+        return ImageZones(include, exclude, self.anchor, (x0, y0, x1, y1))
+
+
+@dataclass
+class ImageZones:
+    """A spec resolved against one image: pixel polygons and the crop box"""
+    include: List[np.ndarray]
+    exclude: List[np.ndarray]
+    anchor: str
+    box: Tuple[int, int, int, int]  # x0, y0, x1, y1
+
+    def crop(self, image: np.ndarray) -> np.ndarray:
+        x0, y0, x1, y1 = self.box
+        return image[y0:y1, x0:x1]
+
+    def keep(self, boxes: np.ndarray) -> np.ndarray:
+        """Which full-image (N, 4) xyxy boxes have their anchor inside the zones"""
+        anchors = np.empty((len(boxes), 2))
+        anchors[:, 0] = (boxes[:, 0] + boxes[:, 2]) / 2
+        if self.anchor == "bottom":
+            # Half a pixel up, so boxes touching the bottom of a zone drawn to the frame edge count as inside
+            anchors[:, 1] = boxes[:, 3] - 0.5
+        else:
+            anchors[:, 1] = (boxes[:, 1] + boxes[:, 3]) / 2
+        keep = np.ones(len(boxes), dtype=bool)
+        if self.include:
+            keep = np.logical_or.reduce([points_in_polygon(anchors, zone) for zone in self.include])
+        for zone in self.exclude:
+            keep &= ~points_in_polygon(anchors, zone)
+        return keep
+
+    def apply(self, detections: List[DetectionResult]) -> List[DetectionResult]:
+        """Map detections on the crop back to the full image and drop those outside the zones"""
+        if not detections:
+            return detections
+        x0, y0 = self.box[:2]
+        boxes = np.array([det.bbox for det in detections], dtype=np.float64) + [x0, y0, x0, y0]
+        keep = self.keep(boxes)
+        return [
+            det.model_copy(update={"bbox": box.tolist()})
+            for det, box, kept in zip(detections, boxes, keep)
+            if kept
+        ]
+
+
+def image_zones(roi: Optional[str], image: np.ndarray) -> Optional[ImageZones]:
+    """Resolve a stored ``files.roi`` against an image; None for the full frame"""
+    if not roi:
+        return None
+    height, width = image.shape[:2]
+    return ZoneSpec.from_json(roi).for_image(width, height)
+
+
+async def resolve_roi(db: AsyncSession, roi: Optional[str], source: Optional[str]) -> Optional[str]:
+    """Canonical zone spec for a request's ``roi``/``source`` parameters, or None for the full frame"""
+    if roi and source:
+        raise HTTPException(status_code=400, detail="Pass either roi or source, not both")
+    if source:
+        preset = await db.get(ZonePreset, source)
+        if preset is None:
+            raise HTTPException(status_code=404, detail=f"No zone preset for source {source!r}")
+        spec = ZoneSpec.parse(preset.spec)
+    elif roi:
+        try:
+            spec = ZoneSpec.parse(json.loads(roi))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid roi: {e}")
+    else:
+        return None
+    return None if spec.is_empty() else spec.to_json()
+
+
+def preset_to_dict(preset: ZonePreset) -> Dict[str, Any]:
+    return {"source": preset.source, "spec": preset.spec, "updated_at": preset.updated_at.isoformat()}
+
+
+@router.get("")
+async def list_presets(db: AsyncSession = Depends(get_db)):
+    presets = (await db.execute(select(ZonePreset).order_by(ZonePreset.source))).scalars().all()
+    return [preset_to_dict(p) for p in presets]
+
+
+@router.get("/{source}")
+async def get_preset(source: str, db: AsyncSession = Depends(get_db)):
+    preset = await db.get(ZonePreset, source)
+    if preset is None:
+        raise HTTPException(status_code=404, detail="Zone preset not found")
+    return preset_to_dict(preset)
+
+
+@router.put("/{source}")
+async def put_preset(source: str, spec: Dict[str, Any] = Body(...), db: AsyncSession = Depends(get_db)):
+    """Create or replace the zones applied to requests with ?source=<source>"""
+    try:
+        parsed = ZoneSpec.parse(spec)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    preset = await db.get(ZonePreset, source)
+    if preset is None:
+        preset = ZonePreset(source=source)
+        db.add(preset)
+    preset.spec = parsed.to_dict()
+    preset.updated_at = datetime.utcnow()
+    await db.commit()
+    return preset_to_dict(preset)
+
+
+@router.delete("/{source}")
+async def delete_preset(source: str, db: AsyncSession = Depends(get_db)):
+    preset = await db.get(ZonePreset, source)
+    if preset is None:
+        raise HTTPException(status_code=404, detail="Zone preset not found")
+    await db.delete(preset)
+    await db.commit()
+    return {"status": "deleted", "source": source}
@@ -71,53 +71,92 @@ const EnhancedUpload = () => {
 
     setUploadQueue(prev => [...prev, ...newUploads]);
 
-    // Process uploads
-    for (const upload of newUploads) {
-      try {
-        // Create preview
-        const preview = await createPreview(upload.file, upload.type);
-        updateUploadStatus(upload.id, { preview });
-
-        // Upload to backend (store only)
-        const result = await apiService.uploadOnly(upload.file);
-        
-        // Update status to ready (waiting analysis)
-        updateUploadStatus(upload.id, { 
-          status: 'ready', 
-          progress: 100,
-          fileId: result.file_id 
-        });
+    // Create previews, then upload the whole selection in one request
+    const previews = await Promise.all(newUploads.map(upload => createPreview(upload.file, upload.type)));
+    newUploads.forEach((upload, i) => updateUploadStatus(upload.id, { preview: previews[i] }));
 
-        // Add to app state
-        dispatch({
-          type: 'ADD_UPLOADED_FILE',
-          payload: {
-            id: result.file_id,
-            name: upload.name,
-            size: upload.size,
-            type: upload.type,
-            preview,
-            uploadedAt: new Date().toISOString(),
-            status: 'ready'
-          }
-        });
+    let result;
+    try {
+      // One request, one batched analysis job on the server
+      result = await apiService.uploadBatch(newUploads.map(upload => upload.file), { analyze: true });
+    } catch (error) {
+      console.error('Upload failed:', error);
+      newUploads.forEach(upload => updateUploadStatus(upload.id, { status: 'error', error: error.message }));
+      addNotification('error', `Failed to upload ${newUploads.length} file(s)`);
+      return;
+    }
 
-        addNotification('success', `${upload.name} uploaded successfully!`);
-        
-        // Remove from queue after delay
-        setTimeout(() => {
-          setUploadQueue(prev => prev.filter(u => u.id !== upload.id));
-        }, 2000);
-
-      } catch (error) {
-        console.error('Upload failed:', error);
-        updateUploadStatus(upload.id, { 
-          status: 'error', 
-          error: error.message 
-        });
+    const storedByIndex = Object.fromEntries(result.files.map(f => [f.index, f]));
+    const skippedByIndex = Object.fromEntries(result.skipped.map(f => [f.index, f]));
+    const queueIdByFileId = {};
+
+    newUploads.forEach((upload, i) => {
+      const stored = storedByIndex[i];
+      if (!stored) {
+        const reason = skippedByIndex[i]?.reason || 'Upload failed';
+        updateUploadStatus(upload.id, { status: 'error', error: reason });
         addNotification('error', `Failed to upload ${upload.name}`);
+        return;
       }
+
+      queueIdByFileId[stored.file_id] = upload.id;
+      updateUploadStatus(upload.id, {
+        status: 'processing',
+        progress: 100,
+        fileId: stored.file_id
+      });
+
+      // Add to app state; results arrive through the change feed as the batch completes
+      dispatch({
+        type: 'ADD_UPLOADED_FILE',
+        payload: {
+          id: stored.file_id,
+          name: upload.name,
+          size: upload.size,
+          type: upload.type,
+          preview: previews[i],
+          uploadedAt: new Date().toISOString(),
+          status: 'processing'
+        }
+      });
+    });
+
+    if (result.files.length === 0) return;
+    addNotification('success', `${result.files.length} file(s) uploaded, analyzing...`);
+
+    let batch;
+    try {
+      batch = await apiService.waitForBatch(result.batch_id, (progress) => {
+        Object.entries(progress.files || {}).forEach(([fileId, status]) => {
+          if (status === 'done') {
+            updateUploadStatus(queueIdByFileId[fileId], { status: 'completed' });
+          } else if (status === 'error') {
+            updateUploadStatus(queueIdByFileId[fileId], { status: 'error', error: 'Analysis failed' });
+          }
+        });
+      });
+    } catch (error) {
+      console.error('Batch polling failed:', error);
+      addNotification('error', `Lost track of batch analysis: ${error.message}`);
+      return;
+    }
+
+    if (batch.failed > 0) {
+      addNotification('error', `${batch.failed} of ${batch.total} file(s) failed analysis`);
     }
+    if (batch.completed > 0) {
+      addNotification('success', `${batch.completed} file(s) analyzed successfully!`);
+    }
+
+    // Remove finished uploads from the queue after a delay; failed ones stay to show their error
+    setTimeout(() => {
+      const finished = new Set(
+        Object.entries(batch.files || {})
+          .filter(([, status]) => status === 'done')
+          .map(([fileId]) => queueIdByFileId[fileId])
+      );
+      setUploadQueue(prev => prev.filter(u => !finished.has(u.id)));
+    }, 2000);
   };
 
   const createPreview = (file, type) => {
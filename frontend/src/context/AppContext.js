@@ -1,7 +1,11 @@
-import React, { createContext, useContext, useReducer, useEffect } from 'react';
+import React, { createContext, useContext, useReducer, useEffect, useRef } from 'react';
+import apiService from '../services/apiService';
 
 const AppContext = createContext();
 
+// How often to pull changes made elsewhere (other tabs, devices, batch jobs)
+const SYNC_INTERVAL_MS = 30000;
+
 const initialState = {
   credits: 0,
   uploadedFiles: [],
@@ -10,6 +14,7 @@ const initialState = {
   loading: false,
   error: null,
   notifications: [],
+  syncCursor: null,
   settings: {
     confidence: 0.5,
     enabledClasses: [],
@@ -44,6 +49,32 @@ const appReducer = (state, action) => {
         uploadedFiles: state.uploadedFiles.filter(file => file.id !== action.payload),
         processedFiles: state.processedFiles.filter(file => file.id !== action.payload)
       };
+    case 'APPLY_CHANGES': {
+      const { files, deleted, cursor } = action.payload;
+      const removed = new Set(deleted.map(d => d.id));
+      const changed = new Map(
+        files.filter(f => f.analyzed).map(f => [f.id, {
+          id: f.id,
+          name: f.filename,
+          total_objects: f.total_objects,
+          processedAt: f.timestamp,
+        }])
+      );
+      // Update files we already have in place, append new ones, drop deleted ones
+      const processedFiles = state.processedFiles
+        .filter(f => !removed.has(f.id))
+        .map(f => (changed.has(f.id) ? { ...f, ...changed.get(f.id) } : f));
+      const known = new Set(processedFiles.map(f => f.id));
+      changed.forEach((f, id) => {
+        if (!known.has(id)) processedFiles.push(f);
+      });
+      return {
+        ...state,
+        processedFiles,
+        uploadedFiles: state.uploadedFiles.filter(f => !removed.has(f.id)),
+        syncCursor: cursor,
+      };
+    }
     case 'SET_CURRENT_VIEW':
       return { ...state, currentView: action.payload };
     case 'SET_LOADING':
@@ -68,28 +99,26 @@ const appReducer = (state, action) => {
         ...state, 
         settings: { ...state.settings, ...action.payload }
       };
-    case 'LOAD_STATE':
-      return { ...state, ...action.payload };
     default:
       return state;
   }
 };
 
-export const AppProvider = ({ children }) => {
-  const [state, dispatch] = useReducer(appReducer, initialState);
+// Restore state from localStorage before the first render, so the first
+// change sync already starts from the saved cursor
+const loadSavedState = (initial) => {
+  const savedState = localStorage.getItem('visionflow-state');
+  if (!savedState) return initial;
+  try {
+    return { ...initial, ...JSON.parse(savedState) };
+  } catch (error) {
+    console.error('Failed to load saved state:', error);
+    return initial;
+  }
+};
 
-  // Load state from localStorage on mount
-  useEffect(() => {
-    const savedState = localStorage.getItem('visionflow-state');
-    if (savedState) {
-      try {
-        const parsedState = JSON.parse(savedState);
-        dispatch({ type: 'LOAD_STATE', payload: parsedState });
-      } catch (error) {
-        console.error('Failed to load saved state:', error);
-      }
-    }
-  }, []);
+export const AppProvider = ({ children }) => {
+  const [state, dispatch] = useReducer(appReducer, initialState, loadSavedState);
 
   // Save state to localStorage whenever it changes
   // Helper to prune large data (e.g. base64 images) before persisting
@@ -114,6 +143,7 @@ export const AppProvider = ({ children }) => {
       credits: state.credits,
       uploadedFiles: state.uploadedFiles.map(sanitizeUploaded),
       processedFiles: state.processedFiles.map(sanitizeProcessed),
+      syncCursor: state.syncCursor,
       settings: state.settings,
     };
   };
@@ -130,7 +160,35 @@ export const AppProvider = ({ children }) => {
         console.error('Failed to save state:', error);
       }
     }
-  }, [state.credits, state.uploadedFiles, state.processedFiles, state.settings]);
+  }, [state.credits, state.uploadedFiles, state.processedFiles, state.syncCursor, state.settings]);
+
+  // Pull only what changed since the last sync instead of refetching the library
+  const cursorRef = useRef(state.syncCursor);
+  cursorRef.current = state.syncCursor;
+
+  useEffect(() => {
+    let cancelled = false;
+    const sync = async () => {
+      try {
+        let hasMore = true;
+        while (hasMore && !cancelled) {
+          const page = await apiService.getChanges(cursorRef.current);
+          if (cancelled) return;
+          cursorRef.current = page.cursor;
+          dispatch({ type: 'APPLY_CHANGES', payload: page });
+          hasMore = page.has_more;
+        }
+      } catch (error) {
+        console.warn('Change sync failed:', error.message);
+      }
+    };
+    sync();
+    const timer = setInterval(sync, SYNC_INTERVAL_MS);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+    };
+  }, []);
 
   const addNotification = (type, message, duration = 5000) => {
     const notification = { type, message, duration };
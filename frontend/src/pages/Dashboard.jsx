@@ -42,7 +42,7 @@ const Dashboard = () => {
         payload: {
           ...file,
           ...result,
-          preview: `data:image/jpeg;base64,${result.image_data}`,
+          preview: `data:${result.image_mime || 'image/jpeg'};base64,${result.image_data}`,
           processedAt: new Date().toISOString()
         }
       });
@@ -254,7 +254,7 @@ const Images = () => {
                           <>
                             <button
                               onClick={() => {
-                                const src = processed.preview || `data:image/jpeg;base64,${processed.image_data}`;
+                                const src = processed.preview || `data:${processed.image_mime || 'image/jpeg'};base64,${processed.image_data}`;
                                 setModalSrc(src);
                               }}
                               className="flex-1 bg-gray-700 text-white text-sm py-2 px-3 rounded flex items-center justify-center"
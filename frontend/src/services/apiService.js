@@ -82,14 +82,71 @@ const apiService = {
     }
   },
 
+  // Upload many files in a single request; pass analyze=true to queue one batched analysis job
+  uploadBatch: async (files, { analyze = false } = {}) => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('files', file));
+    try {
+      const response = await api.post(apiService._path('/batch'), formData, {
+        params: { analyze },
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+        timeout: 0,
+      });
+      return response.data; // { batch_id, files: [{ index, file_id, filename }], skipped }
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || error.message || 'Batch upload failed');
+    }
+  },
+
+  // Get aggregate progress for a batch job; includeFiles adds each file's status
+  getBatchStatus: async (batchId, { includeFiles = false } = {}) => {
+    try {
+      const response = await api.get(apiService._path(`/batch/${batchId}`), {
+        params: includeFiles ? { include_files: true } : {},
+        timeout: 10000,
+      });
+      return response.data; // { status, total, completed, failed, progress, files? }
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || error.message || 'Failed to fetch batch status');
+    }
+  },
+
   // Helper to pause execution
   _sleep: (ms) => new Promise((resolve) => setTimeout(resolve, ms)),
 
+  // Poll a batch job every 3s until it finishes; onProgress gets each status report
+  waitForBatch: async (batchId, onProgress) => {
+    const maxFailures = 5;
+    let failures = 0;
+    for (;;) {
+      try {
+        const data = await apiService.getBatchStatus(batchId, { includeFiles: true });
+        failures = 0;
+        onProgress?.(data);
+        if (data.status === 'done') {
+          return data;
+        }
+      } catch (pollErr) {
+        // Tolerate network hiccups, but not a batch the server no longer knows
+        failures += 1;
+        if (failures >= maxFailures) {
+          throw pollErr;
+        }
+      }
+      await apiService._sleep(3000);
+    }
+  },
+
   // Trigger analysis in background and poll until completion
   analyzeFile: async (fileId) => {
     // Step 1: kick off background task (returns {status:"processing"})
     try {
-      await api.post(apiService._path(`/analyze/${fileId}`));
+      // The server drops the job once we would have stopped polling for it
+      await api.post(apiService._path(`/analyze/${fileId}`), null, {
+        headers: { 'X-Request-Timeout': '300' },
+      });
     } catch (err) {
       throw new Error(err.response?.data?.detail || err.message || 'Failed to start analysis');
     }
@@ -128,6 +185,8 @@ const apiService = {
       const response = await api.post(apiService._path('/detect'), formData, {
         headers: {
           'Content-Type': 'multipart/form-data',
+          // Matches the client timeout so the server does not finish work nobody waits for
+          'X-Request-Timeout': '30',
         },
       });
       return response.data;
@@ -146,6 +205,18 @@ const apiService = {
     }
   },
 
+  // Files created, updated or deleted since a change-feed cursor (omit it for a full sync)
+  getChanges: async (since, { limit = 100 } = {}) => {
+    try {
+      const response = await api.get(apiService._path('/changes'), {
+        params: since ? { since, limit } : { limit },
+      });
+      return response.data; // { cursor, has_more, files, deleted }
+    } catch (error) {
+      throw new Error(error.response?.data?.detail || error.message || 'Failed to fetch changes');
+    }
+  },
+
   // Get specific analysis result
   getAnalysis: async (analysisId) => {
     try {
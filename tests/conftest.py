@@ -0,0 +1,69 @@
+"""Shared setup for the backend unit tests.
+
+Puts ``backend/`` on the import path (its modules import each other by bare
+name) and points ``DATABASE_URL`` at a throwaway SQLite file, so nothing here
+touches a configured database. Only tests that use ``app_client`` import the
+full app, which loads model weights; they are skipped without ultralytics.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="visionflow-tests-"))
+# Overridden, not defaulted: the fixtures below drop every table
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_TMP_DIR / 'test.db'}"
+os.environ.setdefault("BLOB_STORAGE_DIR", str(_TMP_DIR / "blobs"))
+
+
+@pytest.fixture
+def db_engine():
+    """Empty tables for one test; yields the async engine"""
+    pytest.importorskip("aiosqlite")
+    import database
+    import models  # noqa: F401  (registers the tables)
+    from base import Base
+
+    async def reset():
+        async with database.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(reset())
+    yield database.engine
+    asyncio.run(database.engine.dispose())
+
+
+@pytest.fixture
+def run_db(db_engine):
+    """Run ``fn(session)`` to completion in a fresh session and return its result"""
+    from database import AsyncSessionLocal
+
+    def run(fn):
+        async def main():
+            try:
+                async with AsyncSessionLocal() as db:
+                    return await fn(db)
+            finally:
+                # Connections belong to this event loop; don't hand them to the next one
+                await db_engine.dispose()
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def app_client(db_engine):
+    """TestClient for the full app on empty tables"""
+    pytest.importorskip("ultralytics")
+    from fastapi.testclient import TestClient
+    import server
+
+    with TestClient(server.app) as client:
+        yield client
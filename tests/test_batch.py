@@ -0,0 +1,137 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+import batch
+from batch import CHECKPOINT_FILE, _decode, _finish, common_root, load_checkpoint, read_manifest, relative_name
+
+
+def _write_image(path, width=64, height=48):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(str(path), np.full((height, width, 3), 200, np.uint8))
+    return path
+
+
+def _tensor(values):
+    array = np.asarray(values, dtype=np.float64)
+    return SimpleNamespace(cpu=lambda: SimpleNamespace(numpy=lambda: array))
+
+
+class FakeModel:
+    """Finds one person at (8, 6)-(40, 30) in every image"""
+
+    names = {0: "person", 1: "car"}
+
+    def __init__(self):
+        self.images = 0
+
+    def __call__(self, source, verbose=True):
+        count = len(source) if isinstance(source, list) else 1
+        self.images += count
+        box = SimpleNamespace(xyxy=[_tensor([8, 6, 40, 30])], conf=[_tensor(0.9)], cls=[_tensor(0)])
+        return [SimpleNamespace(boxes=[box]) for _ in range(count)]
+
+
+def test_checkpoint_ignores_a_torn_last_line(tmp_path):
+    (tmp_path / CHECKPOINT_FILE).write_text(
+        json.dumps({"path": "/in/a.jpg", "detections": []}) + "\n" + '{"path": "/in/b.j'
+    )
+    done, records = load_checkpoint(tmp_path)
+    assert done == {"/in/a.jpg"}
+    assert [r["path"] for r in records] == ["/in/a.jpg"]
+    assert load_checkpoint(tmp_path / "missing") == (set(), [])
+
+
+def test_manifest_paths_are_named_below_their_common_root(tmp_path):
+    manifest = tmp_path / "list.txt"
+    manifest.write_text("# cameras\ncam1/img.jpg\n\n" + str(tmp_path / "cam2" / "img.jpg") + "\n")
+    paths = read_manifest(manifest)
+    assert paths == [tmp_path / "cam1" / "img.jpg", tmp_path / "cam2" / "img.jpg"]
+    root = common_root(paths)
+    assert root == tmp_path
+    # Same-named files from different directories keep distinct output names
+    assert [relative_name(p, root) for p in paths] == [Path("cam1/img.jpg"), Path("cam2/img.jpg")]
+    assert relative_name(Path("/elsewhere/x.jpg"), root) == Path("x.jpg")
+    assert common_root([]) is None
+
+
+def test_decode_applies_the_local_file_limit(tmp_path):
+    path = _write_image(tmp_path / "a.png")
+    size = path.stat().st_size
+    decoded = _decode(str(path), False, None, size)
+    assert decoded.error is None and decoded.image.shape == (48, 64, 3)
+    assert _decode(str(path), False, None, size - 1).error == f"File exceeds {size - 1} bytes"
+    assert _decode(str(tmp_path / "missing.png"), False, None, size).image is None
+
+
+def test_finish_renders_the_given_array(tmp_path):
+    image = np.zeros((48, 64, 3), np.uint8)
+    render_path = tmp_path / "rendered" / "sub" / "a.png"
+    detection = {"class_name": "person", "confidence": 0.9, "bbox": [8, 6, 40, 30], "color": "#FF6B6B"}
+    encoded = _finish(image, [detection], str(render_path), encode=True)
+    rendered = cv2.imread(str(render_path))
+    assert rendered.shape == image.shape and rendered.any()
+    assert encoded and not image.any()
+
+
+@pytest.fixture
+def model(monkeypatch):
+    pytest.importorskip("ultralytics")
+    import inference
+
+    model = FakeModel()
+    monkeypatch.setattr(inference, "load_model", lambda weights: model)
+    return model
+
+
+def _run(input_dir, out_dir, *extra):
+    assert batch.main([str(input_dir), "--out", str(out_dir), "--workers", "1", "--batch-size", "2", *extra]) == 0
+    return json.loads((out_dir / "report.json").read_text())
+
+
+def test_run_writes_labels_annotations_and_checkpoint(model, tmp_path):
+    images = tmp_path / "in"
+    for name in ("a.png", "b.png", "sub/c.png"):
+        _write_image(images / name)
+    (images / "broken.png").write_bytes(b"not an image")
+    out = tmp_path / "out"
+
+    report = _run(images, out, "--render")
+    assert (report["total"], report["processed"], report["failed"], report["detections"]) == (4, 3, 1, 3)
+    assert model.images == 3
+    assert (out / "classes.txt").read_text() == "person\ncar\n"
+    assert (out / "labels" / "sub" / "c.txt").read_text() == "0 0.375000 0.375000 0.500000 0.500000\n"
+    assert (out / "rendered" / "sub" / "c.png").exists()
+    coco = json.loads((out / "annotations.json").read_text())
+    assert sorted(image["file_name"] for image in coco["images"]) == ["a.png", "b.png", "sub/c.png"]
+    assert coco["annotations"][0]["bbox"] == [8, 6, 32, 24]
+    assert len(load_checkpoint(out)[0]) == 3
+
+
+def test_rerun_resumes_after_an_interrupted_checkpoint(model, tmp_path):
+    images = tmp_path / "in"
+    for name in ("a.png", "b.png", "c.png"):
+        _write_image(images / name)
+    out = tmp_path / "out"
+    _run(images, out)
+
+    # Keep the first record and a torn second line, as after a crash mid-write
+    lines = (out / CHECKPOINT_FILE).read_text().splitlines()
+    (out / CHECKPOINT_FILE).write_text(lines[0] + "\n" + lines[1][:10])
+    model.images = 0
+
+    report = _run(images, out)
+    assert (report["resumed"], report["processed"]) == (1, 2)
+    assert model.images == 2
+    done, records = load_checkpoint(out)
+    assert len(done) == 3 and len(records) == 3
+    assert (out / CHECKPOINT_FILE).read_text().endswith("\n")
+    assert len(json.loads((out / "annotations.json").read_text())["images"]) == 3
+
+    # Nothing left to do on a third run
+    model.images = 0
+    assert _run(images, out)["resumed"] == 3 and model.images == 0
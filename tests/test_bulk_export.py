@@ -0,0 +1,129 @@
+import io
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+import admin  # noqa: E402
+import bulk_export  # noqa: E402
+
+TOKEN = "s3cret"
+START = datetime(2026, 10, 19, 8, 0)
+USER = uuid.uuid4()
+
+
+@pytest.fixture
+def client(db_engine, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    app = FastAPI()
+    app.include_router(bulk_export.router)
+    with TestClient(app, headers={"X-Admin-Token": TOKEN}) as client:
+        yield client
+
+
+def _seed(client, count, classes=("person", "car")):
+    """One file per user (USER and nobody) and ``count`` detections split between them, one second apart"""
+    from database import AsyncSessionLocal
+    from models import Detection, File as FileModel
+
+    async def seed():
+        async with AsyncSessionLocal() as db:
+            files = [
+                FileModel(id=uuid.uuid4(), filename="a.jpg", filetype="image/jpeg", user_id=USER,
+                          uploaded_at=START, model_version="v8n", width=640, height=480),
+                FileModel(id=uuid.uuid4(), filename="b.png", filetype="image/png", uploaded_at=START),
+            ]
+            db.add_all(files)
+            await db.flush()
+            await db.execute(insert(Detection), [
+                {
+                    "id": uuid.uuid4(),
+                    "file_id": files[i % 2].id,
+                    "class_name": classes[(i // 1000) % len(classes)],
+                    "confidence": (i % 100) / 100,
+                    "x_min": i, "y_min": 1.5, "x_max": i + 10, "y_max": 20.25,
+                    "processed_at": START + timedelta(seconds=i),
+                }
+                for i in range(count)
+            ])
+            await db.commit()
+            return files
+
+    return client.portal.call(seed)
+
+
+def _export(client, **params):
+    response = client.get("/api/admin/exports/detections", params=params)
+    assert response.status_code == 200, response.text
+    return response
+
+
+def test_parquet_has_the_schema_and_one_row_group_per_chunk(client):
+    files = _seed(client, 2500)
+    response = _export(client, row_group_size=1000)
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    assert response.headers["content-disposition"].endswith('.parquet"')
+
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    assert parquet.schema_arrow == bulk_export._schema()
+    assert [parquet.metadata.row_group(i).num_rows for i in range(parquet.num_row_groups)] == [1000, 1000, 500]
+
+    table = parquet.read()
+    first = table.slice(0, 1).to_pylist()[0]
+    assert first["file_id"] == str(files[0].id) and first["user_id"] == str(USER)
+    assert (first["filename"], first["model_version"], first["width"], first["height"]) == ("a.jpg", "v8n", 640, 480)
+    assert (first["class_name"], first["x_min"], first["y_max"]) == ("person", 0.0, 20.25)
+    assert first["processed_at"] == START
+    second = table.slice(1, 1).to_pylist()[0]
+    assert (second["user_id"], second["width"]) == (None, None)
+    # Rows arrive in detection time order across row groups
+    assert table.column("x_min").to_pylist() == [float(i) for i in range(2500)]
+    assert set(table.column("class_name").to_pylist()) == {"person", "car"}
+
+
+def test_arrow_stream_batches_carry_their_own_classes(client):
+    _seed(client, 2500, classes=("person", "car", "dog"))
+    response = _export(client, format="arrow", row_group_size=1000)
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    reader = pa.ipc.open_stream(io.BytesIO(response.content))
+    assert reader.schema == bulk_export._schema()
+    batches = list(reader)
+    assert [batch.num_rows for batch in batches] == [1000, 1000, 500]
+    assert [set(batch.column("class_name").to_pylist()) for batch in batches] == [{"person"}, {"car"}, {"dog"}]
+
+
+def test_filters(client):
+    files = _seed(client, 200)
+
+    def rows(**params):
+        return pq.read_table(io.BytesIO(_export(client, **params).content)).to_pylist()
+
+    assert len(rows(since=START + timedelta(seconds=50), until=START + timedelta(seconds=60))) == 10
+    assert len(rows(min_confidence=0.95)) == 10
+    assert {row["file_id"] for row in rows(user_id=str(USER))} == {str(files[0].id)}
+    assert rows(class_name=["car", "dog"]) == []
+    assert len(rows(class_name=["car", "person"])) == 200
+
+
+def test_empty_export_is_a_valid_file(client):
+    for export_format in ("parquet", "arrow"):
+        content = _export(client, format=export_format).content
+        if export_format == "parquet":
+            table = pq.read_table(io.BytesIO(content))
+        else:
+            table = pa.ipc.open_stream(io.BytesIO(content)).read_all()
+        assert table.num_rows == 0 and table.schema == bulk_export._schema()
+
+
+def test_bad_requests_and_the_admin_gate(client):
+    url = "/api/admin/exports/detections"
+    assert client.get(url, params={"format": "csv"}).status_code == 400
+    assert client.get(url, params={"row_group_size": 10}).status_code == 422
+    assert client.get(url, params={"min_confidence": 2}).status_code == 422
+    assert client.get(url, headers={"X-Admin-Token": "wrong"}).status_code == 403
@@ -0,0 +1,118 @@
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from changes import (
+    DELETE,
+    UPSERT,
+    changed_files,
+    compact_changes,
+    flush_changes,
+    parse_cursor,
+    record_changes,
+    stage_changes,
+)
+
+
+def test_parse_cursor():
+    assert parse_cursor(None) == 0
+    assert parse_cursor("") == 0
+    assert parse_cursor("42") == 42
+    for bad in ("abc", "-1"):
+        with pytest.raises(HTTPException) as excinfo:
+            parse_cursor(bad)
+        assert excinfo.value.status_code == 400
+
+
+def test_feed_reports_latest_change_per_file_in_order(run_db):
+    a, b, c = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    async def scenario(db):
+        await record_changes(db, [a, b])
+        await db.commit()
+        await record_changes(db, [a])  # a changes again, after b
+        await record_changes(db, [c], DELETE)
+        await db.commit()
+        return await changed_files(db, since=0, limit=10)
+
+    page = run_db(scenario)
+    assert page.upserted == [b, a]
+    assert page.deleted == [c]
+    assert page.cursor == max(page.seqs.values())
+    assert not page.has_more
+
+
+def test_feed_pages_and_resumes_from_cursor(run_db):
+    ids = [uuid.uuid4() for _ in range(5)]
+
+    async def scenario(db):
+        await record_changes(db, ids)
+        await db.commit()
+        first = await changed_files(db, since=0, limit=3)
+        rest = await changed_files(db, since=first.cursor, limit=3)
+        after = await changed_files(db, since=rest.cursor, limit=3)
+        return first, rest, after
+
+    first, rest, after = run_db(scenario)
+    assert first.upserted == ids[:3] and first.has_more
+    assert rest.upserted == ids[3:] and not rest.has_more
+    assert after.upserted == [] and after.cursor == rest.cursor
+
+
+def test_staged_changes_are_written_at_flush(run_db):
+    from models import FileChange
+
+    file_id = uuid.uuid4()
+
+    async def scenario(db):
+        stage_changes(db, [file_id])
+        before = (await db.execute(select(func.count(FileChange.seq)))).scalar_one()
+        await flush_changes(db)
+        await db.commit()
+        page = await changed_files(db, since=0, limit=10)
+        return before, page
+
+    before, page = run_db(scenario)
+    assert before == 0
+    assert page.upserted == [file_id]
+
+
+def test_staged_changes_are_dropped_on_rollback(run_db):
+    from models import File as FileModel
+
+    async def scenario(db):
+        # Staged alongside the write it describes, as save_detections does
+        file = FileModel(id=uuid.uuid4(), filename="a.jpg", filetype="image/jpeg", size="1")
+        db.add(file)
+        await db.flush()
+        stage_changes(db, [file.id])
+        await db.rollback()
+        await flush_changes(db)
+        await db.commit()
+        return await changed_files(db, since=0, limit=10)
+
+    page = run_db(scenario)
+    assert page.upserted == [] and page.deleted == []
+
+
+def test_compaction_keeps_only_latest_entry_per_file(run_db):
+    from database import AsyncSessionLocal
+    from models import FileChange
+
+    a, b = uuid.uuid4(), uuid.uuid4()
+
+    async def scenario(db):
+        await record_changes(db, [a, b])
+        await record_changes(db, [a])
+        await record_changes(db, [b], DELETE)
+        await db.commit()
+        removed = await compact_changes()
+        async with AsyncSessionLocal() as check:
+            rows = (await check.execute(select(FileChange.file_id, FileChange.op).order_by(FileChange.seq))).all()
+        return removed, rows
+
+    removed, rows = run_db(scenario)
+    assert removed == 2
+    assert [(row.file_id, row.op) for row in rows] == [(a, UPSERT), (b, DELETE)]
@@ -0,0 +1,103 @@
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from cors import CORSMiddleware
+
+ALLOWED = "https://app.example.com"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/items")
+    async def items():
+        return {"items": []}
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_text("hello")
+        await websocket.close()
+
+    app.add_middleware(CORSMiddleware, allow_origins=[ALLOWED], allow_origin_regex=r"https://.*\.preview\.example\.com")
+    with TestClient(app) as client:
+        yield client
+
+
+def _preflight(client, origin, method="POST", headers="content-type"):
+    return client.options("/items", headers={
+        "Origin": origin,
+        "Access-Control-Request-Method": method,
+        "Access-Control-Request-Headers": headers,
+    })
+
+
+@pytest.mark.parametrize("origin", [ALLOWED, "https://pr-12.preview.example.com"])
+def test_allowed_preflight(client, origin):
+    response = _preflight(client, origin)
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == origin
+    assert "POST" in response.headers["access-control-allow-methods"]
+    assert response.headers["access-control-allow-headers"] == "content-type"
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert response.headers["vary"] == "Origin"
+    # Served from the preflight cache the second time, with the same answer
+    assert _preflight(client, origin).headers == response.headers
+
+
+@pytest.mark.parametrize("origin,method", [
+    ("https://evil.example.com", "POST"),
+    ("https://preview.example.com.evil.net", "POST"),
+    (ALLOWED, "PATCH"),
+])
+def test_disallowed_preflight_is_rejected(client, origin, method):
+    response = _preflight(client, origin, method)
+    assert response.status_code == 400
+    assert "access-control-allow-origin" not in response.headers
+
+
+def test_allowed_origin_gets_cors_headers_and_vary(client):
+    response = client.get("/items", headers={"Origin": ALLOWED})
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == ALLOWED
+    assert response.headers["vary"] == "Origin"
+    assert "ETag" in response.headers["access-control-expose-headers"]
+
+
+def test_disallowed_origin_gets_no_allow_origin_header(client):
+    response = client.get("/items", headers={"Origin": "https://evil.example.com"})
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+
+
+def test_request_without_origin_is_untouched(client):
+    response = client.get("/items")
+    assert response.status_code == 200
+    assert "access-control-allow-origin" not in response.headers
+
+
+@pytest.mark.parametrize("headers", [{"Origin": ALLOWED}, {}])
+def test_websocket_from_allowed_or_no_origin_is_accepted(client, headers):
+    with client.websocket_connect("/ws", headers=headers) as ws:
+        assert ws.receive_text() == "hello"
+
+
+def test_websocket_from_disallowed_origin_is_refused(client):
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with client.websocket_connect("/ws", headers={"Origin": "https://evil.example.com"}):
+            pass
+    assert excinfo.value.code == 1008
+
+
+def test_app_error_responses_carry_cors_headers(app_client):
+    # The size limit answers before the body is read; CORS must wrap it to let the browser see the 413
+    response = app_client.post("/api/upload", content=b"x", headers={
+        "Origin": "http://localhost:3000",
+        "Content-Length": str(10 ** 10),
+        "Content-Type": "multipart/form-data; boundary=x",
+    })
+    assert response.status_code == 413
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from deadlines import Deadline, DeadlineExceeded
+from scheduler import BATCH, InferenceScheduler, Job
+
+
+def _request(timeout=None):
+    headers = [] if timeout is None else [(b"x-request-timeout", timeout.encode())]
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers})
+
+
+def test_header_sets_the_budget():
+    before = time.monotonic()
+    deadline = Deadline.from_request(_request("2.5"), maximum=60)
+    assert before + 2.5 <= deadline.expires_at <= time.monotonic() + 2.5
+
+
+def test_budget_is_capped_at_the_route_maximum():
+    assert Deadline.from_request(_request("3600"), maximum=60).remaining() == pytest.approx(60, abs=1)
+    assert Deadline.from_request(_request(), maximum=60).remaining() == pytest.approx(60, abs=1)
+
+
+@pytest.mark.parametrize("timeout", ["soon", "0", "-5", "nan", "NaN", "inf", "-inf"])
+def test_invalid_header_is_rejected(timeout):
+    with pytest.raises(HTTPException) as excinfo:
+        Deadline.from_request(_request(timeout), maximum=60)
+    assert excinfo.value.status_code == 400
+
+
+def test_attach_ties_the_deadline_to_the_request():
+    request = _request("5")
+    assert Deadline.from_request(request, maximum=60).request is request
+    assert Deadline.from_request(request, maximum=60, attach=False).request is None
+
+
+def test_check_raises_504_once_expired():
+    asyncio.run(Deadline.after(60).check("inference"))
+    asyncio.run(Deadline().check("inference"))
+    with pytest.raises(DeadlineExceeded) as excinfo:
+        asyncio.run(Deadline.after(-1).check("inference"))
+    assert excinfo.value.status_code == 504
+    assert "inference" in excinfo.value.detail
+
+
+def test_scheduler_refuses_work_that_expired_before_queueing():
+    sched = InferenceScheduler(concurrency=1)
+    calls = []
+
+    async def main():
+        await sched.infer(calls.append, "late", BATCH, deadline=Deadline.after(-1), admit=False)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(main())
+    assert calls == []
+
+
+def test_scheduler_drops_queued_work_whose_deadline_passes():
+    sched = InferenceScheduler(concurrency=1)
+    calls = []
+
+    def slow(name):
+        time.sleep(0.3)
+        calls.append(name)
+        return name
+
+    async def main():
+        first = asyncio.ensure_future(sched.infer(slow, "first", BATCH, admit=False))
+        await asyncio.sleep(0.05)  # the worker is now busy with the first job
+        with pytest.raises(DeadlineExceeded):
+            await sched.infer(calls.append, "second", BATCH, deadline=Deadline.after(0.05), admit=False)
+        assert await first == "first"
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert calls == ["first"]
+
+
+def test_worker_skips_expired_jobs_without_running_them():
+    sched = InferenceScheduler(concurrency=1)
+    calls = []
+
+    async def main():
+        sched._ensure_started()
+        job = Job(calls.append, "stale", "alice", asyncio.get_running_loop().create_future(), BATCH, Deadline.after(-1))
+        sched.queues[BATCH].push(job)
+        sched._wakeup.set()
+        with pytest.raises(DeadlineExceeded):
+            await asyncio.wait_for(job.future, timeout=1)
+
+    asyncio.run(main())
+    assert calls == []
@@ -0,0 +1,100 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+from sqlalchemy import func, select
+
+
+def _png(color="white"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _in_app(client, fn):
+    """Run ``fn(session)`` on the app's event loop, where its connections live"""
+    from database import AsyncSessionLocal
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            return await fn(db)
+
+    return client.portal.call(main)
+
+
+def _counts(client):
+    from models import Blob, Detection, File as FileModel
+
+    async def load(db):
+        return tuple([
+            (await db.execute(select(func.count()).select_from(model))).scalar_one()
+            for model in (Blob, FileModel, Detection)
+        ])
+
+    return _in_app(client, load)
+
+
+@pytest.fixture
+def inference_calls(app_client, monkeypatch):
+    """Count model calls made through the scheduler"""
+    import server
+
+    calls = []
+    infer = server.scheduler.infer
+
+    async def counting(*args, **kwargs):
+        calls.append(args)
+        return await infer(*args, **kwargs)
+
+    monkeypatch.setattr(server.scheduler, "infer", counting)
+    return calls
+
+
+def _detect(client, data, **params):
+    response = client.post("/api/detect", files={"file": ("cat.png", data, "image/png")}, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_duplicate_detect_reuses_the_analysis(app_client, inference_calls):
+    data = _png()
+    first = _detect(app_client, data)
+    second = _detect(app_client, data)
+    assert len(inference_calls) == 1
+    assert second["id"] != first["id"]
+    assert [d["class_name"] for d in second["detections"]] == [d["class_name"] for d in first["detections"]]
+    assert {d["id"] for d in second["detections"]}.isdisjoint(d["id"] for d in first["detections"])
+    # One blob for both files; detections are copied per file
+    assert _counts(app_client) == (1, 2, 2 * first["total_objects"])
+
+
+def test_duplicate_upload_is_marked_analyzed(app_client, inference_calls):
+    data = _png()
+    first = app_client.post("/api/upload", files={"file": ("a.png", data, "image/png")}).json()
+    assert first["analyzed"] is False
+    _detect(app_client, data)
+    again = app_client.post("/api/upload", files={"file": ("b.png", data, "image/png")}).json()
+    assert again["analyzed"] is True
+    analysis = app_client.get(f"/api/analyses/{again['file_id']}").json()
+    assert analysis["total_objects"] > 0
+    assert len(inference_calls) == 1
+
+
+def test_different_bytes_are_analyzed_separately(app_client, inference_calls):
+    _detect(app_client, _png("white"))
+    _detect(app_client, _png("black"))
+    assert len(inference_calls) == 2
+    assert _counts(app_client)[0] == 2
+
+
+def test_other_zones_or_model_version_are_not_reused(app_client, inference_calls, monkeypatch):
+    import server
+
+    data = _png()
+    _detect(app_client, data)
+    _detect(app_client, data, roi=json.dumps({"include": [[0, 0, 32, 24]]}))
+    assert len(inference_calls) == 2
+    monkeypatch.setattr(server, "MODEL_VERSION", "other-weights")
+    _detect(app_client, data)
+    assert len(inference_calls) == 3
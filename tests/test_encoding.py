@@ -0,0 +1,89 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from encoding import (
+    ImageEncoding,
+    encode_image,
+    is_supported,
+    negotiate_encoding,
+    sniff_media_type,
+    stored_media_type,
+)
+
+DEFAULT = ImageEncoding(format="jpeg", quality=85)
+
+
+def test_explicit_format_wins_over_accept():
+    encoding = negotiate_encoding("PNG", "image/webp", default=DEFAULT)
+    assert (encoding.format, encoding.quality) == ("png", 85)
+    assert negotiate_encoding("jpg", default=DEFAULT).format == "jpeg"
+
+
+@pytest.mark.parametrize("accept,expected", [
+    ("image/png", "png"),
+    ("image/png;q=0.5, image/jpeg;q=0.8", "jpeg"),
+    ("image/png, image/jpeg", "jpeg"),  # equal q: server preference, not header order
+    ("image/jpeg;q=0, image/png", "png"),
+    ("image/jpeg;q=junk, image/png;q=0.1", "png"),
+    ("*/*", "jpeg"),
+    ("image/*", "jpeg"),
+    ("text/html", "jpeg"),
+])
+def test_accept_header_negotiation(accept, expected):
+    assert negotiate_encoding(accept=accept, default=DEFAULT).format == expected
+
+
+def test_accept_prefers_webp_when_supported():
+    expected = "webp" if is_supported("webp") else "jpeg"
+    assert negotiate_encoding(accept="image/jpeg, image/webp", default=DEFAULT).format == expected
+
+
+@pytest.mark.parametrize("kwargs", [{"format": "gif"}, {"format": "tiff"}, {"quality": 0}, {"quality": 101}])
+def test_bad_format_or_quality_is_rejected(kwargs):
+    with pytest.raises(ValueError):
+        negotiate_encoding(default=DEFAULT, **kwargs)
+
+
+def test_quality_overrides_the_default():
+    assert negotiate_encoding(quality=40, default=DEFAULT) == ImageEncoding(format="jpeg", quality=40)
+
+
+def test_quality_changes_jpeg_output():
+    image = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    low = encode_image(image, ImageEncoding(format="jpeg", quality=10))
+    high = encode_image(image, ImageEncoding(format="jpeg", quality=95))
+    assert len(low) < len(high)
+    assert cv2.imdecode(np.frombuffer(low, np.uint8), cv2.IMREAD_COLOR).shape == image.shape
+
+
+@pytest.mark.parametrize("fmt", ["jpeg", "png", "webp", "avif"])
+def test_encoded_bytes_sniff_as_their_media_type(fmt):
+    if not is_supported(fmt):
+        pytest.skip(f"OpenCV build cannot write {fmt}")
+    encoding = ImageEncoding(format=fmt)
+    data = encode_image(np.zeros((16, 16, 3), np.uint8), encoding)
+    assert sniff_media_type(data) == encoding.media_type
+
+
+@pytest.mark.parametrize("head,expected", [
+    (b"BM" + b"\x00" * 10, "image/bmp"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"\x00\x00\x00\x1cftypavif", "image/avif"),
+    (b"RIFF\x00\x00\x00\x00WAVE", None),
+    (b"<html>", None),
+    (b"", None),
+])
+def test_sniff_media_type(head, expected):
+    assert sniff_media_type(head) == expected
+
+
+def test_stored_media_type_reads_only_the_base64_head():
+    png = encode_image(np.zeros((16, 16, 3), np.uint8), ImageEncoding(format="png"))
+    stored = base64.b64encode(png).decode()
+    assert stored_media_type(stored) == "image/png"
+    assert stored_media_type(stored[:32]) == "image/png"
+    assert stored_media_type(base64.b64encode(b"unknown bytes").decode()) == "image/jpeg"
@@ -0,0 +1,111 @@
+import asyncio
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _in_app(client, fn):
+    """Run ``fn(session)`` on the app's event loop, where its connections live"""
+    from database import AsyncSessionLocal
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            return await fn(db)
+
+    return client.portal.call(main)
+
+
+@pytest.fixture
+def file_id(app_client):
+    response = app_client.post("/api/upload", files={"file": ("cat.png", _png(), "image/png")})
+    assert response.status_code == 200
+    return response.json()["file_id"]
+
+
+def _exports(client):
+    from models import Export, SupersededExport
+
+    async def load(db):
+        exports = (await db.execute(select(Export.format, Export.blob_key, Export.detection_version))).all()
+        superseded = set((await db.execute(select(SupersededExport.blob_key))).scalars())
+        return exports, superseded
+
+    return _in_app(client, load)
+
+
+def test_export_is_built_once_and_revalidated_with_etag(app_client, file_id):
+    first = app_client.get(f"/api/export/{file_id}", params={"format": "coco"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert sorted(zipfile.ZipFile(io.BytesIO(first.content)).namelist()) == ["annotations.json", "cat.png"]
+
+    again = app_client.get(f"/api/export/{file_id}", params={"format": "coco"})
+    assert again.headers["etag"] == etag and again.content == first.content
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = app_client.get(f"/api/export/{file_id}", params={"format": "coco"}, headers={"If-None-Match": header})
+        assert response.status_code == 304 and response.headers["etag"] == etag
+    assert app_client.get(f"/api/export/{file_id}", params={"format": "coco"},
+                          headers={"If-None-Match": '"other"'}).status_code == 200
+
+    exports, superseded = _exports(app_client)
+    assert len(exports) == 1 and superseded == set()
+
+
+def test_unknown_format_is_rejected_without_building(app_client, file_id):
+    assert app_client.get(f"/api/export/{file_id}", params={"format": "voc"}).status_code == 400
+    assert _exports(app_client) == ([], set())
+
+
+def test_reanalysis_invalidates_and_supersedes_the_artifact(app_client, file_id):
+    import server
+    from pipeline import DetectionResult
+    from storage import blob_store
+
+    first = app_client.get(f"/api/export/{file_id}", params={"format": "yolo"})
+    [(_, old_key, old_version)] = _exports(app_client)[0]
+
+    async def reanalyze(db):
+        detection = DetectionResult(class_name="person", confidence=0.9, bbox=[1, 2, 30, 40], color="#fff")
+        await server.save_detections(db, server.uuid.UUID(file_id), [detection])
+        await server.commit_analysis(db)
+
+    _in_app(app_client, reanalyze)
+    stale = app_client.get(f"/api/export/{file_id}", params={"format": "yolo"},
+                           headers={"If-None-Match": first.headers["etag"]})
+    assert stale.status_code == 200
+    assert stale.headers["etag"] != first.headers["etag"]
+    labels = zipfile.ZipFile(io.BytesIO(stale.content)).read("cat.txt").decode()
+    assert labels.startswith("0 ")
+
+    [(_, new_key, new_version)], superseded = _exports(app_client)
+    assert new_version == old_version + 1
+    # The old artifact waits for retention, so a download already holding its key still works
+    assert superseded == {old_key} and new_key != old_key
+    assert blob_store.exists(old_key)
+
+
+def test_concurrent_builds_leave_one_export_row(app_client, file_id):
+    import server
+    from database import AsyncSessionLocal
+
+    async def build_twice():
+        async def build():
+            async with AsyncSessionLocal() as db:
+                file = await server.get_file_with_detections(db, file_id)
+                return await server.store_export(db, file, "yolo")
+
+        return await asyncio.gather(build(), build())
+
+    built = app_client.portal.call(build_twice)
+    [(_, key, _)], superseded = _exports(app_client)
+    assert key in {export.blob_key for export in built}
+    assert superseded <= {export.blob_key for export in built} - {key}
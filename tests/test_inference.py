@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("ultralytics")
+
+import inference  # noqa: E402
+
+
+class FakeModel:
+    task = "detect"
+
+    def __init__(self, fail_at=None):
+        self.calls = []
+        self.fused = False
+        self.fail_at = fail_at
+
+    def __call__(self, source, verbose=True):
+        if len(self.calls) == self.fail_at:
+            raise RuntimeError("out of memory")
+        self.calls.append(len(source) if isinstance(source, list) else 1)
+        return []
+
+    def fuse(self):
+        self.fused = True
+
+
+@pytest.fixture
+def state(monkeypatch):
+    state = inference.ModelState()
+    monkeypatch.setattr(inference, "model_state", state)
+    monkeypatch.setattr(inference, "MODEL_WARMUP", True)
+    monkeypatch.setattr(inference, "MODEL_WARMUP_IMGSZ", 32)
+    monkeypatch.setattr(inference, "MODEL_WARMUP_ITERATIONS", 2)
+    return state
+
+
+def test_warm_up_runs_every_batch_size_then_reports_ready(state):
+    model = FakeModel()
+    assert not state.ready
+    inference.warm_up(model, [1, 4])
+    assert model.calls == [1, 1, 4, 4]
+    assert state.ready and state.error is None
+    assert set(state.warmup_batches) == {"1", "4"}
+    assert state.warmup_seconds is not None
+
+
+def test_failed_warm_up_stays_not_ready(state):
+    inference.warm_up(FakeModel(fail_at=1), [1, 4])
+    assert not state.ready
+    assert state.error == "out of memory"
+    assert inference.readiness()["ready"] is False
+
+
+def test_ready_without_warm_up_configured(state, monkeypatch):
+    monkeypatch.setattr(inference, "MODEL_WARMUP", False)
+    assert state.ready
+    model = FakeModel()
+    inference.start_warm_up(model)
+    assert model.calls == []
+
+
+def test_warm_up_runs_on_the_given_executor(state):
+    model = FakeModel()
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="model") as executor:
+        inference.start_warm_up(model, executor)
+    assert state.ready and len(model.calls) == 2 * len(inference.MODEL_WARMUP_BATCH_SIZES)
+
+
+def test_load_model_applies_fuse(state, monkeypatch):
+    monkeypatch.setattr(inference, "YOLO", lambda weights: FakeModel())
+    model = inference.load_model("yolov8n.pt", "fuse")
+    assert model.fused
+    assert (state.weights, state.optimization) == ("yolov8n.pt", "fuse")
+
+
+def test_unknown_optimization_serves_the_plain_model(state, monkeypatch):
+    monkeypatch.setattr(inference, "YOLO", lambda weights: FakeModel())
+    model = inference.load_model("yolov8n.pt", "quantize")
+    assert isinstance(model, FakeModel) and not model.fused
+    assert state.optimization == "none"
+
+
+def test_ready_probe_follows_the_warm_up_state(app_client, monkeypatch):
+    state = inference.ModelState()
+    monkeypatch.setattr(inference, "model_state", state)
+    monkeypatch.setattr(inference, "MODEL_WARMUP", True)
+    response = app_client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+    state.warmed_up = True
+    state.warmup_batches = {"1": 0.01}
+    response = app_client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["warmup_batches"] == {"1": 0.01}
+    # Liveness does not wait for warm-up
+    assert app_client.get("/").status_code == 200
+
@@ -0,0 +1,108 @@
+import hashlib
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+import ingest
+from ingest import RequestSizeLimitMiddleware, ingest_fileobj
+from storage import blob_key_for, blob_store
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 100
+
+
+def _temp_files():
+    return set(os.listdir(blob_store.tmp_dir))
+
+
+def test_ingest_hashes_and_stores_in_chunks(monkeypatch):
+    monkeypatch.setattr(ingest, "UPLOAD_CHUNK_SIZE", 16)
+    data = PNG + os.urandom(1000)
+    blob = ingest_fileobj(io.BytesIO(data))
+    digest = hashlib.sha256(data).hexdigest()
+    assert (blob.digest, blob.size, blob.media_type) == (digest, len(data), "image/png")
+    assert blob.blob_key == blob_key_for(digest)
+    assert blob_store.read(blob.blob_key) == data
+
+
+def test_ingest_of_stored_bytes_keeps_the_existing_blob():
+    data = PNG + os.urandom(64)
+    first, second = ingest_fileobj(io.BytesIO(data)), ingest_fileobj(io.BytesIO(data))
+    assert first == second
+    assert blob_store.read(first.blob_key) == data
+
+
+def test_media_type_comes_from_magic_bytes():
+    before = _temp_files()
+    with pytest.raises(HTTPException) as excinfo:
+        ingest_fileobj(io.BytesIO(b"<html>not an image</html>"))
+    assert excinfo.value.status_code == 415
+    assert _temp_files() == before
+    assert ingest_fileobj(io.BytesIO(b"\xff\xd8\xff\xe0" + os.urandom(32))).media_type == "image/jpeg"
+
+
+def test_oversized_file_is_rejected_mid_stream(monkeypatch):
+    monkeypatch.setattr(ingest, "UPLOAD_CHUNK_SIZE", 16)
+    data = PNG + os.urandom(200)
+    before = _temp_files()
+    with pytest.raises(HTTPException) as excinfo:
+        ingest_fileobj(io.BytesIO(data), max_bytes=100)
+    assert excinfo.value.status_code == 413
+    assert _temp_files() == before
+    assert not blob_store.exists(blob_key_for(hashlib.sha256(data).hexdigest()))
+
+
+def test_empty_file_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        ingest_fileobj(io.BytesIO(b""))
+    assert excinfo.value.status_code == 400
+
+
+@pytest.fixture
+def limited_client():
+    app = FastAPI()
+
+    @app.post("/small")
+    @app.post("/other")
+    async def echo(request: Request):
+        return {"received": len(await request.body())}
+
+    @app.get("/small")
+    async def get_small():
+        return {"ok": True}
+
+    app.add_middleware(RequestSizeLimitMiddleware, limits={"/small": 10}, default=100)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_declared_length_over_the_limit_is_refused(limited_client):
+    response = limited_client.post("/small", content=b"x" * 11)
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body exceeds 10 bytes"}
+    assert limited_client.post("/small", content=b"x" * 10).json() == {"received": 10}
+
+
+def test_limit_is_per_path_with_a_default(limited_client):
+    assert limited_client.post("/small/", content=b"x" * 11).status_code == 413
+    assert limited_client.post("/other", content=b"x" * 50).json() == {"received": 50}
+    assert limited_client.post("/other", content=b"x" * 101).status_code == 413
+    assert limited_client.get("/small").status_code == 200
+
+
+def test_chunked_body_is_cut_off_past_the_limit(limited_client):
+    def chunks(count):
+        for _ in range(count):
+            yield b"x" * 4
+
+    response = limited_client.post("/small", content=chunks(5))
+    assert response.status_code == 413
+    assert limited_client.post("/small", content=chunks(2)).json() == {"received": 8}
+
+
+def test_malformed_content_length_is_a_bad_request(limited_client):
+    response = limited_client.post("/small", content=b"x", headers={"Content-Length": "ten"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid Content-Length header"}
@@ -0,0 +1,100 @@
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+import metrics
+from metrics import MetricsMiddleware, metrics_response, record_cache, stage
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        if item_id == 404:
+            raise HTTPException(status_code=404)
+        return {"id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    @app.get("/metrics")
+    async def prometheus():
+        return metrics_response()
+
+    app.add_middleware(MetricsMiddleware)
+    with TestClient(app, raise_server_exceptions=False) as client:
+        yield client
+
+
+def test_requests_are_counted_under_the_route_template(client):
+    before = _value("visionflow_http_requests_total", method="GET", route="/items/{item_id}", status="200")
+    for item_id in (1, 2, 3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    client.get("/items/404")
+    assert _value("visionflow_http_requests_total", method="GET", route="/items/{item_id}", status="200") == before + 3
+    assert _value("visionflow_http_requests_total", method="GET", route="/items/{item_id}", status="404") >= 1
+    assert _value("visionflow_http_requests_total", method="GET", route="/items/1", status="200") == 0
+    assert _value("visionflow_http_request_seconds_count", method="GET", route="/items/{item_id}") >= 4
+
+
+def test_unmatched_paths_share_one_label(client):
+    before = _value("visionflow_http_requests_total", method="GET", route="unmatched", status="404")
+    client.get("/nope/1")
+    client.get("/nope/2")
+    assert _value("visionflow_http_requests_total", method="GET", route="unmatched", status="404") == before + 2
+
+
+def test_unhandled_errors_count_as_500_and_are_always_logged(client, caplog, monkeypatch):
+    monkeypatch.setattr(metrics, "ACCESS_LOG_SAMPLE_RATE", 0.0)
+    before = _value("visionflow_http_requests_total", method="GET", route="/boom", status="500")
+    with caplog.at_level(logging.INFO, logger="access"):
+        assert client.get("/boom").status_code == 500
+        client.get("/items/1")
+    assert _value("visionflow_http_requests_total", method="GET", route="/boom", status="500") == before + 1
+    [record] = [r for r in caplog.records if r.name == "access"]
+    entry = json.loads(record.getMessage())
+    assert (entry["path"], entry["route"], entry["status"]) == ("/boom", "/boom", 500)
+
+
+def test_stage_records_time_even_when_the_block_fails():
+    before = _value("visionflow_stage_seconds_count", stage="decode")
+    with stage("decode"):
+        pass
+    with pytest.raises(ValueError):
+        with stage("decode"):
+            raise ValueError
+    assert _value("visionflow_stage_seconds_count", stage="decode") == before + 2
+
+
+def test_cache_lookups_are_split_by_result():
+    hits = _value("visionflow_cache_lookups_total", cache="export", result="hit")
+    misses = _value("visionflow_cache_lookups_total", cache="export", result="miss")
+    record_cache("export", True)
+    record_cache("export", True)
+    record_cache("export", False)
+    assert _value("visionflow_cache_lookups_total", cache="export", result="hit") == hits + 2
+    assert _value("visionflow_cache_lookups_total", cache="export", result="miss") == misses + 1
+
+
+def test_exposition_parses_and_includes_the_gauges(client):
+    client.get("/items/1")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    families = {family.name: family for family in text_string_to_metric_families(response.text)}
+    for name in ("visionflow_stage_seconds", "visionflow_http_requests", "visionflow_cpu_executor_queue_depth"):
+        assert name in families
+    pool_states = {sample.labels["state"] for sample in families["visionflow_db_pool_connections"].samples}
+    assert pool_states == {"size", "checked_out", "checked_in", "overflow"}
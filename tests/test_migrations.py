@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# The migrations use Postgres SQL; offline mode renders it without a server
+OFFLINE_URL = "postgresql://visionflow@localhost/visionflow"
+
+
+def _alembic(*args, url=OFFLINE_URL):
+    """Run the alembic CLI from backend/ in its own process, so its logging setup stays out of the tests"""
+    result = subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=BACKEND_DIR, env={**os.environ, "DATABASE_URL": url}, capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def _statements(sql):
+    """Rendered SQL as single-line statements, without alembic's comments"""
+    code = "\n".join(line for line in sql.splitlines() if not line.startswith("--"))
+    return [" ".join(statement.split()) for statement in code.split(";") if statement.strip()]
+
+
+def test_revisions_form_one_chain():
+    out = _alembic("heads")
+    assert out.split() == ["add_file_owner", "(head)"]
+    history = _alembic("history").splitlines()
+    assert len(history) == len(list((BACKEND_DIR / "migrations" / "versions").glob("*.py")))
+    assert "typed_detections_schema" in _alembic("history", "-r", "add_blobs_table:add_detection_time_index")
+
+
+def test_typed_detections_upgrade_backfills_before_dropping_the_json():
+    statements = _statements(_alembic("upgrade", "add_blobs_table:typed_detections_schema", "--sql"))
+    backfill = next(i for i, s in enumerate(statements) if s.startswith("UPDATE detections SET x_min"))
+    assert "(box_coordinates->>3)::double precision" in statements[backfill]
+    assert statements.index("ALTER TABLE detections ADD COLUMN x_min FLOAT") < backfill
+    assert backfill < statements.index("ALTER TABLE detections ALTER COLUMN x_min SET NOT NULL")
+    assert backfill < statements.index("ALTER TABLE detections DROP COLUMN box_coordinates")
+    assert "ALTER TABLE detections ALTER COLUMN confidence TYPE FLOAT USING confidence::double precision" in statements
+    assert "CREATE INDEX ix_detections_class_name_confidence ON detections (class_name, confidence)" in statements
+    assert "CREATE INDEX ix_files_uploaded_at_id ON files (uploaded_at DESC, id)" in statements
+
+
+def test_typed_detections_downgrade_rebuilds_the_json_first():
+    statements = _statements(_alembic("downgrade", "typed_detections_schema:add_blobs_table", "--sql"))
+    rebuild = statements.index(
+        "UPDATE detections SET box_coordinates = json_build_array(x_min, y_min, x_max, y_max)"
+    )
+    assert statements.index("ALTER TABLE detections ADD COLUMN box_coordinates JSON") < rebuild
+    assert rebuild < statements.index("ALTER TABLE detections DROP COLUMN x_min")
+    assert "ALTER TABLE detections ALTER COLUMN confidence TYPE VARCHAR USING confidence::text" in statements
+    assert "DROP INDEX ix_detections_file_id" in statements
+
+
+def test_full_chain_renders_both_ways():
+    assert "CREATE TABLE files" in _alembic("upgrade", "head", "--sql")
+    assert "DROP TABLE files" in _alembic("downgrade", "head:base", "--sql")
+
+
+def test_typed_detections_round_trip_on_postgres():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("set TEST_POSTGRES_URL to a disposable Postgres database")
+    pytest.importorskip("psycopg2")
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(url)
+    file_id, detection_id = uuid.uuid4(), uuid.uuid4()
+    _alembic("downgrade", "base", url=url)
+    _alembic("upgrade", "add_blobs_table", url=url)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO files (id, filename, filetype, uploaded_at) VALUES (:id, 'a.jpg', 'image/jpeg', now())"
+            ), {"id": file_id})
+            conn.execute(text(
+                "INSERT INTO detections (id, file_id, class_name, confidence, box_coordinates, processed_at)"
+                " VALUES (:id, :file_id, 'person', '0.75', '[1.5, 2, 30, 40.25]', now())"
+            ), {"id": detection_id, "file_id": file_id})
+
+        _alembic("upgrade", "typed_detections_schema", url=url)
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT confidence, x_min, y_min, x_max, y_max FROM detections")).one()
+        assert tuple(row) == (0.75, 1.5, 2.0, 30.0, 40.25)
+
+        _alembic("downgrade", "add_blobs_table", url=url)
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT confidence, box_coordinates FROM detections")).one()
+        assert float(row.confidence) == 0.75
+        assert row.box_coordinates == [1.5, 2, 30, 40.25]
+
+        # The rest of the chain applies and unwinds on top of the data
+        _alembic("upgrade", "head", url=url)
+        _alembic("downgrade", "add_blobs_table", url=url)
+    finally:
+        engine.dispose()
+        _alembic("downgrade", "base", url=url)
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from motion import MotionGate, frame_distance, frame_signature
+from pipeline import DetectionResult
+
+
+def _frame(value, width=128, height=96):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def _decisions(gate, frames):
+    return [gate.changed(frame) for frame in frames]
+
+
+def test_first_frame_is_a_keyframe_and_identical_frames_are_skipped():
+    gate = MotionGate("diff", max_skip=100)
+    assert _decisions(gate, [_frame(100)] * 4) == [True, False, False, False]
+    assert gate.report() == {
+        "method": "diff", "threshold": gate.threshold,
+        "frames": 4, "inferred": 1, "skipped": 3, "skip_ratio": 0.75,
+    }
+
+
+def test_change_is_measured_against_the_keyframe_not_the_previous_frame():
+    # Each step is below MOTION_PIXEL_DELTA, but the drift since the keyframe is not
+    gate = MotionGate("diff", max_skip=100)
+    assert _decisions(gate, [_frame(v) for v in (100, 110, 120, 130, 140)]) == [True, False, False, True, False]
+
+
+def test_moving_object_is_inferred():
+    gate = MotionGate("diff", max_skip=100)
+    moved = _frame(100)
+    moved[20:60, 30:70] = 250
+    assert _decisions(gate, [_frame(100), _frame(100), moved, moved]) == [True, False, True, False]
+
+
+def test_max_skip_forces_inference():
+    gate = MotionGate("diff", max_skip=2)
+    assert _decisions(gate, [_frame(100)] * 7) == [True, False, False, True, False, False, True]
+
+
+def test_reset_forces_the_next_frame():
+    gate = MotionGate("diff", max_skip=100)
+    assert _decisions(gate, [_frame(100)] * 2) == [True, False]
+    gate.reset()
+    assert _decisions(gate, [_frame(100)] * 2) == [True, False]
+
+
+def test_size_change_forces_inference():
+    gate = MotionGate("diff", max_skip=100)
+    assert _decisions(gate, [_frame(100), _frame(100, width=128, height=64)]) == [True, True]
+
+
+def test_hash_signature():
+    gradient = np.tile(np.arange(0, 256, 2, dtype=np.uint8), (96, 1))
+    a = frame_signature(gradient, "hash")
+    assert a.shape == (8, 8) and a.all()
+    assert frame_distance(a, frame_signature(gradient[:, ::-1], "hash"), "hash") == 1.0
+    gate = MotionGate("hash", max_skip=100)
+    assert _decisions(gate, [gradient, gradient, gradient[:, ::-1]]) == [True, False, True]
+
+
+def test_invalid_method_is_rejected():
+    with pytest.raises(ValueError):
+        MotionGate("optical-flow")
+
+
+def _det(class_name):
+    return DetectionResult(class_name=class_name, confidence=0.9, bbox=[0, 0, 1, 1], color="#fff")
+
+
+def test_expand_reuses_the_latest_keyframe_detections_with_fresh_ids():
+    gate = MotionGate("diff")
+    first, second = [_det("person")], [_det("car"), _det("dog")]
+    results = gate.expand([True, False, False, True, False], [first, second])
+
+    assert results[0] is first and results[3] is second
+    assert [[d.class_name for d in frame] for frame in results] == [
+        ["person"], ["person"], ["person"], ["car", "dog"], ["car", "dog"],
+    ]
+    ids = [d.id for frame in results for d in frame]
+    assert len(ids) == len(set(ids))
+    # The next run starts from the last keyframe's detections
+    assert [d.class_name for d in gate.expand([False], [])[0]] == ["car", "dog"]
+
+
+def test_uncommitted_keyframe_waits_for_its_detections():
+    gate = MotionGate("diff", max_skip=100)
+    signature = gate.signature(_frame(100))
+    # Inference of the first frame failed: nothing was kept, so the same frame is inferred again
+    assert gate.check(signature, commit=False)
+    assert gate.check(signature, commit=False)
+    gate.keep(signature, [_det("person")])
+    assert not gate.check(signature, commit=False)
+    assert [d.class_name for d in gate.expand([False], [])[0]] == ["person"]
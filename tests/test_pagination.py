@@ -0,0 +1,98 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 10, 19, 12, 30, 15, 123456)
+    row_id = uuid.uuid4()
+    cursor = encode_cursor(timestamp, row_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, row_id)
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(datetime(2026, 1, 1), uuid.uuid4())[:-6]])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor)
+    assert excinfo.value.status_code == 400
+
+
+def _add_files(run_db, uploaded_at):
+    """One file with one detection per timestamp; returns the file ids"""
+    from models import Detection, File as FileModel
+
+    async def add(db):
+        ids = []
+        for i, timestamp in enumerate(uploaded_at):
+            file = FileModel(id=uuid.uuid4(), filename=f"f{i}.jpg", filetype="image/jpeg", size="1", uploaded_at=timestamp)
+            db.add(file)
+            db.add(Detection(file_id=file.id, class_name="person", confidence=0.9, x_min=0, y_min=0, x_max=1, y_max=1))
+            ids.append(str(file.id))
+        await db.commit()
+        return ids
+
+    return run_db(add)
+
+
+def _pages(client, limit):
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/detections/search", params=params).json()
+        pages.append([item["file_id"] for item in body["items"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def search_client(run_db):
+    import search
+
+    app = FastAPI()
+    app.include_router(search.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_search_pages_through_equal_timestamps(run_db, search_client):
+    # A page boundary falls inside a run of files uploaded at the same instant
+    same = datetime(2026, 10, 19, 12, 0, 0)
+    uploaded_at = [same + timedelta(seconds=1)] + [same] * 5 + [same - timedelta(seconds=1)]
+    ids = _add_files(run_db, uploaded_at)
+
+    pages = _pages(search_client, limit=2)
+    seen = [file_id for page in pages for file_id in page]
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(set(seen))
+    # Newest first, ties broken by id descending
+    assert seen[0] == ids[0]
+    assert seen[-1] == ids[-1]
+    assert seen[1:-1] == sorted(ids[1:-1], key=uuid.UUID, reverse=True)
+
+
+def test_search_last_full_page_has_no_next_cursor(run_db, search_client):
+    same = datetime(2026, 10, 19, 12, 0, 0)
+    ids = _add_files(run_db, [same] * 4)
+    pages = _pages(search_client, limit=2)
+    assert [len(page) for page in pages] == [2, 2]
+    assert sorted(file_id for page in pages for file_id in page) == sorted(ids)
+
+
+def test_search_single_short_page(run_db, search_client):
+    ids = _add_files(run_db, [datetime(2026, 10, 19, 12, 0, 0)] * 3)
+    assert [len(page) for page in _pages(search_client, limit=5)] == [3]
+    assert _pages(search_client, limit=3) == [sorted(ids, key=uuid.UUID, reverse=True)]
@@ -0,0 +1,267 @@
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+import admin
+import reanalysis
+from reanalysis import CampaignRunner
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+async def _add_files(db, versions):
+    """One file per model version, the first newest; returns their ids in that order"""
+    from models import File as FileModel
+
+    files = [
+        FileModel(id=uuid.uuid4(), filename=f"{i}.jpg", filetype="image/jpeg", size="1",
+                  model_version=version, uploaded_at=NOW - timedelta(minutes=i))
+        for i, version in enumerate(versions)
+    ]
+    db.add_all(files)
+    await db.commit()
+    return [file.id for file in files]
+
+
+async def _add_campaign(db, batch_size=2, **values):
+    from models import ReanalysisCampaign
+
+    campaign = ReanalysisCampaign(model_version="new", batch_size=batch_size, rate=1000, **values)
+    db.add(campaign)
+    await db.commit()
+    return campaign.id
+
+
+async def _campaign(campaign_id):
+    from database import AsyncSessionLocal
+    from models import ReanalysisCampaign
+
+    async with AsyncSessionLocal() as db:
+        return await db.get(ReanalysisCampaign, campaign_id)
+
+
+class Processor:
+    """Brings each batch up to the "new" model and records the batches it saw"""
+
+    def __init__(self, on_batch=None):
+        self.batches = []
+        self.on_batch = on_batch
+
+    async def __call__(self, db, file_ids, user):
+        from models import File as FileModel
+
+        self.batches.append(list(file_ids))
+        await db.execute(update(FileModel).where(FileModel.id.in_(file_ids)).values(model_version="new"))
+        await db.commit()
+        if self.on_batch is not None:
+            await self.on_batch(len(self.batches))
+        return {"done": list(file_ids), "failed": [], "skipped": []}
+
+
+def _runner(processor, owner="worker-a"):
+    runner = CampaignRunner()
+    runner.owner = owner
+    runner.configure(processor, "new")
+    return runner
+
+
+def test_campaign_walks_stale_files_newest_first(run_db):
+    processor = Processor()
+    runner = _runner(processor)
+
+    async def scenario(db):
+        ids = await _add_files(db, ["old", None, "old", "new", "old", "older", "old"])
+        campaign_id = await _add_campaign(db)
+        assert await runner.claim(campaign_id)
+        await runner._run(campaign_id)
+        return ids, await _campaign(campaign_id)
+
+    ids, campaign = run_db(scenario)
+    # Never-analyzed (None) and current files are left alone
+    assert processor.batches == [[ids[0], ids[2]], [ids[4], ids[5]], [ids[6]]]
+    assert (campaign.status, campaign.owner, campaign.processed) == ("done", None, 5)
+    assert campaign.finished_at is not None
+    assert (campaign.cursor_uploaded_at, campaign.cursor_id) == (NOW - timedelta(minutes=6), ids[6])
+
+
+def test_files_sharing_a_timestamp_are_each_visited_once(run_db):
+    from models import File as FileModel
+
+    processor = Processor()
+    runner = _runner(processor)
+
+    async def scenario(db):
+        db.add_all(FileModel(filename="same.jpg", filetype="image/jpeg", model_version="old", uploaded_at=NOW)
+                   for _ in range(5))
+        await db.commit()
+        campaign_id = await _add_campaign(db)
+        await runner.claim(campaign_id)
+        await runner._run(campaign_id)
+
+    run_db(scenario)
+    visited = [file_id for batch in processor.batches for file_id in batch]
+    assert len(visited) == len(set(visited)) == 5
+
+
+def test_pause_keeps_the_cursor_and_resume_continues(run_db):
+    from database import AsyncSessionLocal
+
+    async def pause_after_first(batch_number):
+        if batch_number == 1:
+            async with AsyncSessionLocal() as db:
+                await reanalysis._set_status(db, campaign_id, ("running",), "paused")
+
+    processor = Processor(pause_after_first)
+    runner = _runner(processor)
+
+    async def scenario(db):
+        nonlocal campaign_id
+        ids = await _add_files(db, ["old"] * 5)
+        campaign_id = await _add_campaign(db)
+        await runner.claim(campaign_id)
+        await runner._run(campaign_id)
+        paused = await _campaign(campaign_id)
+        # A paused campaign cannot be claimed until it is resumed
+        assert not await runner.claim(campaign_id)
+
+        async with AsyncSessionLocal() as other:
+            await reanalysis._set_status(other, campaign_id, ("paused",), "running")
+        resumer = _runner(processor, owner="worker-b")
+        assert await resumer.claim(campaign_id)
+        await resumer._run(campaign_id)
+        return ids, paused, await _campaign(campaign_id)
+
+    campaign_id = None
+    ids, paused, finished = run_db(scenario)
+    # The batch in flight when the pause landed is still counted and the cursor sits after it
+    assert (paused.status, paused.owner, paused.processed, paused.cursor_id) == ("paused", None, 2, ids[1])
+    assert processor.batches == [ids[0:2], ids[2:4], ids[4:5]]
+    assert (finished.status, finished.processed) == ("done", 5)
+
+
+def test_lease_is_taken_over_only_after_it_expires(run_db):
+    processor = Processor()
+    first, second = _runner(processor, "worker-a"), _runner(processor, "worker-b")
+
+    async def scenario(db):
+        from models import ReanalysisCampaign
+
+        await _add_files(db, ["old"] * 3)
+        campaign_id = await _add_campaign(db)
+        assert await first.claim(campaign_id)
+        assert not await second.claim(campaign_id)
+        assert await first.claim(campaign_id)  # renewing its own lease
+
+        expired = datetime.utcnow() - timedelta(seconds=reanalysis.REANALYSIS_LEASE_SECONDS + 1)
+        await db.execute(update(ReanalysisCampaign).values(heartbeat_at=expired))
+        await db.commit()
+        assert await second.claim(campaign_id)
+        # The previous owner stops without touching the campaign
+        await first._run(campaign_id)
+        assert processor.batches == []
+        await second._run(campaign_id)
+        return await _campaign(campaign_id)
+
+    campaign = run_db(scenario)
+    assert (campaign.status, campaign.processed) == ("done", 3)
+    assert len(processor.batches) == 2
+
+
+def test_failed_batch_is_counted_and_the_campaign_moves_on(run_db):
+    calls = []
+
+    async def flaky(db, file_ids, user):
+        calls.append(user)
+        if len(calls) == 1:
+            raise RuntimeError("model crashed")
+        return {"done": list(file_ids)[:1], "failed": [], "skipped": list(file_ids)[1:]}
+
+    runner = _runner(flaky)
+
+    async def scenario(db):
+        await _add_files(db, ["old"] * 4)
+        campaign_id = await _add_campaign(db)
+        await runner.claim(campaign_id)
+        await runner._run(campaign_id)
+        return campaign_id, await _campaign(campaign_id)
+
+    campaign_id, campaign = run_db(scenario)
+    assert (campaign.status, campaign.failed, campaign.processed, campaign.skipped) == ("done", 2, 1, 1)
+    assert campaign.last_error == "model crashed"
+    assert calls == [f"campaign:{campaign_id}"] * 2
+
+
+class Gate:
+    """Holds every batch until released, so the test decides when the campaign may finish"""
+
+    def __init__(self):
+        self.released = asyncio.Event()
+
+    async def __call__(self, batch_number):
+        await self.released.wait()
+
+    async def release(self):
+        self.released.set()
+
+
+@pytest.fixture
+def gate():
+    return Gate()
+
+
+@pytest.fixture
+def client(db_engine, gate, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", "s3cret")
+    monkeypatch.setattr(reanalysis, "runner", _runner(Processor(gate)))
+    app = FastAPI()
+    app.include_router(reanalysis.router)
+    with TestClient(app, headers={"X-Admin-Token": "s3cret"}) as client:
+        yield client
+
+
+def _wait_for(client, campaign_id, status):
+    deadline = time.monotonic() + 5
+    while (campaign := client.get(f"/api/admin/reanalysis/{campaign_id}").json())["status"] != status:
+        assert time.monotonic() < deadline, campaign
+        client.portal.call(asyncio.sleep, 0.01)
+    return campaign
+
+
+def test_api_pause_resume_and_one_active_campaign_per_model(client, gate):
+    from database import AsyncSessionLocal
+
+    async def setup():
+        async with AsyncSessionLocal() as db:
+            await _add_files(db, ["old", "old", "new", None])
+
+    client.portal.call(setup)
+    assert client.get("/api/admin/reanalysis/versions").json() == {
+        "current": "new", "files_by_version": {"old": 2, "new": 1}, "stale": 2,
+    }
+    created = client.post("/api/admin/reanalysis", params={"batch_size": 1, "rate": 1000}).json()
+    campaign_id = created["id"]
+    assert (created["status"], created["total"]) == ("running", 2)
+    assert client.post("/api/admin/reanalysis").status_code == 409
+
+    paused = client.post(f"/api/admin/reanalysis/{campaign_id}/pause").json()
+    assert (paused["status"], paused["owner"]) == ("paused", None)
+    assert client.post(f"/api/admin/reanalysis/{campaign_id}/pause").status_code == 409
+    assert client.post("/api/admin/reanalysis").status_code == 409  # paused still counts as active
+
+    assert client.post(f"/api/admin/reanalysis/{campaign_id}/resume").json()["status"] == "running"
+    client.portal.call(gate.release)
+    campaign = _wait_for(client, campaign_id, "done")
+    assert (campaign["processed"], campaign["progress"]) == (2, 1.0)
+    assert client.post(f"/api/admin/reanalysis/{campaign_id}/resume").status_code == 409
+    assert client.post("/api/admin/reanalysis").status_code == 200
+
+
+def test_api_requires_the_admin_token(client):
+    assert client.get("/api/admin/reanalysis", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get(f"/api/admin/reanalysis/{uuid.uuid4()}").status_code == 404
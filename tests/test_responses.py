@@ -0,0 +1,143 @@
+import base64
+import io
+import uuid
+from datetime import datetime
+from operator import itemgetter
+
+import orjson
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from sqlalchemy import select
+
+from pipeline import get_color_for_class
+from responses import COLUMNAR, ROWS, AnalysisEncoder, detections_by_file, parse_layout
+
+CLASS_IDS = {"person": 0, "car": 2, "dog": 16}
+PNG_BASE64 = base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\x00" * 64).decode()
+
+
+async def _add_file(db, detections, image_data=PNG_BASE64):
+    from models import Detection, File as FileModel
+
+    file = FileModel(id=uuid.uuid4(), filename="a.png", filetype="image/png", size="1", image_data=image_data,
+                     processing_time=0.25, uploaded_at=datetime(2026, 10, 19, 12, 0), model_version="v1")
+    db.add(file)
+    await db.flush()
+    db.add_all(Detection(file_id=file.id, class_name=name, confidence=confidence,
+                         x_min=x, y_min=x + 1, x_max=x + 10, y_max=x + 11)
+               for name, confidence, x in detections)
+    await db.commit()
+    return file.id
+
+
+async def _encode(db, encoder, file_ids):
+    from models import File as FileModel
+
+    files = (await db.execute(select(*encoder.file_columns).where(FileModel.id.in_(file_ids)))).all()
+    grouped = await detections_by_file(db, file_ids)
+    return [encoder.analysis(file, grouped[file.id]) for file in files]
+
+
+def _rows_from_columnar(analysis, classes):
+    """Rebuild the rows layout from a columnar analysis and its class table"""
+    names = {entry["id"]: entry for entry in classes}
+    columns = analysis["detections"]
+    return [
+        {
+            "id": det_id,
+            "class_name": names[class_id]["name"],
+            "confidence": confidence,
+            "bbox": columns["boxes"][4 * i:4 * i + 4],
+            "color": names[class_id]["color"],
+        }
+        for i, (det_id, class_id, confidence) in enumerate(
+            zip(columns["ids"], columns["class_ids"], columns["confidences"])
+        )
+    ]
+
+
+def test_parse_layout():
+    assert parse_layout(ROWS) == ROWS and parse_layout(COLUMNAR) == COLUMNAR
+    with pytest.raises(HTTPException) as excinfo:
+        parse_layout("csv")
+    assert excinfo.value.status_code == 400
+
+
+def test_rows_layout_has_the_analysis_result_shape(run_db):
+    async def scenario(db):
+        file_id = await _add_file(db, [("person", 0.9, 0), ("car", 0.5, 20)])
+        [analysis] = await _encode(db, AnalysisEncoder(ROWS, CLASS_IDS), [file_id])
+        return file_id, analysis
+
+    file_id, analysis = run_db(scenario)
+    assert {k: analysis[k] for k in ("id", "filename", "file_type", "image_data", "image_mime")} == {
+        "id": file_id, "filename": "a.png", "file_type": "image/png", "image_data": PNG_BASE64,
+        "image_mime": "image/png",
+    }
+    assert (analysis["total_objects"], analysis["processing_time"]) == (2, 0.25)
+    person = next(d for d in analysis["detections"] if d["class_name"] == "person")
+    assert person["bbox"] == [0, 1, 10, 11]
+    assert person["color"] == get_color_for_class(0)
+    assert {d["color"] for d in analysis["detections"] if d["class_name"] == "car"} == {get_color_for_class(2)}
+    # orjson encodes the UUIDs and datetimes as they come from the database
+    encoded = orjson.loads(orjson.dumps(analysis))
+    assert encoded["id"] == str(file_id) and encoded["timestamp"] == "2026-10-19T12:00:00"
+
+
+def test_columnar_layout_carries_the_same_detections(run_db):
+    async def scenario(db):
+        ids = [
+            await _add_file(db, [("person", 0.9, 0), ("dog", 0.4, 5), ("person", 0.7, 30)]),
+            await _add_file(db, [("car", 0.6, 2)]),
+            await _add_file(db, []),
+        ]
+        rows = await _encode(db, AnalysisEncoder(ROWS, CLASS_IDS), ids)
+        encoder = AnalysisEncoder(COLUMNAR, CLASS_IDS)
+        columnar = await _encode(db, encoder, ids)
+        return rows, columnar, encoder.classes()
+
+    rows, columnar, classes = run_db(scenario)
+    assert [entry["name"] for entry in classes] == ["person", "car", "dog"]
+    assert AnalysisEncoder(ROWS, CLASS_IDS).classes() is None
+    for row_analysis, column_analysis in zip(rows, columnar):
+        assert column_analysis["total_objects"] == row_analysis["total_objects"]
+        assert len(column_analysis["detections"]["boxes"]) == 4 * column_analysis["total_objects"]
+        assert sorted(_rows_from_columnar(column_analysis, classes), key=itemgetter("id")) == sorted(
+            row_analysis["detections"], key=itemgetter("id")
+        )
+
+
+def test_summary_columns_leave_out_the_image_but_keep_its_type(run_db):
+    async def scenario(db):
+        file_id = await _add_file(db, [("person", 0.9, 0)])
+        unanalyzed = await _add_file(db, [], image_data=None)
+        encoder = AnalysisEncoder(ROWS, CLASS_IDS, include_images=False)
+        return file_id, unanalyzed, encoder, await _encode(db, encoder, [file_id, unanalyzed])
+
+    file_id, unanalyzed, encoder, analyses = run_db(scenario)
+    assert "image_data" not in {getattr(column, "key", None) for column in encoder.file_columns}
+    by_id = {analysis["id"]: analysis for analysis in analyses}
+    assert (by_id[file_id]["image_data"], by_id[file_id]["image_mime"]) == (None, "image/png")
+    assert by_id[unanalyzed]["image_data"] is None
+
+
+def test_detections_by_file_with_no_ids_skips_the_query(run_db):
+    async def scenario(db):
+        return await detections_by_file(db, [])
+
+    assert run_db(scenario) == {}
+
+
+def test_api_layouts_agree(app_client):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buffer, format="PNG")
+    detected = app_client.post("/api/detect", files={"file": ("a.png", buffer.getvalue(), "image/png")}).json()
+
+    rows = app_client.get("/api/analyses").json()
+    columnar = app_client.get("/api/analyses", params={"layout": "columnar"}).json()
+    [row_analysis] = rows
+    [column_analysis] = columnar["analyses"]
+    assert row_analysis["detections"] == detected["detections"]
+    assert _rows_from_columnar(column_analysis, columnar["classes"]) == row_analysis["detections"]
+    assert app_client.get("/api/analyses", params={"layout": "csv"}).status_code == 400
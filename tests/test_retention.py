@@ -0,0 +1,195 @@
+import io
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from ingest import ingest_fileobj
+from retention import RetentionPolicy, discard_blobs, run_retention
+from storage import blob_store
+
+PNG = b"\x89PNG\r\n\x1a\n"
+NOW = datetime.utcnow()
+
+
+def _blob(size=1000):
+    return ingest_fileobj(io.BytesIO(PNG + os.urandom(size - len(PNG))))
+
+
+async def _add(db, blob, days_old=0, owner=None):
+    """A file row for ``blob`` (registering the blob), uploaded ``days_old`` days ago"""
+    from database import dialect_insert
+    from models import Blob, File as FileModel
+
+    await db.execute(dialect_insert(db, Blob).values(
+        digest=blob.digest, blob_key=blob.blob_key, size=blob.size, media_type=blob.media_type, created_at=NOW,
+    ).on_conflict_do_nothing(index_elements=["digest"]))
+    file = FileModel(
+        id=uuid.uuid4(), filename="f.png", filetype=blob.media_type, size=str(blob.size), blob_key=blob.blob_key,
+        content_hash=blob.digest, owner=owner, uploaded_at=NOW - timedelta(days=days_old),
+    )
+    db.add(file)
+    await db.commit()
+    return file.id
+
+
+async def _remaining(db):
+    from models import File as FileModel
+
+    return set((await db.execute(select(FileModel.id))).scalars())
+
+
+@pytest.fixture
+def policy():
+    return RetentionPolicy(batch_size=2, batch_pause=0)
+
+
+def test_max_age_deletes_old_files_and_their_blobs(run_db, policy):
+    old, new = _blob(), _blob()
+
+    async def scenario(db):
+        old_id = await _add(db, old, days_old=10)
+        new_id = await _add(db, new, days_old=1)
+        policy.max_age_days = 5
+        dry = await run_retention(policy, dry_run=True)
+        assert dry.by_policy["max_age"] == 1 and dry.files_deleted == 0
+        assert await _remaining(db) == {old_id, new_id}
+        report = await run_retention(policy)
+        return report, await _remaining(db), new_id
+
+    report, remaining, new_id = run_db(scenario)
+    assert remaining == {new_id}
+    assert (report.files_deleted, report.blobs_removed, report.bytes_reclaimed) == (1, 1, old.size)
+    assert report.by_policy["max_age"] == 1
+    assert not blob_store.exists(old.blob_key) and blob_store.exists(new.blob_key)
+
+
+def test_blob_shared_with_a_kept_file_stays(run_db, policy):
+    shared = _blob()
+
+    async def scenario(db):
+        await _add(db, shared, days_old=10)
+        kept = await _add(db, shared, days_old=1)
+        policy.max_age_days = 5
+        report = await run_retention(policy)
+        return report, await _remaining(db), kept
+
+    report, remaining, kept = run_db(scenario)
+    assert remaining == {kept}
+    assert (report.files_deleted, report.blobs_removed, report.bytes_reclaimed) == (1, 0, 0)
+    assert blob_store.exists(shared.blob_key)
+
+
+def test_max_total_bytes_dry_run_reports_the_excess_the_real_run_reclaims(run_db, policy):
+    blobs = [_blob(1000) for _ in range(4)]
+
+    async def scenario(db):
+        ids = [await _add(db, blob, days_old=4 - i) for i, blob in enumerate(blobs)]
+        policy.max_total_bytes = 2500
+        dry = await run_retention(policy, dry_run=True)
+        report = await run_retention(policy)
+        return ids, dry, report, await _remaining(db)
+
+    ids, dry, report, remaining = run_db(scenario)
+    assert dry.by_policy["max_total_bytes_excess"] == 1500
+    assert dry.bytes_reclaimed == 0
+    # The two oldest files cover the excess; nothing more is deleted
+    assert remaining == set(ids[2:])
+    assert report.bytes_reclaimed == 2000 >= dry.by_policy["max_total_bytes_excess"]
+    assert report.by_policy["max_total_bytes"] == 2
+
+
+def test_user_quota_deletes_only_that_users_oldest_files(run_db, policy):
+    async def scenario(db):
+        alice = [await _add(db, _blob(1000), days_old=3 - i, owner="user:alice") for i in range(3)]
+        bob = await _add(db, _blob(1000), days_old=5, owner="user:bob")
+        unowned = await _add(db, _blob(1000), days_old=9)
+        policy.user_quota_bytes = 1500
+        dry = await run_retention(policy, dry_run=True)
+        report = await run_retention(policy)
+        return alice, bob, unowned, dry, report, await _remaining(db)
+
+    alice, bob, unowned, dry, report, remaining = run_db(scenario)
+    assert dry.by_policy == {"user_quota_excess:user:alice": 1500, "superseded_exports": 0}
+    assert remaining == {alice[2], bob, unowned}
+    assert report.by_policy["user_quota"] == 2
+
+
+def test_superseded_exports_are_deleted_after_the_grace_period(run_db, policy):
+    from models import SupersededExport
+
+    stale, recent = blob_store.put(b"stale export")[0], blob_store.put(b"recent export")[0]
+
+    async def scenario(db):
+        db.add(SupersededExport(blob_key=stale, superseded_at=NOW - timedelta(hours=1)))
+        db.add(SupersededExport(blob_key=recent, superseded_at=datetime.utcnow()))
+        await db.commit()
+        dry = await run_retention(policy, dry_run=True)
+        report = await run_retention(policy)
+        left = set((await db.execute(select(SupersededExport.blob_key))).scalars())
+        return dry, report, left
+
+    dry, report, left = run_db(scenario)
+    assert dry.by_policy["superseded_exports"] == 1
+    assert report.by_policy["superseded_exports"] == 1
+    assert report.bytes_reclaimed == len(b"stale export")
+    assert left == {recent}
+    assert not blob_store.exists(stale) and blob_store.exists(recent)
+
+
+def test_discard_blobs_keeps_bytes_other_files_use(run_db):
+    used, unused = _blob(), _blob()
+
+    async def scenario(db):
+        await _add(db, used)
+        return await discard_blobs([used, unused])
+
+    assert run_db(scenario) == unused.size
+    assert blob_store.exists(used.blob_key)
+    assert not blob_store.exists(unused.blob_key)
+
+
+def test_upload_of_bytes_removed_by_retention_is_refused(run_db):
+    pytest.importorskip("ultralytics")
+    import server
+
+    blob = _blob()
+
+    async def scenario(db):
+        file_id = await _add(db, blob, days_old=10)
+        # Retention purges the only file and its blob while an upload of the
+        # same bytes has ingested them but not yet registered the blob
+        await run_retention(RetentionPolicy(max_age_days=5, batch_pause=0))
+        assert await _remaining(db) == set()
+        with pytest.raises(HTTPException) as excinfo:
+            await server.register_blob(db, blob)
+        await db.rollback()
+        return file_id, excinfo.value.status_code
+
+    _, status = run_db(scenario)
+    assert status == 503
+
+
+def test_registered_blob_survives_a_concurrent_purge(run_db):
+    pytest.importorskip("ultralytics")
+    import server
+    from models import File as FileModel
+
+    blob = _blob()
+
+    async def scenario(db):
+        await _add(db, blob, days_old=10)
+        # The new upload registers the blob and commits its file before retention re-checks the blob
+        await server.register_blob(db, blob)
+        db.add(FileModel(filename="new.png", filetype=blob.media_type, size=str(blob.size),
+                         blob_key=blob.blob_key, content_hash=blob.digest))
+        await db.commit()
+        report = await run_retention(RetentionPolicy(max_age_days=5, batch_pause=0))
+        return report
+
+    report = run_db(scenario)
+    assert (report.files_deleted, report.blobs_removed) == (1, 0)
+    assert blob_store.exists(blob.blob_key)
@@ -0,0 +1,149 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import scheduler as scheduler_module
+from scheduler import BATCH, INTERACTIVE, STREAM, InferenceScheduler, Job, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler_module.time, "monotonic", clock)
+    return clock
+
+
+def _job(name, priority=BATCH, user="alice"):
+    # Dispatch order is all that is checked here, so no event loop or future is needed
+    return Job(func=None, arg=name, user=user, future=None, priority=priority)
+
+
+def _drain(sched):
+    order = []
+    while True:
+        job = sched._next_job()
+        if job is None:
+            return order
+        order.append(job.arg)
+
+
+def test_token_bucket_allows_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.try_take() for _ in range(4)] == [True, True, True, False]
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.now += 0.5
+    assert bucket.try_take()
+    assert not bucket.try_take()
+
+
+def test_token_bucket_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=10, burst=2)
+    clock.now += 60
+    assert [bucket.try_take() for _ in range(3)] == [True, True, False]
+
+
+def test_dispatch_order_follows_priority(clock):
+    sched = InferenceScheduler(concurrency=1)
+    sched.queues[BATCH].push(_job("batch"))
+    sched.queues[STREAM].push(_job("stream", STREAM, "streams"))
+    sched.queues[INTERACTIVE].push(_job("interactive", INTERACTIVE))
+    assert _drain(sched) == ["interactive", "stream", "batch"]
+
+
+def test_batch_round_robin_across_users(clock):
+    sched = InferenceScheduler(concurrency=1)
+    for i in range(3):
+        sched.queues[BATCH].push(_job(f"a{i}", user="alice"))
+    sched.queues[BATCH].push(_job("b0", user="bob"))
+    assert _drain(sched) == ["a0", "b0", "a1", "a2"]
+
+
+def test_batch_buckets_pace_users_while_streams_wait(clock, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_RATE", 4.0)
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_BURST", 1.0)
+    monkeypatch.setattr(scheduler_module, "STREAM_MAX_CONSECUTIVE", 1)
+    sched = InferenceScheduler(concurrency=1)
+    for i in range(4):
+        sched.queues[STREAM].push(_job(f"s{i}", STREAM, "streams"))
+    for i in range(2):
+        sched.queues[BATCH].push(_job(f"a{i}", user="alice"))
+    # Alice's bucket is empty after a0, so her turns go to the streams until they run dry
+    assert _drain(sched) == ["s0", "a0", "s1", "s2", "s3", "a1"]
+
+
+def test_idle_model_takes_batch_work_despite_empty_buckets(clock, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_RATE", 0.001)
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_BURST", 1.0)
+    sched = InferenceScheduler(concurrency=1)
+    for i in range(3):
+        sched.queues[BATCH].push(_job(f"a{i}", user="alice"))
+    sched.queues[BATCH].push(_job("b0", user="bob"))
+    sched.queues[BATCH].push(_job("b1", user="bob"))
+    # Users with tokens still go first, then the rest round-robin
+    assert _drain(sched) == ["a0", "b0", "a1", "b1", "a2"]
+
+
+def test_idle_worker_runs_batch_backlog_without_sleeping(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_RATE", 0.001)
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_BURST", 1.0)
+    sched = InferenceScheduler(concurrency=1)
+
+    async def main():
+        calls = [sched.infer(lambda x: x, i, BATCH, "alice", admit=False) for i in range(20)]
+        return await asyncio.wait_for(asyncio.gather(*calls), timeout=2)
+
+    assert asyncio.run(main()) == list(range(20))
+
+
+def test_admit_sheds_when_queue_full(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_QUEUE_LIMIT", 1)
+    sched = InferenceScheduler(concurrency=1)
+    sched.queues[BATCH].push(_job("a0"))
+    with pytest.raises(HTTPException) as excinfo:
+        sched.admit(BATCH, "alice")
+    assert excinfo.value.status_code == 503
+    assert "Retry-After" in excinfo.value.headers
+    # Other users still have room
+    sched.admit(BATCH, "bob")
+
+
+def test_admit_rate_limits_interactive(clock, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "INTERACTIVE_USER_BURST", 2.0)
+    sched = InferenceScheduler(concurrency=1)
+    bucket = sched._bucket(INTERACTIVE, "alice")
+    bucket.try_take()
+    bucket.try_take()
+    with pytest.raises(HTTPException) as excinfo:
+        sched.admit(INTERACTIVE, "alice")
+    assert excinfo.value.status_code == 429
+
+
+def test_background_calls_wait_for_room_instead_of_shedding(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "BATCH_QUEUE_LIMIT", 1)
+    monkeypatch.setattr(scheduler_module, "BATCH_USER_BURST", 100.0)
+    sched = InferenceScheduler(concurrency=1)
+
+    async def main():
+        calls = [sched.infer(lambda x: x * 2, i, BATCH, "alice", admit=False) for i in range(5)]
+        return await asyncio.gather(*calls)
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+
+
+def test_batch_gets_a_share_against_a_stream_backlog(clock, monkeypatch):
+    monkeypatch.setattr(scheduler_module, "STREAM_MAX_CONSECUTIVE", 2)
+    sched = InferenceScheduler(concurrency=1)
+    for i in range(5):
+        sched.queues[STREAM].push(_job(f"s{i}", STREAM, "streams"))
+    for i in range(2):
+        sched.queues[BATCH].push(_job(f"b{i}"))
+    assert _drain(sched) == ["s0", "s1", "b0", "s2", "s3", "b1", "s4"]
@@ -0,0 +1,161 @@
+import uuid
+from collections import defaultdict
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import delete, select
+
+from stats import flush_file_stats, remove_file_stats, stage_file_stats
+
+MONDAY, TUESDAY = date(2026, 10, 19), date(2026, 10, 20)
+
+
+def _dets(*classes):
+    """Detections as (class_name, confidence) pairs"""
+    return [SimpleNamespace(class_name=name, confidence=confidence) for name, confidence in classes]
+
+
+async def _add_file(db):
+    from models import File as FileModel
+
+    file = FileModel(id=uuid.uuid4(), filename="f.jpg", filetype="image/jpeg", size="1")
+    db.add(file)
+    await db.flush()
+    return file.id
+
+
+async def _analyze(db, file_id, detections, day):
+    """Replace a file's detections the way save_detections does, then commit"""
+    from models import Detection
+
+    await db.execute(delete(Detection).where(Detection.file_id == file_id))
+    db.add_all(
+        Detection(file_id=file_id, class_name=d.class_name, confidence=d.confidence, x_min=0, y_min=0, x_max=1, y_max=1)
+        for d in detections
+    )
+    stage_file_stats(db, file_id, detections, day)
+    await flush_file_stats(db)
+    await db.commit()
+
+
+async def _delete(db, file_ids):
+    """Delete files the way retention does"""
+    from models import Detection, File as FileModel
+
+    await remove_file_stats(db, file_ids)
+    # The cascade is spelled out: SQLite leaves foreign keys unenforced here
+    await db.execute(delete(Detection).where(Detection.file_id.in_(file_ids)))
+    await db.execute(delete(FileModel).where(FileModel.id.in_(file_ids)))
+    await db.commit()
+
+
+async def _check_against_recount(db):
+    """Compare every summary table with a recount from the detections table"""
+    from models import DailyClassStats, DailyStats, Detection, FileStats
+
+    file_stats = {row.file_id: row for row in (await db.execute(select(FileStats))).scalars()}
+    detections = defaultdict(list)
+    for det in (await db.execute(select(Detection))).scalars():
+        detections[det.file_id].append(det)
+
+    days = defaultdict(lambda: [0, 0])
+    classes = defaultdict(lambda: [0, 0, 0.0])
+    for file_id, stats in file_stats.items():
+        counts = defaultdict(int)
+        sums = defaultdict(float)
+        for det in detections[file_id]:
+            counts[det.class_name] += 1
+            sums[det.class_name] += det.confidence
+        assert stats.class_counts == counts
+        assert stats.confidence_sums == pytest.approx(sums)
+        assert stats.object_count == len(detections[file_id])
+        days[stats.day][0] += 1
+        days[stats.day][1] += len(detections[file_id])
+        for class_name, count in counts.items():
+            totals = classes[(stats.day, class_name)]
+            totals[0] += count
+            totals[1] += 1
+            totals[2] += sums[class_name]
+    assert set(detections) <= set(file_stats)
+
+    # Rows that went back to zero may stay behind; they must be all zero
+    stored_days = {
+        row.day: [row.files_analyzed, row.detection_count]
+        for row in (await db.execute(select(DailyStats))).scalars()
+        if row.files_analyzed or row.detection_count
+    }
+    assert stored_days == days
+    stored_classes = {
+        (row.day, row.class_name): [row.detection_count, row.file_count, pytest.approx(row.confidence_sum)]
+        for row in (await db.execute(select(DailyClassStats))).scalars()
+        if row.detection_count or row.file_count or abs(row.confidence_sum) > 1e-9
+    }
+    assert stored_classes == classes
+    return stored_days, stored_classes
+
+
+def test_counters_match_a_recount_through_reanalysis_and_delete(run_db):
+    async def scenario(db):
+        a, b, c = await _add_file(db), await _add_file(db), await _add_file(db)
+        await _analyze(db, a, _dets(("person", 0.9), ("car", 0.6)), MONDAY)
+        await _analyze(db, b, _dets(("person", 0.8)), MONDAY)
+        await _analyze(db, c, [], MONDAY)
+        days, classes = await _check_against_recount(db)
+        assert days == {MONDAY: [3, 3]}
+        assert classes[(MONDAY, "person")] == [2, 2, pytest.approx(1.7)]
+
+        # Re-analysis on the same day, and one that moves a file to the next day
+        await _analyze(db, a, _dets(("dog", 0.5)), MONDAY)
+        await _analyze(db, b, _dets(("person", 0.7), ("person", 0.6)), TUESDAY)
+        days, classes = await _check_against_recount(db)
+        assert days == {MONDAY: [2, 1], TUESDAY: [1, 2]}
+        assert (MONDAY, "car") not in classes
+
+        await _delete(db, [a, c])
+        days, _ = await _check_against_recount(db)
+        assert days == {TUESDAY: [1, 2]}
+
+    run_db(scenario)
+
+
+def test_staging_twice_counts_the_file_once(run_db):
+    from models import Detection
+
+    async def scenario(db):
+        file_id = await _add_file(db)
+        db.add(Detection(file_id=file_id, class_name="person", confidence=0.9, x_min=0, y_min=0, x_max=1, y_max=1))
+        stage_file_stats(db, file_id, _dets(("car", 0.5)), MONDAY)
+        stage_file_stats(db, file_id, _dets(("person", 0.9)), MONDAY)
+        await flush_file_stats(db)
+        await db.commit()
+        return await _check_against_recount(db)
+
+    days, classes = run_db(scenario)
+    assert days == {MONDAY: [1, 1]}
+    assert list(classes) == [(MONDAY, "person")]
+
+
+def test_rolled_back_staging_is_not_flushed_later(run_db):
+    async def scenario(db):
+        file_id = await _add_file(db)
+        await db.commit()
+        await _add_file(db)  # opens the transaction that is rolled back
+        stage_file_stats(db, file_id, _dets(("car", 0.5)), MONDAY)
+        await db.rollback()
+        await flush_file_stats(db)
+        await db.commit()
+        return await _check_against_recount(db)
+
+    days, classes = run_db(scenario)
+    assert days == {} and classes == {}
+
+
+def test_removing_files_without_stats_is_a_no_op(run_db):
+    async def scenario(db):
+        file_id = await _add_file(db)
+        await _delete(db, [file_id])
+        await _delete(db, [])
+        return await _check_against_recount(db)
+
+    assert run_db(scenario) == ({}, {})
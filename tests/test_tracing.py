@@ -0,0 +1,121 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import admin
+import tracing
+from metrics import stage
+from tracing import ProfilingMiddleware, Span, Trace, span, to_otlp
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def client(db_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(tracing, "TRACE_DIR", tmp_path)
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        from database import AsyncSessionLocal
+
+        with stage("decode"):
+            pass
+        with stage("inference"):
+            with span("inner", images=2):
+                pass
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+        return {"ok": True}
+
+    app.include_router(tracing.router)
+    app.add_middleware(ProfilingMiddleware)
+    with TestClient(app) as client:
+        yield client
+
+
+def _spans(document):
+    [resource] = document["resourceSpans"]
+    [scope] = resource["scopeSpans"]
+    return scope["spans"]
+
+
+def test_to_otlp_renders_ids_kinds_and_typed_attributes():
+    trace = Trace(trace_id="a" * 32, spans=[
+        Span("GET /x", "1" * 16, None, 100, 300, {"http.status_code": 200, "ok": True, "ratio": 0.5, "path": "/x"}),
+        Span("decode", "2" * 16, "1" * 16, 150),
+    ])
+    root, child = _spans(to_otlp(trace))
+    assert (root["traceId"], root["spanId"], root["parentSpanId"], root["kind"]) == ("a" * 32, "1" * 16, "", 2)
+    assert (root["startTimeUnixNano"], root["endTimeUnixNano"]) == ("100", "300")
+    assert root["attributes"] == [
+        {"key": "http.status_code", "value": {"intValue": "200"}},
+        {"key": "ok", "value": {"boolValue": True}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "path", "value": {"stringValue": "/x"}},
+    ]
+    # An unfinished span is closed at its start rather than rendered with a zero end time
+    assert (child["parentSpanId"], child["kind"], child["endTimeUnixNano"]) == ("1" * 16, 1, "150")
+
+
+def test_span_outside_a_trace_records_nothing():
+    with span("idle") as recorded:
+        assert recorded is None
+    assert tracing.current_trace() is None
+
+
+@pytest.mark.parametrize("headers,params", [
+    ({"X-Profile": "1", "X-Admin-Token": TOKEN}, {}),
+    ({"X-Admin-Token": TOKEN}, {"profile": "1"}),
+])
+def test_admin_request_writes_a_span_tree(client, tmp_path, headers, params):
+    response = client.get("/work", headers=headers, params=params)
+    trace_id = response.headers["x-trace-id"]
+    spans = _spans(json.loads((tmp_path / f"{trace_id}.json").read_text()))
+    by_name = {s["name"]: s for s in spans}
+    root = by_name["GET /work"]
+    assert root["parentSpanId"] == "" and {"key": "http.status_code", "value": {"intValue": "200"}} in root["attributes"]
+    assert by_name["decode"]["parentSpanId"] == root["spanId"]
+    assert by_name["inner"]["parentSpanId"] == by_name["inference"]["spanId"]
+    assert {s["traceId"] for s in spans} == {trace_id}
+    statements = [s for s in spans if s["name"] == "db.statement"]
+    assert any({"key": "db.statement", "value": {"stringValue": "SELECT 1"}} in s["attributes"] for s in statements)
+
+
+@pytest.mark.parametrize("headers", [
+    {"X-Profile": "1"},
+    {"X-Profile": "1", "X-Admin-Token": "wrong"},
+    {"X-Profile": "0", "X-Admin-Token": TOKEN},
+    {"X-Admin-Token": TOKEN},
+])
+def test_profiling_needs_an_admin_token_and_a_flag(client, tmp_path, headers):
+    response = client.get("/work", headers=headers)
+    assert response.status_code == 200
+    assert "x-trace-id" not in response.headers
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profiling_is_off_without_a_configured_token(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(admin, "ADMIN_TOKEN", None)
+    assert "x-trace-id" not in client.get("/work", headers={"X-Profile": "1", "X-Admin-Token": ""}).headers
+
+
+def test_trace_endpoints_are_admin_only(client):
+    trace_id = client.get("/work", headers={"X-Profile": "1", "X-Admin-Token": TOKEN}).headers["x-trace-id"]
+    assert client.get("/api/admin/traces").status_code == 403
+    assert client.get(f"/api/admin/traces/{trace_id}", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    listed = client.get("/api/admin/traces", headers={"X-Admin-Token": TOKEN}).json()
+    assert [entry["trace_id"] for entry in listed] == [trace_id]
+    document = client.get(f"/api/admin/traces/{trace_id}", headers={"X-Admin-Token": TOKEN}).json()
+    assert _spans(document)[0]["traceId"] == trace_id
+
+
+@pytest.mark.parametrize("trace_id", ["../../etc/passwd", "f" * 32, "G" * 32])
+def test_unknown_or_malformed_trace_ids_are_not_found(client, trace_id):
+    response = client.get(f"/api/admin/traces/{trace_id}", headers={"X-Admin-Token": TOKEN})
+    assert response.status_code == 404
@@ -0,0 +1,143 @@
+import numpy as np
+import pytest
+
+from pipeline import DetectionResult
+from zones import ZoneSpec, points_in_polygon
+
+SQUARE = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+# An L-shape: the top-right quarter is cut away, so (5, 5)-(10, 5) is a horizontal inner edge
+STEP = np.array([[0, 0], [10, 0], [10, 5], [5, 5], [5, 10], [0, 10]], dtype=np.float64)
+
+
+def _inside(points, polygon):
+    return points_in_polygon(np.array(points, dtype=np.float64), polygon).tolist()
+
+
+def test_points_in_square():
+    assert _inside([[5, 5], [0.1, 9.9], [-1, 5], [11, 5], [5, -1], [5, 11]], SQUARE) == [
+        True, True, False, False, False, False,
+    ]
+
+
+def test_points_in_concave_polygon():
+    assert _inside([[2, 2], [7, 2], [2, 7], [7, 7]], STEP) == [True, True, True, False]
+
+
+def test_horizontal_edges_do_not_count_as_crossings():
+    # Rays at the height of the horizontal edge y=5 must not be miscounted
+    assert _inside([[7, 4.9], [7, 5], [7, 5.1], [2, 5], [-1, 5]], STEP) == [True, False, False, True, False]
+
+
+def test_edges_are_half_open():
+    # Top/left edges are inside, bottom/right edges outside, so adjacent zones never both claim a point
+    assert _inside([[0, 5], [5, 0], [10, 5], [5, 10]], SQUARE) == [True, True, False, False]
+
+
+def test_parse_normalizes_rectangles_to_polygons():
+    spec = ZoneSpec.parse({"include": [[1, 2, 3, 4]], "exclude": [[[0, 0], [1, 0], [0, 1]]]})
+    assert spec.include == [[[1.0, 2.0], [3.0, 2.0], [3.0, 4.0], [1.0, 4.0]]]
+    assert spec.exclude == [[[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]]]
+    assert spec.anchor == "center" and not spec.normalized
+
+
+@pytest.mark.parametrize("raw", [
+    [],
+    {"include": [[1, 2, 3]]},
+    {"include": [[3, 0, 1, 4]]},
+    {"include": [[[0, 0], [1, 1]]]},
+    {"include": [[[0, 0], [1, 1], [1]]]},
+    {"include": "everywhere"},
+    {"anchor": "top"},
+    {"zones": []},
+    {"include": [[0, 0, 1, 1]] * 33},
+    {"include": [[True, 0, 5, 5]]},
+    {"include": [[0, 0, float("nan"), 5]]},
+    {"exclude": [[0, 0, float("inf"), 5]]},
+    {"include": [[[0, 0], [5, False], [5, 5]]]},
+    {"include": [[[0, 0], [5, float("nan")], [5, 5]]]},
+])
+def test_parse_rejects_bad_specs(raw):
+    with pytest.raises(ValueError):
+        ZoneSpec.parse(raw)
+
+
+@pytest.mark.parametrize("text", [
+    '{"include": [[0, 0, NaN, 5]]}',
+    '{"include": [[0, 0, Infinity, 5]]}',
+    '{"include": [[[0, 0], [5, -Infinity], [5, 5]]]}',
+    '{"include": [[0, 0, true, 5]]}',
+])
+def test_from_json_rejects_non_finite_and_bool_coordinates(text):
+    with pytest.raises(ValueError, match="finite numbers"):
+        ZoneSpec.from_json(text)
+
+
+def test_to_json_is_canonical():
+    a = ZoneSpec.parse({"anchor": "bottom", "include": [[0, 0, 1, 1]]})
+    b = ZoneSpec.parse({"include": [[0.0, 0.0, 1.0, 1.0]], "exclude": [], "anchor": "bottom"})
+    assert a.to_json() == b.to_json()
+    assert ZoneSpec.from_json(a.to_json()) == a
+
+
+def test_normalized_zones_scale_to_the_image_and_crop_is_clamped():
+    spec = ZoneSpec.parse({"include": [[0.25, 0.5, 1.2, 0.75]], "normalized": True})
+    zones = spec.for_image(200, 100)
+    assert zones.box == (50, 50, 200, 75)
+    assert zones.crop(np.zeros((100, 200, 3))).shape == (25, 150, 3)
+
+
+def test_crop_box_covers_every_include_zone():
+    spec = ZoneSpec.parse({"include": [[10, 10, 20, 20], [[50, 5], [60, 30], [55, 40]]], "exclude": [[0, 0, 5, 5]]})
+    assert spec.for_image(100, 100).box == (10, 5, 60, 40)
+
+
+def test_no_include_zones_means_full_frame():
+    assert ZoneSpec.parse({"exclude": [[0, 0, 5, 5]]}).for_image(64, 48).box == (0, 0, 64, 48)
+
+
+def test_roi_outside_image_is_rejected():
+    with pytest.raises(ValueError):
+        ZoneSpec.parse({"include": [[200, 200, 300, 300]]}).for_image(100, 100)
+
+
+def _det(bbox, class_name="person"):
+    return DetectionResult(class_name=class_name, confidence=0.9, bbox=bbox, color="#fff")
+
+
+def test_apply_maps_crop_coordinates_back_to_the_image():
+    zones = ZoneSpec.parse({"include": [[40, 30, 80, 70]]}).for_image(100, 100)
+    assert zones.box == (40, 30, 80, 70)
+    inside, outside = _det([10, 10, 20, 20]), _det([0, 0, 4, 4])
+    kept = zones.apply([inside, outside])
+    # The second box lands at (40, 30)-(44, 34): its center (42, 32) is still inside the zone
+    assert [det.bbox for det in kept] == [[50.0, 40.0, 60.0, 50.0], [40.0, 30.0, 44.0, 34.0]]
+    assert [det.id for det in kept] == [inside.id, outside.id]
+    assert inside.bbox == [10, 10, 20, 20]
+
+
+def test_apply_drops_boxes_in_polygon_corners_of_the_crop():
+    # Triangle: the crop is its bounding box, but the bottom-right half is outside the zone
+    zones = ZoneSpec.parse({"include": [[[0, 0], [100, 0], [0, 100]]]}).for_image(100, 100)
+    kept = zones.apply([_det([10, 10, 20, 20]), _det([80, 80, 90, 90])])
+    assert [det.bbox for det in kept] == [[10.0, 10.0, 20.0, 20.0]]
+
+
+def test_exclusion_zones_drop_boxes():
+    zones = ZoneSpec.parse({"exclude": [[0, 0, 50, 100]]}).for_image(100, 100)
+    kept = zones.apply([_det([10, 10, 20, 20]), _det([60, 10, 70, 20]), _det([45, 10, 60, 20])])
+    assert [det.bbox for det in kept] == [[60.0, 10.0, 70.0, 20.0], [45.0, 10.0, 60.0, 20.0]]
+
+
+def test_exclusion_inside_an_include_zone():
+    zones = ZoneSpec.parse({"include": [[0, 0, 100, 100]], "exclude": [[40, 40, 60, 60]]}).for_image(100, 100)
+    kept = zones.apply([_det([45, 45, 55, 55]), _det([10, 10, 20, 20])])
+    assert [det.bbox for det in kept] == [[10.0, 10.0, 20.0, 20.0]]
+
+
+def test_bottom_anchor_counts_boxes_touching_the_frame_edge():
+    # Full-image boxes whose centers lie above the zone; the first stands on the frame's bottom edge
+    boxes = np.array([[10, 10, 20, 100], [30, 10, 40, 70], [50, 10, 60, 50]], dtype=np.float64)
+    bottom = ZoneSpec.parse({"include": [[0, 60, 100, 100]], "anchor": "bottom"}).for_image(100, 100)
+    assert bottom.keep(boxes).tolist() == [True, True, False]
+    center = ZoneSpec.parse({"include": [[0, 60, 100, 100]]}).for_image(100, 100)
+    assert center.keep(boxes).tolist() == [False, False, False]